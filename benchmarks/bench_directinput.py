@@ -0,0 +1,259 @@
+"""
+Benchmarks for the input, capture and matching paths of directinput.
+
+Input is injected into a RecordingBackend and images are matched against
+synthetic frames, so the suite runs on any platform without a desktop.
+Results are written as JSON to track regressions between releases.
+
+Usage:
+    python benchmarks/bench_directinput.py [--quick] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import directinput  # noqa: E402
+
+
+def summarize(samples):
+    """Return latency statistics in seconds for a list of samples."""
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        'min': ordered[0],
+        'max': ordered[-1]
+    }
+
+
+def timeit(func, runs):
+    """Time `runs` calls of func and return the samples in seconds."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def benchInput(backend, runs):
+    """Per-call and per-event cost of the keyboard functions."""
+    cases = {
+        'keyDown': lambda: directinput.keyDown('a'),
+        'keyUp': lambda: directinput.keyUp('a'),
+        'keyDown_shifted': lambda: directinput.keyDown('!'),
+        'keyDown_extended': lambda: directinput.keyDown('up'),
+        'keyPress': lambda: directinput.keyPress('a', key_delay=0),
+        'keyPress_simultaneous': lambda: directinput.keyPress(['ctrl', 'a'], key_delay=0,
+                                                              simultaneously=True),
+        'hotKey': lambda: directinput.hotKey('ctrl', 'shift', 'esc', key_delay=0),
+        'hotKey_string': lambda: directinput.hotKey('ctrl+shift+esc', key_delay=0),
+        'hotKey_sequence': lambda: directinput.hotKey('ctrl+k, ctrl+c', key_delay=0),
+        'mouseClick': lambda: directinput.mouseClick(key_delay=0)
+    }
+
+    results = []
+    for name, func in cases.items():
+        calls = backend.calls
+        events = len(backend.events)
+        samples = timeit(func, runs)
+        backend_events = len(backend.events) - events
+        result = summarize(samples)
+        result.update({
+            'name': name,
+            'syscalls_per_call': (backend.calls - calls) / runs,
+            'events_per_call': backend_events / runs,
+            'per_event': sum(samples) / backend_events if backend_events else None
+        })
+        results.append(result)
+        backend.clear()
+    directinput.releaseAll()
+    return results
+
+
+def benchWrite(backend, runs):
+    """Characters per second of write() with no pacing."""
+    text = 'The quick brown fox jumps over the lazy dog! 0123456789 (~_+{}|:"<>?)'
+    samples = timeit(lambda: directinput.write(text, key_delay=0), runs)
+    backend.clear()
+    result = summarize(samples)
+    result.update({
+        'name': 'write',
+        'characters': len(text),
+        'chars_per_second': len(text) * runs / sum(samples)
+    })
+    return [result]
+
+
+def benchKeyDetect(runs):
+    """Cost of a keyDetect() poll."""
+    results = []
+    for keys in (('a',), ('ctrl', 'c'), ('left_mouse',)):
+        result = summarize(timeit(lambda: directinput.keyDetect(*keys), runs))
+        result.update({'name': 'keyDetect', 'keys': list(keys)})
+        results.append(result)
+    return results
+
+
+def benchMoveMouse(durations, runs):
+    """Timing accuracy of moveMouseTo() over a duration."""
+    results = []
+    for duration in durations:
+        samples = []
+        for i in range(runs):
+            directinput.moveMouseTo(0, 0)
+            start = time.perf_counter()
+            directinput.moveMouseTo(800 + i, 600, duration)
+            samples.append(time.perf_counter() - start)
+        result = summarize(samples)
+        errors = [sample - duration for sample in samples]
+        result.update({
+            'name': 'moveMouseTo',
+            'duration': duration,
+            'mean_error': statistics.fmean(errors),
+            'max_error': max(errors, key=abs)
+        })
+        results.append(result)
+    return results
+
+
+def syntheticFrame(width, height, seed):
+    """Generate a BGR frame with structure at several scales."""
+    rng = numpy.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=numpy.uint8)
+    frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+    noise = rng.integers(0, 32, (height, width, 3), dtype=numpy.uint8)
+    return cv2.add(frame, noise)
+
+
+def benchLocate(directory, haystacks, needles, thresholds, runs):
+    """Latency of locateImage() across haystack and needle sizes."""
+    results = []
+    for width, height in haystacks:
+        frame = syntheticFrame(width, height, width)
+        haystack_path = os.path.join(directory, f'haystack_{width}x{height}.png')
+        cv2.imwrite(haystack_path, frame)
+
+        for size in needles:
+            # Cut the needle from a known position so every search succeeds
+            x, y = width * 2 // 3, height // 3
+            needle_path = os.path.join(directory, f'needle_{width}x{height}_{size}.png')
+            cv2.imwrite(needle_path, frame[y:y + size, x:x + size])
+
+            for grayscale in (False, True):
+                for threshold in thresholds:
+                    found = []
+                    samples = timeit(lambda: found.append(directinput.locateImage(
+                        needle_path, haystack_path, grayscale=grayscale, threshold=threshold
+                    )), runs)
+                    result = summarize(samples)
+                    result.update({
+                        'name': 'locateImage',
+                        'haystack': [width, height],
+                        'needle': [size, size],
+                        'grayscale': grayscale,
+                        'threshold': threshold,
+                        'found': found[-1] is not None
+                    })
+                    results.append(result)
+    return results
+
+
+def benchCapture(directory, haystacks, needle, runs):
+    """Latency of screenshot() and screen-wide locateImage() on replayed frames."""
+    results = []
+    for width, height in haystacks:
+        # Replay a short sequence so every grab returns a different frame
+        frames = [directinput.generateScene((width, height), seed) for seed in range(3)]
+        capture = directinput.SyntheticCapture(frames)
+        previous = directinput.setCaptureBackend(capture)
+        try:
+            result = summarize(timeit(directinput.screenshot, runs))
+            result.update({'name': 'screenshot', 'haystack': [width, height]})
+            results.append(result)
+
+            x, y = width // 2, height // 2
+            needle_path = os.path.join(directory, f'capture_needle_{width}x{height}.png')
+            cv2.imwrite(needle_path, frames[0][y:y + needle, x:x + needle, :3])
+            found = []
+            samples = timeit(lambda: found.append(directinput.locateImage(needle_path)), runs)
+            result = summarize(samples)
+            result.update({
+                'name': 'locateImage_capture',
+                'haystack': [width, height],
+                'needle': [needle, needle],
+                'found': sum(point is not None for point in found) / len(found)
+            })
+            results.append(result)
+        finally:
+            directinput.setCaptureBackend(previous)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='run fewer iterations and sizes')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    input_runs = 200 if args.quick else 2000
+    locate_runs = 3 if args.quick else 10
+    haystacks = [(640, 480), (1920, 1080)] if args.quick else [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+    needles = [32] if args.quick else [16, 32, 64, 128]
+    thresholds = [0.99] if args.quick else [0.9, 0.99, 0.999]
+    durations = [0.1] if args.quick else [0.05, 0.1, 0.25, 0.5]
+
+    # Keep stdout clean for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        directinput.disableFailsafe()
+    backend = directinput.RecordingBackend()
+    previous = directinput.setBackend(backend)
+
+    try:
+        results = []
+        results += benchInput(backend, input_runs)
+        results += benchWrite(backend, max(input_runs // 20, 5))
+        results += benchKeyDetect(input_runs)
+        results += benchMoveMouse(durations, 3 if args.quick else 5)
+        with tempfile.TemporaryDirectory() as directory:
+            results += benchLocate(directory, haystacks, needles, thresholds, locate_runs)
+            results += benchCapture(directory, haystacks, needles[-1], locate_runs)
+    finally:
+        directinput.setBackend(previous)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy.__version__,
+            'opencv': cv2.__version__,
+            'quick': args.quick
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,25 +4,54 @@ and mouse events on Windows. It is useful for automated testing, creating
 macros, and other applications requiring simulated user input.
 """
 
+import asyncio
+import atexit
 import ctypes
+import heapq
+import inspect
+import itertools
+import json
+import math
+import mmap
 import mss
+import numpy
 import pyscreeze
 import pyperclip
+import queue
+import re
+import struct
+import sys
+import tempfile
 import threading
 import time
 import os
 
 from time import sleep
 from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from contextlib import contextmanager
-from ctypes import windll, wintypes, byref
-from numpy import array
-from cv2 import imread, cvtColor, COLOR_BGR2GRAY, COLOR_BGR2RGB
+from multiprocessing import shared_memory
+from functools import lru_cache, partial, reduce, wraps
+from array import array
+from ctypes import wintypes, byref
+from cv2 import (imread, absdiff, cvtColor, connectedComponentsWithStats, integral, matchTemplate,
+                 minMaxLoc, resize, COLOR_BGR2GRAY, COLOR_BGR2RGB, COLOR_BGR2BGRA, COLOR_BGRA2GRAY,
+                 COLOR_BGRA2RGB, COLOR_GRAY2BGRA, COLOR_GRAY2RGB, COLOR_RGB2BGR, INTER_AREA,
+                 INTER_LINEAR, TM_CCOEFF_NORMED)
+from PIL import Image
 
 # Constants
 DEFAULT_INTERVAL = 0.01
+# Time in seconds waited between polls when a poll takes no time on the active clock
+POLL_TICK = 0.001
 Point = namedtuple("Point", "x y")
 Size = namedtuple("Size", "width height")
+RGB = namedtuple("RGB", "red green blue")
+Monitor = namedtuple("Monitor", "left top width height primary")
+
+# Input types
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
 
 # KeyBdInput Flags
 KEYEVENTF_EXTENDEDKEY = 0x0001
@@ -31,13 +60,35 @@ KEYEVENTF_SCANCODE = 0x0008
 KEYEVENTF_UNICODE = 0x0004
 
 # MapVirtualKey Map Types
-MapVirtualKey = ctypes.windll.user32.MapVirtualKeyW
-
 MAPVK_VK_TO_CHAR = 2
 MAPVK_VK_TO_VSC = 0
 MAPVK_VSC_TO_VK = 1
 MAPVK_VSC_TO_VK_EX = 3
 
+# Scancodes of the virtual keys looked up with MapVirtualKey(), used where
+# the Windows API is not available
+VSC_TABLE = {
+    0x0D: 0x1C, 0x11: 0x1D, 0x12: 0x38, 0x21: 0x49, 0x22: 0x51,
+    0x23: 0x4F, 0x24: 0x47, 0x25: 0x4B, 0x26: 0x48, 0x27: 0x4D,
+    0x28: 0x50, 0x2D: 0x52, 0x2E: 0x53, 0x5B: 0x5B, 0x5C: 0x5C,
+    0x6A: 0x37, 0x6F: 0x35
+}
+
+
+def _mapVirtualKey(code, map_type):
+    """Table-driven stand-in for MapVirtualKeyW()."""
+    if map_type == MAPVK_VK_TO_VSC:
+        return VSC_TABLE.get(code, 0)
+    if map_type in (MAPVK_VSC_TO_VK, MAPVK_VSC_TO_VK_EX):
+        return next((vk for vk, scan in VSC_TABLE.items() if scan == code), 0)
+    return 0
+
+
+if sys.platform == 'win32':
+    MapVirtualKey = ctypes.windll.user32.MapVirtualKeyW
+else:
+    MapVirtualKey = _mapVirtualKey
+
 # Define direct key codes for SendInput()
 DK_CODE = {
     # Alphabets
@@ -268,6 +319,7 @@ MVB_CODE = {
 }
 
 # Define mouse_event flags
+MOUSEEVENTF_MOVE = 0x0001
 MOUSEEVENTF_LEFTDOWN = 0x0002
 MOUSEEVENTF_LEFTUP = 0x0004
 MOUSEEVENTF_RIGHTDOWN = 0x0008
@@ -276,6 +328,9 @@ MOUSEEVENTF_MIDDLEDOWN = 0x0020
 MOUSEEVENTF_MIDDLEUP = 0x0040
 MOUSEEVENTF_XDOWN = 0x0080
 MOUSEEVENTF_XUP = 0x0100
+MOUSEEVENTF_WHEEL = 0x0800
+MOUSEEVENTF_VIRTUALDESK = 0x4000
+MOUSEEVENTF_ABSOLUTE = 0x8000
 
 # Define mouse data values for xbuttons (for mouse_event)
 XBUTTON_DATA = {
@@ -283,6 +338,254 @@ XBUTTON_DATA = {
     'xbutton2': 0x0002
 }
 
+# Key Registry
+
+# Flags stored per key ID
+KEYF_SCANCODE = 0x01  # The key has a scancode for SendInput()
+KEYF_VIRTUAL = 0x02   # The key has a virtual key code
+KEYF_SHIFT = 0x04     # The key requires shift to be pressed
+KEYF_EXTENDED = 0x08  # The key is an extended key
+
+# Key names, scancodes, virtual key codes and flags indexed by key ID.
+# ID 0 is the unknown key, which has no codes.
+KEY_NAMES = ['']
+_KEY_SCANCODES = array('H', [0])
+_KEY_VIRTUAL = array('H', [0])
+_KEY_FLAGS = bytearray(1)
+
+# Key names mapped to key IDs, extended with every other spelling resolved
+_KEY_IDS = {}
+
+
+def _registerKey(name, scancode, vk_code, shift, extended):
+    """Add or update a key in the key tables and return its key ID."""
+    if len(name) > 1:
+        name = name.lower()
+    flags = ((KEYF_SCANCODE if scancode is not None else 0) |
+             (KEYF_VIRTUAL if vk_code is not None else 0) |
+             (KEYF_SHIFT if shift else 0) |
+             (KEYF_EXTENDED if extended else 0))
+
+    key_id = _KEY_IDS.get(name)
+    if key_id is None:
+        key_id = len(KEY_NAMES)
+        KEY_NAMES.append(name)
+        _KEY_SCANCODES.append(scancode or 0)
+        _KEY_VIRTUAL.append(vk_code or 0)
+        _KEY_FLAGS.append(flags)
+        _KEY_IDS[name] = key_id
+    else:
+        _KEY_SCANCODES[key_id] = scancode or 0
+        _KEY_VIRTUAL[key_id] = vk_code or 0
+        _KEY_FLAGS[key_id] = flags
+    return key_id
+
+
+def registerKey(name, scancode=None, vk_code=None, shift=False, extended=False):
+    """
+    Register a key name, or update the codes of a registered key.
+
+    Names longer than one character are case-insensitive. Single characters
+    are case-sensitive, so 'a' and 'A' are different keys.
+
+    Parameters:
+    name : str
+        The key name.
+    scancode : int, optional
+        The scancode used to inject the key. None if the key has no scancode.
+    vk_code : int, optional
+        The virtual key code used to type and detect the key. None if the key has none.
+    shift : bool, optional
+        Whether the key requires shift to be pressed (default is False).
+    extended : bool, optional
+        Whether the key is an extended key (default is False).
+
+    Returns:
+    int
+        The key ID.
+
+    Example:
+    registerKey('f13', scancode=0x64, vk_code=0x7C)
+    """
+
+    key_id = _registerKey(name, scancode, vk_code, shift, extended)
+
+    # Compiled hotkeys hold the old codes
+    parseHotkey.cache_clear()
+    _compileKeys.cache_clear()
+    return key_id
+
+
+def keyId(key):
+    """
+    Resolve a key name to its key ID.
+
+    Every function that takes key names also takes key IDs, which skip name
+    resolution entirely. Each spelling of a name is resolved once and
+    remembered.
+
+    Parameters:
+    key : str or int
+        The key name, or a key ID which is returned unchanged.
+
+    Returns:
+    int
+        The key ID, or 0 if the key is unknown.
+
+    Raises:
+    ValueError
+        If the key is an int that is not a registered key ID.
+
+    Example:
+    CTRL, C = keyId('ctrl'), keyId('c')
+    hotKey(CTRL, C)
+    """
+
+    if key.__class__ is int:
+        if not 0 <= key < len(KEY_NAMES):
+            raise ValueError(f"Unknown key ID: {key}")
+        return key
+    try:
+        return _KEY_IDS[key]
+    except KeyError:
+        key_id = _KEY_IDS.get(key.lower(), 0)
+        if key_id:
+            _KEY_IDS[key] = key_id
+        return key_id
+
+
+def _registerKeys():
+    """Register the keys of the key mappings."""
+    for name in {**DK_CODE, **VK_CODE, **MVB_CODE}:
+        _registerKey(name, DK_CODE.get(name), VK_CODE.get(name, MVB_CODE.get(name)),
+                     name in SHIFT_KEYS, name in EXTENDED_KEYS)
+
+
+_registerKeys()
+
+
+# Keyboard Layouts
+
+# Modifier bits in the high byte of VkKeyScanEx() results
+LAYOUT_SHIFT = 0x01
+LAYOUT_CTRL = 0x02
+LAYOUT_ALT = 0x04
+
+# Virtual key codes pressed for each modifier bit
+_LAYOUT_MODIFIERS = ((LAYOUT_SHIFT, 0x10), (LAYOUT_CTRL, 0x11), (LAYOUT_ALT, 0x12))
+
+# Flag set by MapVirtualKeyEx(MAPVK_VK_TO_CHAR) for dead keys
+_DEAD_KEY = 0x80000000
+
+# Keyboard layout handles of the table-driven layouts
+LAYOUT_US = 0x04090409
+LAYOUT_FRENCH = 0x040C040C
+LAYOUT_GERMAN = 0x04070407
+
+
+def _letterKeys(letters, scancode):
+    """Return the layout keys of a row of letters starting at a scancode."""
+    return [(scancode + i, ord(c.upper()), c, c.upper(), None) for i, c in enumerate(letters)]
+
+
+# Keys of the table-driven layouts used where the Windows API is not
+# available: (scancode, virtual key code, character, shifted character,
+# AltGr character), None where the key types nothing. Dead keys are left out.
+LAYOUT_KEYS = {
+    LAYOUT_US: [
+        (0x29, 0xC0, '`', '~', None),
+        (0x02, 0x31, '1', '!', None), (0x03, 0x32, '2', '@', None),
+        (0x04, 0x33, '3', '#', None), (0x05, 0x34, '4', '$', None),
+        (0x06, 0x35, '5', '%', None), (0x07, 0x36, '6', '^', None),
+        (0x08, 0x37, '7', '&', None), (0x09, 0x38, '8', '*', None),
+        (0x0A, 0x39, '9', '(', None), (0x0B, 0x30, '0', ')', None),
+        (0x0C, 0xBD, '-', '_', None), (0x0D, 0xBB, '=', '+', None),
+        *_letterKeys('qwertyuiop', 0x10),
+        (0x1A, 0xDB, '[', '{', None), (0x1B, 0xDD, ']', '}', None),
+        *_letterKeys('asdfghjkl', 0x1E),
+        (0x27, 0xBA, ';', ':', None), (0x28, 0xDE, '\'', '"', None),
+        (0x2B, 0xDC, '\\', '|', None),
+        *_letterKeys('zxcvbnm', 0x2C),
+        (0x33, 0xBC, ',', '<', None), (0x34, 0xBE, '.', '>', None),
+        (0x35, 0xBF, '/', '?', None),
+        (0x39, 0x20, ' ', None, None)
+    ],
+    LAYOUT_FRENCH: [
+        (0x29, 0xDE, '²', None, None),
+        (0x02, 0x31, '&', '1', None), (0x03, 0x32, 'é', '2', None),
+        (0x04, 0x33, '"', '3', '#'), (0x05, 0x34, '\'', '4', '{'),
+        (0x06, 0x35, '(', '5', '['), (0x07, 0x36, '-', '6', '|'),
+        (0x08, 0x37, 'è', '7', None), (0x09, 0x38, '_', '8', '\\'),
+        (0x0A, 0x39, 'ç', '9', '^'), (0x0B, 0x30, 'à', '0', '@'),
+        (0x0C, 0xDB, ')', '°', ']'), (0x0D, 0xBB, '=', '+', '}'),
+        *_letterKeys('azertyuiop', 0x10),
+        (0x12, 0x45, None, None, '€'),
+        (0x1B, 0xBA, '$', '£', '¤'),
+        *_letterKeys('qsdfghjklm', 0x1E),
+        (0x28, 0xC0, 'ù', '%', None), (0x2B, 0xDC, '*', 'µ', None),
+        (0x56, 0xE2, '<', '>', None),
+        *_letterKeys('wxcvbn', 0x2C),
+        (0x32, 0xBC, ',', '?', None), (0x33, 0xBE, ';', '.', None),
+        (0x34, 0xBF, ':', '/', None), (0x35, 0xDF, '!', '§', None),
+        (0x39, 0x20, ' ', None, None)
+    ],
+    LAYOUT_GERMAN: [
+        (0x29, 0xDC, None, '°', None),
+        (0x02, 0x31, '1', '!', None), (0x03, 0x32, '2', '"', '²'),
+        (0x04, 0x33, '3', '§', '³'), (0x05, 0x34, '4', '$', None),
+        (0x06, 0x35, '5', '%', None), (0x07, 0x36, '6', '&', None),
+        (0x08, 0x37, '7', '/', '{'), (0x09, 0x38, '8', '(', '['),
+        (0x0A, 0x39, '9', ')', ']'), (0x0B, 0x30, '0', '=', '}'),
+        (0x0C, 0xDB, 'ß', '?', '\\'),
+        *_letterKeys('qwertzuiop', 0x10),
+        (0x10, 0x51, None, None, '@'), (0x12, 0x45, None, None, '€'),
+        (0x1A, 0xBA, 'ü', 'Ü', None), (0x1B, 0xBB, '+', '*', '~'),
+        *_letterKeys('asdfghjkl', 0x1E),
+        (0x27, 0xC0, 'ö', 'Ö', None), (0x28, 0xDE, 'ä', 'Ä', None),
+        (0x2B, 0xBF, '#', '\'', None),
+        (0x56, 0xE2, '<', '>', '|'),
+        *_letterKeys('yxcvbnm', 0x2C),
+        (0x32, 0x4D, None, None, 'µ'),
+        (0x33, 0xBC, ',', ';', None), (0x34, 0xBE, '.', ':', None),
+        (0x35, 0xBD, '-', '_', None),
+        (0x39, 0x20, ' ', None, None)
+    ]
+}
+
+
+class TableLayout:
+    """
+    A keyboard layout built from LAYOUT_KEYS, answering VkKeyScanEx() and
+    MapVirtualKeyEx() queries without the Windows API.
+    """
+
+    def __init__(self, keys):
+        """
+        Initialize the layout.
+
+        Args:
+            keys (list): The layout keys as (scancode, vk_code, character,
+                         shifted character, AltGr character) tuples.
+        """
+        self.chars = {}
+        self.scancodes = {}
+        for scancode, vk_code, *chars in keys:
+            self.scancodes.setdefault(vk_code, scancode)
+            for modifiers, c in zip((0, LAYOUT_SHIFT, LAYOUT_CTRL | LAYOUT_ALT), chars):
+                if c is not None:
+                    self.chars.setdefault(c, vk_code | modifiers << 8)
+
+    def vkKeyScan(self, char):
+        """Return the VkKeyScanEx() value of a character, -1 if it cannot be typed."""
+        return self.chars.get(char, -1)
+
+    def mapVirtualKey(self, code, map_type):
+        """Return the MapVirtualKeyEx() value of a virtual key code or scancode."""
+        if map_type == MAPVK_VK_TO_VSC and code in self.scancodes:
+            return self.scancodes[code]
+        return _mapVirtualKey(code, map_type)
+
+
 # C struct redefinitions
 PUL = ctypes.POINTER(ctypes.c_ulong)
 
@@ -321,625 +624,4465 @@ class Input(ctypes.Structure):
                 ("ii", Input_I)]
 
 
-# Keyboard Functions
+class MonitorInfo(ctypes.Structure):
+    _fields_ = [("cbSize", ctypes.c_ulong),
+                ("rcMonitor", wintypes.RECT),
+                ("rcWork", wintypes.RECT),
+                ("dwFlags", ctypes.c_ulong)]
 
-def keyDown(*keys):
-    """
-    Simulate pressing down one or more keys.
 
-    Parameters:
-    *keys : str
-        One or more keys to press down. The key names should correspond to
-        the key mappings.
+# MonitorInfo flag of the primary monitor
+MONITORINFOF_PRIMARY = 0x0001
 
-    Example:
-    keyDown('x', 'y') or keyDown('a')
+
+# Clocks
+
+class Clock:
     """
+    Real time, used for all pacing and timeouts by default.
 
-    # Get virtual key code
-    virtual_key_codes = []
-    for key in keys:
-        try:
-            hexKeyCode = DK_CODE[key.lower()]
-        except Exception:
-            hexKeyCode = 0x00
-        virtual_key_codes.append((key.lower(), hexKeyCode))
-
-    for key, hexKeyCode in virtual_key_codes:
-        keybdFlags = KEYEVENTF_SCANCODE
-
-        # Check if the character is in the shiftKeys list
-        if key in SHIFT_KEYS:
-            # Press the shift key
-            ctypes.windll.user32.keybd_event(0x10, 0, 0, 0)
-
-        # Check if the key is an arrow key and set the extended key flag
-        if key in EXTENDED_KEYS:
-            keybdFlags |= KEYEVENTF_EXTENDEDKEY
-            # Handle Num Lock state for arrow keys
-            if ctypes.windll.user32.GetKeyState(0x90):
-                # Send additional scancode if Num Lock is on
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, 0xE0, KEYEVENTF_SCANCODE, 0, ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
-
-        # Press the key
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.ki = KeyBdInput(
-            0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-        )
-        x = Input(ctypes.c_ulong(1), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
+    Every delay, interval, duration and timeout in this module goes through
+    the active clock, so a VirtualClock can be swapped in with setClock().
+    """
 
-        # Check if the character is in the shiftKeys list
-        if key in SHIFT_KEYS:
-            # Release the shift key
-            ctypes.windll.user32.keybd_event(0x10, 0, 2, 0)
+    def now(self):
+        """Return the current time in seconds from a high-resolution counter."""
+        return time.perf_counter()
 
+    def sleep(self, seconds):
+        """Block for the given number of seconds."""
+        sleep(max(seconds, 0))
 
-def keyUp(*keys):
-    """
-    Simulate releasing one or more keys.
+    async def asleep(self, seconds):
+        """Await for the given number of seconds."""
+        await asyncio.sleep(seconds)
 
-    Parameters:
-    *keys : str
-        One or more keys to release. The key names should correspond to
-        the key mappings.
 
-    Example:
-    keyUp('x', 'y') or keyUp('a')
+class VirtualClock:
     """
+    A clock that advances instantly instead of sleeping.
 
-    # Get virtual key code
-    virtual_key_codes = []
-    for key in keys:
-        try:
-            hexKeyCode = DK_CODE[key.lower()]
-        except Exception:
-            hexKeyCode = 0x00
-        virtual_key_codes.append((key.lower(), hexKeyCode))
-
-    for key, hexKeyCode in virtual_key_codes:
-        keybdFlags = KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
-
-        # Check if the character is in the shiftKeys list
-        if key in SHIFT_KEYS:
-            # Press the shift key
-            ctypes.windll.user32.keybd_event(0x10, 0, 0, 0)
-
-        # Check if the key is an arrow key and set the extended key flag
-        if key in EXTENDED_KEYS:
-            keybdFlags |= KEYEVENTF_EXTENDEDKEY
-            # Handle Num Lock state for arrow keys
-            if ctypes.windll.user32.GetKeyState(0x90):
-                # Send additional scancode if Num Lock is on
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, 0xE0, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP, 0,
-                    ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
-
-        # Release the key
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.ki = KeyBdInput(
-            0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-        )
-        x = Input(ctypes.c_ulong(1), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
+    Sleeping advances the virtual time and records the intended delay, so
+    macros and waits run in no real time while their timing can be verified
+    exactly. Timestamps taken by the RecordingBackend and the InputRecorder
+    use this time.
 
-        # Check if the character is in the shiftKeys list
-        if key in SHIFT_KEYS:
-            # Release the shift key
-            ctypes.windll.user32.keybd_event(0x10, 0, 2, 0)
+    Attributes:
+        time (float): The current virtual time in seconds.
+        sleeps (list): (start time, seconds) for every sleep requested.
+    """
 
+    def __init__(self, start=0.0):
+        """
+        Initialize the virtual clock.
 
-@contextmanager
-def keyHold(*keys):
-    """
-    Simulate holding down one or more specified keys.
+        Args:
+            start (float): The initial virtual time in seconds.
+        """
+        self.time = start
+        self.sleeps = []
+        self._lock = threading.Lock()
 
-    This function simulates pressing and holding one or more specified keys.
-    The keys parameter should be a string, not a list. This function should be
-    used with a `with` statement to ensure that the keys are released after the
-    block of code is executed.
+    def now(self):
+        """Return the current virtual time."""
+        return self.time
 
-    Parameters:
-    *keys : str
-        One or more keys to hold down. The key names should correspond to
-        the key mappings.
+    def sleep(self, seconds):
+        """Advance the virtual time by the given number of seconds."""
+        with self._lock:
+            self.sleeps.append((self.time, seconds))
+            self.time += max(seconds, 0)
 
-    Example:
-    with keyHold('ctrl', 'shift'):
-        keyPress('esc')
-    """
+    async def asleep(self, seconds):
+        """Advance the virtual time and yield to the event loop once."""
+        self.sleep(seconds)
+        await asyncio.sleep(0)
 
-    # Get the virtual key codes
-    virtual_key_codes = []
-    for key in keys:
-        try:
-            hexKeyCode = DK_CODE[key.lower()]
-        except Exception:
-            hexKeyCode = 0x00
-        virtual_key_codes.append((key.lower(), hexKeyCode))
-
-    for key, hexKeyCode in virtual_key_codes:
-        keybdFlags = KEYEVENTF_SCANCODE
-
-        # Check if the key is an arrow key and set the extended key flag
-        if key in EXTENDED_KEYS:
-            keybdFlags |= KEYEVENTF_EXTENDEDKEY
-            # Handle Num Lock state for arrow keys
-            if ctypes.windll.user32.GetKeyState(0x90):
-                # Send additional scancode if Num Lock is on
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, 0xE0, KEYEVENTF_SCANCODE, 0, ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
-
-        # Press the key
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.ki = KeyBdInput(
-            0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-        )
-        x = Input(ctypes.c_ulong(1), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
+    def advance(self, seconds):
+        """Advance the virtual time without recording a sleep."""
+        with self._lock:
+            self.time += seconds
 
-    # Yield control to the calling function
-    yield
-
-    for key, hexKeyCode in virtual_key_codes:
-        keybdFlags = KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
-
-        # Check if the key is an arrow key and set the extended key flag
-        if key in EXTENDED_KEYS:
-            keybdFlags |= KEYEVENTF_EXTENDEDKEY
-            # Handle Num Lock state for arrow keys
-            if ctypes.windll.user32.GetKeyState(0x90):
-                # Send additional scancode if Num Lock is on
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, 0xE0, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP, 0,
-                    ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
-
-        # Release the key
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.ki = KeyBdInput(
-            0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-        )
-        x = Input(ctypes.c_ulong(1), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
 
+_clock = Clock()
 
-def keyPress(keys, interval=0, presses=1,
-             key_delay=DEFAULT_INTERVAL, simultaneously=False):
-    """
-    Simulate pressing one or more keys.
 
-    This function simulates pressing and releasing one or more specified keys.
-    The keys parameter can be a single key or a list of keys. The keys can be
-    pressed either simultaneously or sequentially based on the
-    `simultaneously` parameter. Additionally, the function allows specifying
-    the number of times to press the keys and the interval between presses.
+def setClock(clock):
+    """
+    Set the clock used for all pacing and timeouts.
 
     Parameters:
-    keys : str or list of str
-        The key or list of keys to press. The key names should correspond to
-        the key mappings.
-    interval : float, optional
-        The interval between key presses in seconds (default is 0.01).
-    presses : int, optional
-        The number of times to press the keys (default is 1).
-    key_delay : float, optional
-        The delay between each key press and release in seconds (default is 0.01).
-    simultaneously : bool, optional
-        Whether to press all keys at once (default is False).
-        If False, keys are pressed sequentially.
+    clock : Clock or VirtualClock
+        The clock to use.
+
+    Returns:
+    Clock or VirtualClock
+        The previous clock.
 
     Example:
-    keyPress('a')                                      # Press the 'a' key once.
-    keyPress(['ctrl', 'c'])                            # Press 'ctrl' and 'c' sequentially.
-    keyPress(['ctrl', 'shift'], simultaneously=True)   # Press 'ctrl' and 'shift' simultaneously.
-    keyPress('b', presses=3, interval=0.5)             # Press the 'b' key 3 times with 0.5-second interval.
+    clock = VirtualClock()
+    previous = setClock(clock)
+    keyPress('a', presses=100, interval=0.5)  # Returns immediately
+    print(clock.now())                        # 51.0
+    setClock(previous)
     """
 
-    if not isinstance(keys, list):
-        keys = [keys]
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
 
-    if simultaneously:
-        for _ in range(presses):
-            press_inputs = []
-            release_inputs = []
 
-            for key in keys:
-                # Get virtual key code
-                try:
-                    hexKeyCode = DK_CODE[key.lower()]
-                except Exception:
-                    hexKeyCode = 0x00
-
-                keybdFlags = KEYEVENTF_SCANCODE
-
-                # Check if the character is in the shiftKeys list
-                if key in SHIFT_KEYS:
-                    # Press the shift key
-                    ctypes.windll.user32.keybd_event(0x10, 0, 0, 0)
-
-                # Check if the key is an arrow key and set the extended key flag
-                if key in EXTENDED_KEYS:
-                    keybdFlags |= KEYEVENTF_EXTENDEDKEY
-                    # Handle Num Lock state for arrow keys
-                    if ctypes.windll.user32.GetKeyState(0x90):
-                        # Send additional scancode if Num Lock is on
-                        extra = ctypes.c_ulong(0)
-                        ii_ = Input_I()
-                        ii_.ki = KeyBdInput(
-                            0, 0xE0, KEYEVENTF_SCANCODE, 0, ctypes.pointer(extra)
-                        )
-                        x = Input(ctypes.c_ulong(1), ii_)
-                        ctypes.windll.user32.SendInput(
-                            1, ctypes.pointer(x), ctypes.sizeof(x)
-                        )
+def getClock():
+    """
+    Get the clock used for all pacing and timeouts.
 
-                # Press
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-                )
-                press_inputs.append(Input(ctypes.c_ulong(1), ii_))
+    Returns:
+    Clock or VirtualClock
+        The active clock.
 
-                # Release
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, hexKeyCode, keybdFlags | KEYEVENTF_KEYUP, 0,
-                    ctypes.pointer(extra)
-                )
-                release_inputs.append(Input(ctypes.c_ulong(1), ii_))
-
-                # Check if the character is in the shiftKeys list
-                if key in SHIFT_KEYS:
-                    # Release the shift key
-                    ctypes.windll.user32.keybd_event(0x10, 0, 2, 0)
-
-            press_inputs_array = (Input * len(keys))()
-            for i, input_obj in enumerate(press_inputs):
-                press_inputs_array[i] = input_obj
-            ctypes.windll.user32.SendInput(
-                len(keys), ctypes.pointer(press_inputs_array),
-                ctypes.sizeof(Input)
-            )
-
-            sleep(key_delay)
-
-            release_inputs_array = (Input * len(keys))()
-            for i, input_obj in enumerate(release_inputs):
-                release_inputs_array[i] = input_obj
-            ctypes.windll.user32.SendInput(
-                len(keys), ctypes.pointer(release_inputs_array),
-                ctypes.sizeof(Input)
-            )
-
-            sleep(interval)
+    Example:
+    start = getClock().now()
+    """
 
-    else:
-        for _ in range(presses):
-            for key in keys:
-                # Get virtual key code
-                try:
-                    hexKeyCode = DK_CODE[key.lower()]
-                except Exception:
-                    hexKeyCode = 0x00
-
-                keybdFlags = KEYEVENTF_SCANCODE
-
-                # Check if the character is in the shiftKeys list
-                if key in SHIFT_KEYS:
-                    # Press the shift key
-                    ctypes.windll.user32.keybd_event(0x10, 0, 0, 0)
-
-                # Check if the key is an arrow key and set the extended key flag
-                if key in EXTENDED_KEYS:
-                    keybdFlags |= KEYEVENTF_EXTENDEDKEY
-                    # Handle Num Lock state for arrow keys
-                    if ctypes.windll.user32.GetKeyState(0x90):
-                        # Send additional scancode if Num Lock is on
-                        extra = ctypes.c_ulong(0)
-                        ii_ = Input_I()
-                        ii_.ki = KeyBdInput(
-                            0, 0xE0, KEYEVENTF_SCANCODE, 0, ctypes.pointer(extra)
-                        )
-                        x = Input(ctypes.c_ulong(1), ii_)
-                        ctypes.windll.user32.SendInput(
-                            1, ctypes.pointer(x), ctypes.sizeof(x)
-                        )
+    return _clock
 
-                # Press
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
-
-                sleep(key_delay)
 
-                # Release
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, hexKeyCode, keybdFlags | KEYEVENTF_KEYUP, 0, ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
+# Backends
+
+class Win32Backend:
+    """
+    Inject input and query input state with the Windows API.
 
-                # Check if the character is in the shiftKeys list
-                if key in SHIFT_KEYS:
-                    # Release the shift key
-                    ctypes.windll.user32.keybd_event(0x10, 0, 2, 0)
+    All functions reach the operating system through the active backend, so
+    another backend can be swapped in with setBackend() to run without a
+    desktop.
+    """
 
-                sleep(interval)
+    def __init__(self):
+        """Load user32 and kernel32."""
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+
+        # Keyboard layout handles are pointer-sized
+        self.user32.GetKeyboardLayout.restype = wintypes.HKL
+        self.user32.VkKeyScanExW.argtypes = (wintypes.WCHAR, wintypes.HKL)
+        self.user32.VkKeyScanExW.restype = ctypes.c_short
+        self.user32.MapVirtualKeyExW.argtypes = (wintypes.UINT, wintypes.UINT, wintypes.HKL)
+        self.user32.MapVirtualKeyExW.restype = wintypes.UINT
+
+        # Window handles are pointer-sized
+        self._enum_proc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+        self.user32.EnumWindows.argtypes = (self._enum_proc, wintypes.LPARAM)
+        self.user32.IsWindow.argtypes = (wintypes.HWND,)
+        self.user32.IsWindowVisible.argtypes = (wintypes.HWND,)
+        self.user32.GetWindowTextLengthW.argtypes = (wintypes.HWND,)
+        self.user32.GetWindowTextW.argtypes = (wintypes.HWND, wintypes.LPWSTR, ctypes.c_int)
+        self.user32.GetClassNameW.argtypes = (wintypes.HWND, wintypes.LPWSTR, ctypes.c_int)
+        self.user32.GetClientRect.argtypes = (wintypes.HWND, ctypes.POINTER(wintypes.RECT))
+        self.user32.ClientToScreen.argtypes = (wintypes.HWND, ctypes.POINTER(wintypes.POINT))
+
+        # Monitor handles are pointer-sized
+        self._monitor_proc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HMONITOR, wintypes.HDC,
+                                                ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+        self.user32.EnumDisplayMonitors.argtypes = (wintypes.HDC, ctypes.POINTER(wintypes.RECT),
+                                                    self._monitor_proc, wintypes.LPARAM)
+        self.user32.GetMonitorInfoW.argtypes = (wintypes.HMONITOR, ctypes.POINTER(MonitorInfo))
+
+    def sendInput(self, count, inputs):
+        """Inject `count` Input events and return how many were inserted."""
+        return self.user32.SendInput(count, inputs, ctypes.sizeof(Input))
+
+    def getLastError(self):
+        """Return the last Windows error code."""
+        return self.kernel32.GetLastError()
+
+    def getKeyState(self, vk_code):
+        """Return the GetKeyState() value of a virtual key."""
+        return self.user32.GetKeyState(vk_code)
+
+    def getAsyncKeyState(self, vk_code):
+        """Return the GetAsyncKeyState() value of a virtual key."""
+        return self.user32.GetAsyncKeyState(vk_code)
+
+    def setCursorPos(self, x, y):
+        """Move the cursor to a screen position."""
+        self.user32.SetCursorPos(x, y)
+
+    def getCursorPos(self):
+        """Return the cursor position as a Point."""
+        cursor = wintypes.POINT()
+        self.user32.GetCursorPos(byref(cursor))
+        return Point(cursor.x, cursor.y)
+
+    def getSystemMetrics(self, index):
+        """Return a GetSystemMetrics() value."""
+        return self.user32.GetSystemMetrics(index)
+
+    def getKeyboardLayout(self):
+        """Return the keyboard layout handle of the foreground window's thread."""
+        thread = self.user32.GetWindowThreadProcessId(self.user32.GetForegroundWindow(), None)
+        return self.user32.GetKeyboardLayout(thread)
+
+    def vkKeyScan(self, char, layout):
+        """Return the VkKeyScanEx() value of a character in a keyboard layout."""
+        return self.user32.VkKeyScanExW(char, layout)
+
+    def mapVirtualKey(self, code, map_type, layout):
+        """Return the MapVirtualKeyEx() value of a code in a keyboard layout."""
+        return self.user32.MapVirtualKeyExW(code, map_type, layout)
+
+    def enumWindows(self):
+        """Return (handle, title, class name) of every visible top-level window, front to back."""
+        windows = []
+        title = ctypes.create_unicode_buffer(512)
+        class_name = ctypes.create_unicode_buffer(256)
+
+        def callback(hwnd, _):
+            if self.user32.IsWindowVisible(hwnd):
+                self.user32.GetWindowTextW(hwnd, title, len(title))
+                self.user32.GetClassNameW(hwnd, class_name, len(class_name))
+                windows.append((hwnd, title.value, class_name.value))
+            return True
+
+        self.user32.EnumWindows(self._enum_proc(callback), 0)
+        return windows
+
+    def getClientRect(self, hwnd):
+        """Return a window's client area (left, top, width, height) on the screen, or None if it is gone."""
+        if not self.user32.IsWindow(hwnd):
+            return None
+        rect = wintypes.RECT()
+        origin = wintypes.POINT(0, 0)
+        if not self.user32.GetClientRect(hwnd, byref(rect)) or not self.user32.ClientToScreen(hwnd, byref(origin)):
+            return None
+        return (origin.x, origin.y, rect.right - rect.left, rect.bottom - rect.top)
+
+    def enumMonitors(self):
+        """Return (left, top, width, height, primary) of every display monitor on the virtual screen."""
+        monitors = []
+
+        def callback(hmonitor, hdc, rect, _):
+            info = MonitorInfo()
+            info.cbSize = ctypes.sizeof(MonitorInfo)
+            if self.user32.GetMonitorInfoW(hmonitor, byref(info)):
+                bounds = info.rcMonitor
+                monitors.append((bounds.left, bounds.top, bounds.right - bounds.left,
+                                 bounds.bottom - bounds.top, bool(info.dwFlags & MONITORINFOF_PRIMARY)))
+            return True
+
+        self.user32.EnumDisplayMonitors(None, None, self._monitor_proc(callback), 0)
+        return monitors
+
+
+class RecordingBackend:
+    """
+    Record injected input instead of sending it to the operating system.
 
+    Keyboard and mouse events are appended to `events` as MacroEvent tuples
+    timestamped with the active clock, the cursor position follows
+    injected moves, and key state follows injected keys. This backend works on
+    any platform and is used by default outside Windows, for tests and
+    benchmarks.
 
-def hotKey(*keys, **kwargs):
+    Attributes:
+        events (list): The recorded MacroEvent tuples. Keyboard events store
+                       the scancode, or the virtual key code for virtual key events.
+        record (bool): Whether events are appended to `events`.
+        insert_limit (int): Maximum number of events inserted per call, to
+                            simulate a busy input queue. None inserts all.
+        layout (int): The simulated keyboard layout handle, a key of LAYOUT_KEYS.
+        cursor (Point): The current cursor position.
+        screen_size (Size): The simulated size of the primary monitor.
+        monitors (list): The simulated monitors as (left, top, width, height, primary).
+        pressed (set): Virtual key codes currently held down.
+        windows (dict): Simulated window handles mapped to [title, class name,
+                        client area (left, top, width, height)], front to back.
     """
-    Simulate pressing a combination of keys simultaneously.
 
-    This function simulates pressing and holding down a combination of keys simultaneously,
-    followed by releasing them.
-    The keys parameter can accept multiple key arguments to form the hotkey combination.
+    def __init__(self, screen_size=(1920, 1080), record=True, insert_limit=None,
+                 layout=LAYOUT_US, monitors=None):
+        """
+        Initialize the recording backend.
+
+        Args:
+            screen_size (tuple): The simulated size (width, height) of the primary monitor.
+            record (bool): Whether events are kept. Disable for long benchmarks.
+            insert_limit (int): Maximum number of events inserted per call.
+            layout (int): The simulated keyboard layout handle (default is LAYOUT_US).
+            monitors (list): The simulated monitors as (left, top, width, height, primary).
+                             If not specified, a single primary monitor of screen_size.
+        """
+        self.events = []
+        self.record = record
+        self.insert_limit = insert_limit
+        self.layout = layout
+        self._layouts = {}
+        self.cursor = Point(0, 0)
+        self.screen_size = Size(*screen_size)
+        if monitors is None:
+            monitors = [(0, 0, self.screen_size.width, self.screen_size.height, True)]
+        self.monitors = [tuple(monitor) for monitor in monitors]
+        self.pressed = set()
+        self.windows = {}
+        self.calls = 0
+
+    def sendInput(self, count, inputs):
+        """Record up to `insert_limit` Input events and return how many were inserted."""
+        self.calls += 1
+        if self.insert_limit is not None:
+            count = min(count, self.insert_limit)
+
+        now = _clock.now()
+        for i in range(count):
+            event = inputs[i]
+            if event.type == INPUT_KEYBOARD:
+                ki = event.ii.ki
+                scancode = ki.dwFlags & KEYEVENTF_SCANCODE
+                code = ki.wScan if ki.dwFlags & (KEYEVENTF_SCANCODE | KEYEVENTF_UNICODE) else ki.wVk
+                vk_code = ki.wVk
+                if scancode:
+                    name = _SCAN_NAMES.get((ki.wScan, bool(ki.dwFlags & KEYEVENTF_EXTENDEDKEY)))
+                    vk_code = VK_CODE.get(name, 0)
+                if ki.dwFlags & KEYEVENTF_KEYUP:
+                    self.pressed.discard(vk_code)
+                else:
+                    self.pressed.add(vk_code)
+                if self.record:
+                    self.events.append(MacroEvent(now, INPUT_KEYBOARD, code, ki.dwFlags, 0, 0, 0))
+            else:
+                mi = event.ii.mi
+                if mi.dwFlags & MOUSEEVENTF_MOVE:
+                    if mi.dwFlags & MOUSEEVENTF_ABSOLUTE:
+                        # Absolute coordinates span the primary monitor or the virtual screen
+                        left, top = 0, 0
+                        width, height = self.screen_size
+                        if mi.dwFlags & MOUSEEVENTF_VIRTUALDESK:
+                            left, top, width, height = self._virtualScreen()
+                        self.cursor = _absolutePosition(mi.dx, mi.dy, (left, top, width, height))
+                    else:
+                        self.cursor = Point(self.cursor.x + mi.dx, self.cursor.y + mi.dy)
+                if self.record:
+                    self.events.append(MacroEvent(now, INPUT_MOUSE, 0, mi.dwFlags,
+                                                  mi.dx, mi.dy, ctypes.c_int32(mi.mouseData).value))
+        return count
+
+    def getLastError(self):
+        """Return 0, no Windows error is ever set."""
+        return 0
+
+    def getKeyState(self, vk_code):
+        """Return the simulated GetKeyState() value of a virtual key."""
+        return 0x8000 if vk_code in self.pressed else 0
+
+    def getAsyncKeyState(self, vk_code):
+        """Return the simulated GetAsyncKeyState() value of a virtual key."""
+        return 0x8000 if vk_code in self.pressed else 0
+
+    def setCursorPos(self, x, y):
+        """Move the simulated cursor."""
+        self.cursor = Point(int(x), int(y))
+
+    def getCursorPos(self):
+        """Return the simulated cursor position."""
+        return self.cursor
+
+    def _virtualScreen(self):
+        """Return the bounding box (left, top, width, height) of the simulated monitors."""
+        left = min(monitor[0] for monitor in self.monitors)
+        top = min(monitor[1] for monitor in self.monitors)
+        right = max(monitor[0] + monitor[2] for monitor in self.monitors)
+        bottom = max(monitor[1] + monitor[3] for monitor in self.monitors)
+        return left, top, right - left, bottom - top
+
+    def getSystemMetrics(self, index):
+        """Return a simulated GetSystemMetrics() value for the screen metrics."""
+        width, height = self.screen_size
+        left, top, virtual_width, virtual_height = self._virtualScreen()
+        return {0: width, 1: height, 76: left, 77: top, 78: virtual_width, 79: virtual_height,
+                80: len(self.monitors)}.get(index, 0)
+
+    def enumMonitors(self):
+        """Return the simulated monitors."""
+        return list(self.monitors)
+
+    def getKeyboardLayout(self):
+        """Return the simulated keyboard layout handle."""
+        return self.layout
+
+    def _tableLayout(self, layout):
+        """Return the TableLayout of a layout handle."""
+        table = self._layouts.get(layout)
+        if table is None:
+            table = self._layouts[layout] = TableLayout(LAYOUT_KEYS.get(layout, ()))
+        return table
+
+    def vkKeyScan(self, char, layout):
+        """Return the VkKeyScanEx() value of a character in a table-driven layout."""
+        return self._tableLayout(layout).vkKeyScan(char)
+
+    def mapVirtualKey(self, code, map_type, layout):
+        """Return the MapVirtualKeyEx() value of a code in a table-driven layout."""
+        return self._tableLayout(layout).mapVirtualKey(code, map_type)
+
+    def addWindow(self, title, rect, class_name=''):
+        """Add a simulated window with a client area (left, top, width, height) and return its handle."""
+        hwnd = max(self.windows, default=0x10000) + 2
+        self.windows[hwnd] = [title, class_name, tuple(rect)]
+        return hwnd
+
+    def enumWindows(self):
+        """Return (handle, title, class name) of every simulated window."""
+        return [(hwnd, title, class_name) for hwnd, (title, class_name, _) in self.windows.items()]
+
+    def getClientRect(self, hwnd):
+        """Return the client area of a simulated window, or None if it is gone."""
+        window = self.windows.get(hwnd)
+        return None if window is None else window[2]
+
+    def clear(self):
+        """Discard the recorded events."""
+        self.events = []
+
+
+_backend = Win32Backend() if sys.platform == 'win32' else RecordingBackend()
+
+
+def setBackend(backend):
+    """
+    Set the backend used to inject input and query input state.
 
     Parameters:
-    *keys : str
-        One or more keys to press as part of the hotkey combination.
-        The key names should correspond to
-        the key mappings.
-    key_delay : float, optional
-        The delay between each key press and release in seconds (default is 0.01).
+    backend : Win32Backend or RecordingBackend
+        The backend to use. Any object with the same methods can be used.
+
+    Returns:
+    object
+        The previous backend.
 
     Example:
-    hotKey('ctrl', 'shift', 'esc')  # Simulate pressing 'Ctrl + Shift + Esc' simultaneously.
+    recorder = RecordingBackend()
+    previous = setBackend(recorder)
+    keyPress('a')
+    print(recorder.events)
+    setBackend(previous)
     """
-    key_delay = kwargs.get('key_delay', DEFAULT_INTERVAL)
-
-    # Get the virtual key codes for the keys in the hotkey sequence
-    virtual_key_codes = []
-    for key in keys:
-        # Get virtual key code
-        try:
-            hexKeyCode = DK_CODE[key.lower()]
-        except Exception:
-            hexKeyCode = 0x00
-        virtual_key_codes.append((key.lower(), hexKeyCode))
-
-    # Press the keys in the hotkey sequence
-    for key, hexKeyCode in virtual_key_codes:
-        keybdFlags = KEYEVENTF_SCANCODE
-
-        # Check if the key is an arrow key and set the extended key flag
-        if key in EXTENDED_KEYS:
-            keybdFlags |= KEYEVENTF_EXTENDEDKEY
-            # Handle Num Lock state for arrow keys
-            if ctypes.windll.user32.GetKeyState(0x90):
-                # Send additional scancode if Num Lock is on
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, 0xE0, KEYEVENTF_SCANCODE, 0, ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
-
-        # Press
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.ki = KeyBdInput(
-            0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-        )
-        x = Input(ctypes.c_ulong(1), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
-
-        sleep(key_delay)
-
-    # Release the keys in reverse order
-    for key, hexKeyCode in reversed(virtual_key_codes):
-        keybdFlags = KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
-
-        # Check if the key is an arrow key and set the extended key flag
-        if key in EXTENDED_KEYS:
-            keybdFlags |= KEYEVENTF_EXTENDEDKEY
-            # Handle Num Lock state for arrow keys
-            if ctypes.windll.user32.GetKeyState(0x90):
-                # Send additional scancode if Num Lock is on
-                extra = ctypes.c_ulong(0)
-                ii_ = Input_I()
-                ii_.ki = KeyBdInput(
-                    0, 0xE0, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP, 0,
-                    ctypes.pointer(extra)
-                )
-                x = Input(ctypes.c_ulong(1), ii_)
-                ctypes.windll.user32.SendInput(
-                    1, ctypes.pointer(x), ctypes.sizeof(x)
-                )
-
-        # Release
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.ki = KeyBdInput(
-            0, hexKeyCode, keybdFlags, 0, ctypes.pointer(extra)
-        )
-        x = Input(ctypes.c_ulong(1), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
 
-        sleep(key_delay)
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
 
 
-def write(text: str, interval=0.0, key_delay=0.03):
+def getBackend():
     """
-    Types out a given text string.
-
-    This function simulates typing out a given text string character by character.
-    Optionally, a speed (in seconds) between key presses can be specified to
-    simulate a more natural typing speed. If a character is not recognized,
-    it will be copied and pasted from the clipboard.
+    Get the backend used to inject input and query input state.
 
-    Parameters:
-    text : str
-        The text string to type out.
-    interval : float, optional
-        The interval (in seconds) between each character (default is 0.0).
-    key_delay : float, optional
-        The delay between key press and release for each character (default is 0.03 seconds).
+    Returns:
+    object
+        The active backend.
 
     Example:
-    write("Hello, World!", interval=0.1)
+    backend = getBackend()
     """
 
-    # Load the user32 library
-    user32 = ctypes.windll.user32
-
-    # Iterate through each character in the text
-    for c in text:
-        # Look up the virtual key code for the character
-        # in the VK_CODE dictionary
-        try:
-            vk_code = VK_CODE[c]
-        except Exception:
-            # If the character isn't in the VK_CODE,
-            # copy it to the clipboard and simulate a paste operation
-            pyperclip.copy(c)
-            hotKey('ctrl', 'v', interval=key_delay)
-        else:
-            # Check if the character is in the shiftKeys list
-            if c in SHIFT_KEYS:
-                # Press the shift key
-                user32.keybd_event(0x10, 0, 0, 0)
+    return _backend
 
-            # Send a WM_KEYDOWN message for the key
-            # corresponding to the virtual key code
-            user32.keybd_event(vk_code, 0, 0, 0)
 
-            sleep(key_delay)
+# Capture Backends
 
-            # Send a WM_KEYUP message for the key
-            # corresponding to the virtual key code
-            user32.keybd_event(vk_code, 0, 2, 0)
+def _bgraFrame(frame):
+    """Return an image file path or array as a contiguous uint8 BGRA array."""
+    if isinstance(frame, (str, os.PathLike)):
+        path = frame
+        frame = imread(os.fspath(path))
+        if frame is None:
+            raise FileNotFoundError(f"Cannot read image: {path}")
+    frame = numpy.asarray(frame, dtype=numpy.uint8)
+    if frame.ndim == 2:
+        return cvtColor(frame, COLOR_GRAY2BGRA)
+    if frame.shape[2] == 3:
+        return cvtColor(frame, COLOR_BGR2BGRA)
+    return numpy.ascontiguousarray(frame)
 
-            # Check if the character is in the shiftKeys list
-            if c in SHIFT_KEYS:
-                # Release the shift key
-                user32.keybd_event(0x10, 0, 2, 0)
 
-        # Define the time delay between each characters
-        sleep(interval)
+def _bgraImage(frame):
+    """Convert a BGR or BGRA array to an RGB Image."""
+    code = COLOR_BGRA2RGB if frame.shape[2] == 4 else COLOR_BGR2RGB
+    return Image.fromarray(cvtColor(frame, code))
 
 
-def keyDetect(*keys):
+def generateScene(size=(1920, 1080), seed=0):
     """
-    Check if one or more specified keys are currently pressed.
+    Generate a deterministic desktop-like BGRA frame.
 
-    This function checks the state of one or more specified keys to determine
-    if they are currently pressed. The keys parameter can be a single key (as a string) or a combination.
-    The function returns True if all specified keys are pressed,
-    and False if any key is not pressed or not recognized.
+    The scene has a smooth background, window-like rectangles with title bars
+    and borders, and pixel noise, so it has structure at several scales for
+    image matching.
 
     Parameters:
-    keys : str
-        The key or list of keys to check. The key names should correspond to
-        the key mappings.
-        It can take keyboard keys and also mouse buttons.
+    size : tuple, optional
+        The frame size (width, height) (default is (1920, 1080)).
+    seed : int, optional
+        The random seed, the same seed always generates the same scene (default is 0).
 
     Returns:
-    bool
-        True if all specified keys are pressed, False otherwise.
+    numpy.ndarray
+        The frame as a (height, width, 4) uint8 BGRA array.
 
     Example:
-    keyDetect('a')           # Check if the 'a' key is pressed.
-    keyDetect('ctrl', 'c')   # Check if both 'ctrl' and 'c' keys are pressed.
-    keyDetect('left_mouse')  # Check if left mouse button is pressed.
-    keyDetect('xbutton1')    # Check if mouse xbutton1 is pressed.
+    frame = generateScene((800, 600), seed=1)
     """
-    user32 = ctypes.windll.user32
-    KEY_CODE = {**VK_CODE, **MVB_CODE}
 
-    # Check if keys is a single key (string) and convert it to a list
-    if isinstance(keys, str):
-        keys = [keys]
+    width, height = size
+    rng = numpy.random.default_rng(seed)
+
+    # Upscale a coarse random grid into a blocky background
+    cell = 16
+    coarse = rng.integers(32, 160, (height // cell + 1, width // cell + 1, 3), dtype=numpy.uint8)
+    frame = numpy.repeat(numpy.repeat(coarse, cell, axis=0), cell, axis=1)[:height, :width]
+    frame = numpy.ascontiguousarray(frame)
+
+    # Windows with a border, a title bar and a few controls
+    for _ in range(max(width * height // 120000, 4)):
+        w = int(rng.integers(width // 8, width // 2 + 1))
+        h = int(rng.integers(height // 8, height // 2 + 1))
+        x = int(rng.integers(0, width - w + 1))
+        y = int(rng.integers(0, height - h + 1))
+        frame[y:y + h, x:x + w] = rng.integers(0, 256, 3, dtype=numpy.uint8)
+        frame[y:y + min(24, h), x:x + w] = rng.integers(0, 256, 3, dtype=numpy.uint8)
+        frame[y:y + h, x:x + 1] = frame[y:y + h, x + w - 1:x + w] = 0
+        frame[y:y + 1, x:x + w] = frame[y + h - 1:y + h, x:x + w] = 0
+        for _ in range(int(rng.integers(2, 8))):
+            cw = int(rng.integers(8, max(w // 4, 9)))
+            ch = int(rng.integers(8, max(h // 6, 9)))
+            cx = x + int(rng.integers(0, max(w - cw, 1)))
+            cy = y + min(24, h) + int(rng.integers(0, max(h - ch - 24, 1)))
+            frame[cy:cy + ch, cx:cx + cw] = rng.integers(0, 256, 3, dtype=numpy.uint8)
+
+    frame = frame.astype(numpy.int16)
+    frame += rng.integers(-8, 9, frame.shape, dtype=numpy.int16)
+    frame = numpy.clip(frame, 0, 255).astype(numpy.uint8)
+    return cvtColor(frame, COLOR_BGR2BGRA)
+
+
+class MssCapture:
+    """
+    Capture the screen with mss.
 
-    pressed_keys = []
-    for key_code in range(0x01, 0xFE):
-        key_state = user32.GetAsyncKeyState(key_code)
-        if key_state & 0x8000:  # Check if key is held down
-            pressed_keys.append(hex(key_code))
+    Frames are BGRA arrays. One mss instance is kept per thread, since the
+    instances cannot be shared between threads and opening one for every
+    grab is slow.
+    """
 
-    for key in keys:
-        if hex(KEY_CODE.get(key.lower(), 0)) not in pressed_keys:
-            return False
+    def __init__(self):
+        """Initialize the per-thread mss instances."""
+        self._local = threading.local()
+
+    def _sct(self):
+        """Return the mss instance of the calling thread."""
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+        return sct
+
+    def _grab(self, region):
+        """Grab a region, or the primary monitor if region is None."""
+        sct = self._sct()
+        if region is None:
+            monitor = sct.monitors[1]
+        else:
+            left, top, width, height = region
+            monitor = {'left': int(left), 'top': int(top), 'width': int(width), 'height': int(height)}
+        return sct.grab(monitor)
 
-    # If all keys are pressed, return True
-    return True
+    def grab(self, region=None):
+        """Return a region (left, top, width, height) of the screen as a BGRA array."""
+        return numpy.asarray(self._grab(region))
 
+    def screenshot(self, region=None):
+        """Return a region of the screen as an RGB Image."""
+        shot = self._grab(region)
+        return Image.frombytes('RGB', shot.size, shot.bgra, 'raw', 'BGRX')
 
-# Mouse Functions
 
-def mouseClick(button='left', interval=0, presses=1,
-               key_delay=DEFAULT_INTERVAL):
+class PyscreezeCapture:
     """
-    Simulate mouse click events.
+    Capture the screen with pyscreeze.
 
-    This function simulates mouse click events for a specified mouse button.
-    The button parameter determines which mouse button to click,
-    and the presses parameter specifies the number of times to click the button.
+    Frames are BGR arrays converted from the RGB images pyscreeze returns.
+    """
 
-    Parameters:
-    button : str, optional
-        The mouse button to click ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
-    interval : float, optional
+    def grab(self, region=None):
+        """Return a region (left, top, width, height) of the screen as a BGR array."""
+        return cvtColor(numpy.asarray(self.screenshot(region)), COLOR_RGB2BGR)
+
+    def screenshot(self, region=None):
+        """Return a region of the screen as an RGB Image."""
+        return pyscreeze.screenshot(region=region)
+
+
+class SyntheticCapture:
+    """
+    Serve frames from files, arrays or a generated scene instead of the screen.
+
+    Each grab returns the current frame and advances to the next one, so a
+    recorded sequence of frames can be replayed to test and benchmark image
+    matching without a desktop.
+
+    Attributes:
+        frames (list): The frames as BGRA arrays.
+        index (int): The index of the frame returned by the next grab.
+        loop (bool): Whether to start over after the last frame. If False,
+                     the last frame is repeated.
+    """
+
+    def __init__(self, frames=None, size=(1920, 1080), seed=0, loop=True):
+        """
+        Initialize the synthetic capture.
+
+        Args:
+            frames: An image file path or array, or a list of them. Arrays can be
+                    grayscale, BGR or BGRA. If None, a scene is generated.
+            size (tuple): The size (width, height) of the generated scene.
+            seed (int): The random seed of the generated scene.
+            loop (bool): Whether to start over after the last frame.
+        """
+        if frames is None:
+            frames = [generateScene(size, seed)]
+        elif isinstance(frames, (str, os.PathLike, numpy.ndarray)):
+            frames = [frames]
+        self.frames = [_bgraFrame(frame) for frame in frames]
+        self.index = 0
+        self.loop = loop
+        self._lock = threading.Lock()
+
+    def push(self, frame):
+        """Append a frame (file path or array) to the sequence."""
+        with self._lock:
+            self.frames.append(_bgraFrame(frame))
+
+    def _next(self):
+        """Return the current frame and advance the sequence."""
+        with self._lock:
+            frame = self.frames[self.index]
+            if self.index + 1 < len(self.frames):
+                self.index += 1
+            elif self.loop:
+                self.index = 0
+            return frame
+
+    def grab(self, region=None):
+        """Return a region (left, top, width, height) of the next frame as a BGRA array."""
+        frame = self._next()
+        if region is not None:
+            left, top, width, height = (int(v) for v in region)
+            frame = frame[max(top, 0):max(top + height, 0), max(left, 0):max(left + width, 0)]
+        return frame.copy()
+
+    def screenshot(self, region=None):
+        """Return a region of the next frame as an RGB Image."""
+        return _bgraImage(self.grab(region))
+
+
+# Capture backend names accepted by setCaptureBackend()
+CAPTURE_BACKENDS = {
+    'mss': MssCapture,
+    'pyscreeze': PyscreezeCapture,
+    'synthetic': SyntheticCapture
+}
+
+_capture = MssCapture()
+
+
+def setCaptureBackend(backend):
+    """
+    Set the backend used by screenshot() and locateImage() to capture the screen.
+
+    Parameters:
+    backend : str or object
+        A name from CAPTURE_BACKENDS ('mss', 'pyscreeze' or 'synthetic'), or a
+        backend instance. Any object with grab(region) and screenshot(region)
+        methods can be used.
+
+    Returns:
+    object
+        The previous capture backend.
+
+    Example:
+    setCaptureBackend('pyscreeze')
+    previous = setCaptureBackend(SyntheticCapture(['frame1.png', 'frame2.png']))
+    position = locateImage('button.png')
+    setCaptureBackend(previous)
+    """
+
+    global _capture
+    if isinstance(backend, str):
+        if backend not in CAPTURE_BACKENDS:
+            raise ValueError(f"Unknown capture backend: {backend}")
+        backend = CAPTURE_BACKENDS[backend]()
+    previous, _capture = _capture, backend
+    return previous
+
+
+def getCaptureBackend():
+    """
+    Get the backend used to capture the screen.
+
+    Returns:
+    object
+        The active capture backend.
+
+    Example:
+    backend = getCaptureBackend()
+    """
+
+    return _capture
+
+
+# Instrumentation
+
+# Latency histogram buckets: bucket i holds durations up to
+# HISTOGRAM_BASE * 2 ** (i / HISTOGRAM_STEPS) seconds
+HISTOGRAM_BASE = 1e-6
+HISTOGRAM_STEPS = 4
+HISTOGRAM_BUCKETS = 120
+
+
+class Instrumentation:
+    """
+    Runtime counters for the input and capture functions.
+
+    Records per-function call counts and wall-time histograms, syscall
+    counts, and how many events were requested and actually inserted by
+    SendInput. Histograms use fixed logarithmic buckets, so memory use does
+    not grow with the number of calls.
+
+    Attributes:
+        functions (dict): Function name mapped to [calls, total, max, histogram].
+        syscalls (dict): Syscall name mapped to call count.
+        requested (int): Number of events passed to SendInput.
+        injected (int): Number of events SendInput reported as inserted.
+        short_writes (int): Number of SendInput calls that inserted fewer events than requested.
+        retries (int): Number of SendInput calls resubmitting the tail of a batch.
+        failures (int): Number of batches still incomplete after all retries.
+    """
+
+    def __init__(self):
+        """Initialize empty counters."""
+        self.functions = {}
+        self.syscalls = {}
+        self.requested = 0
+        self.injected = 0
+        self.short_writes = 0
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def recordCall(self, name, elapsed):
+        """Record one call of a function and its wall time in seconds."""
+        if elapsed > HISTOGRAM_BASE:
+            bucket = min(int(math.log2(elapsed / HISTOGRAM_BASE) * HISTOGRAM_STEPS) + 1,
+                         HISTOGRAM_BUCKETS - 1)
+        else:
+            bucket = 0
+
+        with self._lock:
+            entry = self.functions.get(name)
+            if entry is None:
+                entry = self.functions[name] = [0, 0.0, 0.0, [0] * HISTOGRAM_BUCKETS]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            entry[3][bucket] += 1
+
+    def recordSyscall(self, name, count=1):
+        """Record calls to a Windows API function."""
+        with self._lock:
+            self.syscalls[name] = self.syscalls.get(name, 0) + count
+
+    def recordInjection(self, requested, inserted, retry=False):
+        """Record the result of a SendInput call."""
+        with self._lock:
+            self.syscalls['SendInput'] = self.syscalls.get('SendInput', 0) + 1
+            self.requested += requested
+            self.injected += inserted
+            if inserted < requested:
+                self.short_writes += 1
+            if retry:
+                self.retries += 1
+
+    def recordFailure(self):
+        """Record a batch that could not be fully inserted after retrying."""
+        with self._lock:
+            self.failures += 1
+
+    @staticmethod
+    def _percentile(histogram, calls, fraction):
+        """Return the upper bound of the bucket holding the given fraction of calls."""
+        target = fraction * calls
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if seen >= target:
+                return HISTOGRAM_BASE * 2 ** (bucket / HISTOGRAM_STEPS)
+        return HISTOGRAM_BASE * 2 ** ((HISTOGRAM_BUCKETS - 1) / HISTOGRAM_STEPS)
+
+    def snapshot(self):
+        """
+        Get a copy of the counters.
+
+        Returns:
+            dict: 'functions' with calls, total, mean, p50, p99 and max wall
+                  time per function in seconds, 'syscalls' with call counts,
+                  and 'events' with requested, injected, short_writes,
+                  retries and failures.
+        """
+        with self._lock:
+            functions = {}
+            for name, (calls, total, maximum, histogram) in self.functions.items():
+                functions[name] = {
+                    'calls': calls,
+                    'total': total,
+                    'mean': total / calls,
+                    'p50': min(self._percentile(histogram, calls, 0.50), maximum),
+                    'p99': min(self._percentile(histogram, calls, 0.99), maximum),
+                    'max': maximum
+                }
+            return {
+                'functions': functions,
+                'syscalls': dict(self.syscalls),
+                'events': {
+                    'requested': self.requested,
+                    'injected': self.injected,
+                    'short_writes': self.short_writes,
+                    'retries': self.retries,
+                    'failures': self.failures
+                }
+            }
+
+
+_instrumentation = None
+
+
+def _instrumented(func):
+    """Record calls of a public function while instrumentation is enabled."""
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            stats = _instrumentation
+            if stats is None:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                stats.recordCall(name, time.perf_counter() - start)
+    else:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = _instrumentation
+            if stats is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.recordCall(name, time.perf_counter() - start)
+
+    return wrapper
+
+
+def enableInstrumentation():
+    """
+    Start recording call counts, latencies and SendInput results.
+
+    Instrumentation is disabled by default, in which case it costs a single
+    global lookup per call. Enabling it again keeps the existing counters.
+
+    Example:
+    enableInstrumentation()
+    keyPress('a')
+    print(getInstrumentation()['functions']['keyPress'])
+    """
+
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+
+
+def disableInstrumentation():
+    """
+    Stop recording and discard the counters.
+
+    Example:
+    disableInstrumentation()
+    """
+
+    global _instrumentation
+    _instrumentation = None
+
+
+def resetInstrumentation():
+    """
+    Clear the counters without disabling instrumentation.
+
+    Example:
+    resetInstrumentation()
+    """
+
+    global _instrumentation
+    if _instrumentation is not None:
+        _instrumentation = Instrumentation()
+
+
+def getInstrumentation():
+    """
+    Get a snapshot of the instrumentation counters.
+
+    Returns:
+    dict or None
+        The counters as described in Instrumentation.snapshot(),
+        or None if instrumentation is disabled.
+
+    Example:
+    stats = getInstrumentation()
+    print(stats['functions']['locateImage']['p99'])
+    print(stats['events']['short_writes'])
+    """
+
+    stats = _instrumentation
+    return stats.snapshot() if stats is not None else None
+
+
+def exportInstrumentation(filename):
+    """
+    Write a snapshot of the instrumentation counters to a JSON file.
+
+    Parameters:
+    filename : str
+        The JSON file path to write.
+
+    Example:
+    exportInstrumentation('stats.json')
+    """
+
+    with open(filename, 'w') as f:
+        json.dump(getInstrumentation(), f, indent=2)
+
+
+# Input Injection
+
+def _keyInput(hexKeyCode, flags):
+    """Build a keyboard Input event for a scancode."""
+    ii_ = Input_I()
+    ii_.ki = KeyBdInput(0, hexKeyCode, flags, 0, None)
+    return Input(ctypes.c_ulong(INPUT_KEYBOARD), ii_)
+
+
+def _vkInput(vk_code, flags=0, scancode=0):
+    """Build a keyboard Input event for a virtual key code, like keybd_event()."""
+    ii_ = Input_I()
+    ii_.ki = KeyBdInput(vk_code, scancode, flags, 0, None)
+    return Input(ctypes.c_ulong(INPUT_KEYBOARD), ii_)
+
+
+def _absoluteCoords(x, y, screen):
+    """Return the 0-65535 absolute mouse coordinates of a position on a screen area (left, top, width, height)."""
+    left, top, width, height = screen
+    return (round((x - left) * 65535 / max(width - 1, 1)),
+            round((y - top) * 65535 / max(height - 1, 1)))
+
+
+def _absolutePosition(dx, dy, screen):
+    """Return the position on a screen area (left, top, width, height) of 0-65535 absolute mouse coordinates."""
+    left, top, width, height = screen
+    return Point(left + round(dx * max(width - 1, 1) / 65535),
+                 top + round(dy * max(height - 1, 1) / 65535))
+
+
+def _mouseInput(flags, data=0, dx=0, dy=0):
+    """Build a mouse Input event."""
+    ii_ = Input_I()
+    ii_.mi = MouseInput(dx, dy, data, flags, 0, None)
+    return Input(ctypes.c_ulong(INPUT_MOUSE), ii_)
+
+
+def _keyInputs(key, up=False):
+    """Build the Input events that press or release a key by scancode."""
+    key_id = keyId(key)
+
+    keybdFlags = KEYEVENTF_SCANCODE
+    if up:
+        keybdFlags |= KEYEVENTF_KEYUP
+
+    inputs = []
+
+    # Check if the key is an arrow key and set the extended key flag
+    if _KEY_FLAGS[key_id] & KEYF_EXTENDED:
+        keybdFlags |= KEYEVENTF_EXTENDEDKEY
+        # Handle Num Lock state for arrow keys
+        if _backend.getKeyState(0x90):
+            # Send additional scancode if Num Lock is on
+            inputs.append(_keyInput(0xE0, KEYEVENTF_SCANCODE | (keybdFlags & KEYEVENTF_KEYUP)))
+
+    inputs.append(_keyInput(_KEY_SCANCODES[key_id], keybdFlags))
+    return inputs
+
+
+def _buttonInputs(button, up=False):
+    """Build the Input event that presses or releases a mouse button."""
+    button = button.lower()
+
+    # Use different flags for xbuttons vs regular buttons
+    if button in XBUTTON_DATA:
+        return [_mouseInput(MOUSEEVENTF_XUP if up else MOUSEEVENTF_XDOWN, XBUTTON_DATA[button])]
+
+    button_code = MB_CODE.get(button)
+    return [_mouseInput(button_code << 1 if up else button_code)]
+
+
+# Retry policy for SendInput calls that insert fewer events than requested
+_injection = {
+    'retries': 5,
+    'backoff': 0.001,
+    'raise_errors': True
+}
+
+
+class InjectionError(OSError):
+    """
+    Raised when SendInput keeps inserting fewer events than requested.
+
+    Attributes:
+        requested (int): Number of events in the batch.
+        inserted (int): Number of events inserted before giving up.
+        attempts (int): Number of SendInput calls made.
+        error (int): The last Windows error code reported by GetLastError().
+    """
+
+    def __init__(self, requested, inserted, attempts, error=0):
+        super().__init__(
+            f"SendInput inserted {inserted} of {requested} events after {attempts} attempts "
+            f"(error {error})"
+        )
+        self.requested = requested
+        self.inserted = inserted
+        self.attempts = attempts
+        self.error = error
+
+
+def configInjection(retries=None, backoff=None, raise_errors=None):
+    """
+    Configure how partially inserted SendInput batches are retried.
+
+    Parameters:
+    retries : int, optional
+        The number of times the remaining events are resubmitted. Default is 5.
+    backoff : float, optional
+        The delay in seconds before the first retry, doubled for each
+        following retry. Default is 0.001.
+    raise_errors : bool, optional
+        Whether InjectionError is raised when events still cannot be inserted.
+        If False, the failure is only counted by the instrumentation. Default is True.
+
+    Example:
+    configInjection(retries=10, backoff=0.002)
+    configInjection(raise_errors=False)
+    """
+
+    if retries is not None:
+        _injection['retries'] = int(retries)
+
+    if backoff is not None:
+        _injection['backoff'] = float(backoff)
+
+    if raise_errors is not None:
+        _injection['raise_errors'] = bool(raise_errors)
+
+
+def _setCursorPos(x, y):
+    """Move the cursor with SetCursorPos()."""
+    _backend.setCursorPos(x, y)
+
+    stats = _instrumentation
+    if stats is not None:
+        stats.recordSyscall('SetCursorPos')
+
+
+def _injectInputs(inputs):
+    """
+    Inject a list or array of Input events with SendInput.
+
+    SendInput inserts fewer events than requested when the input queue is busy
+    or UIPI blocks the injection. The remaining tail of the batch is resubmitted
+    with exponential backoff, and InjectionError is raised if it still cannot
+    be inserted after the configured number of retries.
+    """
+    events = inputs
+    if isinstance(inputs, list):
+        inputs = (Input * len(inputs))(*inputs)
+
+    requested = len(inputs)
+    input_size = ctypes.sizeof(Input)
+    done = 0
+
+    for attempt in range(_injection['retries'] + 1):
+        if attempt:
+            _clock.sleep(_injection['backoff'] * 2 ** (attempt - 1))
+
+        # Resubmit only the events that were not inserted yet
+        remaining = requested - done
+        if done:
+            batch = (Input * remaining).from_buffer(inputs, done * input_size)
+            tracked = events[done:] if isinstance(events, list) else batch
+        else:
+            batch, tracked = inputs, events
+
+        inserted = _backend.sendInput(remaining, batch)
+        _trackInputs(tracked, inserted)
+
+        stats = _instrumentation
+        if stats is not None:
+            stats.recordInjection(remaining, inserted, retry=attempt > 0)
+
+        done += inserted
+        if done >= requested:
+            return done
+
+    error = _backend.getLastError()
+
+    stats = _instrumentation
+    if stats is not None:
+        stats.recordFailure()
+
+    if _injection['raise_errors']:
+        raise InjectionError(requested, done, _injection['retries'] + 1, error)
+    return done
+
+
+def _sendInputs(inputs, priority=None):
+    """
+    Inject a batch of Input events atomically.
+
+    A single SendInput call is never interleaved with input injected by other
+    threads. When the dispatcher is enabled, the batch is queued to the
+    dispatcher thread instead and this call waits until it has been injected.
+    """
+    if not len(inputs):
+        return 0
+
+    dispatcher = _dispatcher
+    if dispatcher is not None and not dispatcher.isDispatcherThread():
+        future = dispatcher.submit(inputs, priority)
+        # A dispatcher stopped since it was read refuses the batch
+        if future is not None:
+            return future.result()
+
+    return _injectInputs(inputs)
+
+
+# Dispatcher priorities, lower values are injected first
+PRIORITY_FAILSAFE = 0
+PRIORITY_HIGH = 50
+PRIORITY_NORMAL = 100
+
+
+class InputDispatcher:
+    """
+    A single thread that owns input injection.
+
+    Batches of Input events are submitted from any thread through a lock-free
+    queue and injected one batch per SendInput call, so concurrent callers can
+    never interleave their events. Pending batches are injected in priority
+    order, which lets a failsafe release jump ahead of queued work.
+
+    Attributes:
+        batches (int): Number of batches injected.
+        events (int): Number of events injected.
+        total_latency (float): Sum of the time batches spent queued, in seconds.
+        max_latency (float): Longest time a batch spent queued, in seconds.
+        _queue (SimpleQueue): Queue of submitted batches.
+        _thread (Thread): The dispatcher thread.
+    """
+
+    def __init__(self):
+        """Initialize the dispatcher and start its thread."""
+        self.batches = 0
+        self.events = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._queue = queue.SimpleQueue()
+        self._counter = itertools.count()
+        # Guards the stopped flag, so no batch is queued after the stop sentinel
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def isDispatcherThread(self):
+        """Whether the calling thread is the dispatcher thread."""
+        return threading.current_thread() is self._thread
+
+    def submit(self, inputs, priority=None):
+        """
+        Queue a batch of Input events for injection.
+
+        Args:
+            inputs (list or Array): The Input events, injected together.
+            priority (int): Batches with lower values are injected first.
+                            Defaults to PRIORITY_NORMAL.
+
+        Returns:
+            Future or None: Resolves to the number of events SendInput inserted,
+                            or None if the dispatcher is stopped.
+        """
+        if priority is None:
+            priority = PRIORITY_NORMAL
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                return None
+            self._queue.put((priority, next(self._counter), time.perf_counter(), inputs, future))
+        return future
+
+    def _run(self):
+        """Inject queued batches in priority order until stopped."""
+        pending = []
+        while True:
+            # Block for the first batch, then take everything else already queued
+            if not pending:
+                heapq.heappush(pending, self._queue.get())
+            while True:
+                try:
+                    heapq.heappush(pending, self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            entry = heapq.heappop(pending)
+            if entry[3] is None:
+                # Inject anything still queued behind the sentinel, so no Future is left pending
+                while True:
+                    try:
+                        heapq.heappush(pending, self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                while pending:
+                    remaining = heapq.heappop(pending)
+                    if remaining[3] is not None:
+                        self._inject(remaining)
+                entry[4].set_result(0)
+                return
+            self._inject(entry)
+
+    def _inject(self, entry):
+        """Inject one queued batch and resolve its Future."""
+        priority, _, queued, inputs, future = entry
+        if not future.set_running_or_notify_cancel():
+            return
+
+        latency = time.perf_counter() - queued
+        self.batches += 1
+        self.events += len(inputs)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+        try:
+            future.set_result(_injectInputs(inputs))
+        except Exception as e:
+            future.set_exception(e)
+
+    def stats(self):
+        """
+        Get queue statistics.
+
+        Returns:
+            dict: Number of batches and events injected, and the mean and
+                  maximum queue latency in seconds.
+        """
+        return {
+            'batches': self.batches,
+            'events': self.events,
+            'mean_latency': self.total_latency / self.batches if self.batches else 0.0,
+            'max_latency': self.max_latency
+        }
+
+    def stop(self):
+        """Inject the batches already queued, then stop the dispatcher thread."""
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put((float('inf'), next(self._counter), time.perf_counter(), None, future))
+        self._thread.join(timeout=1.0)
+
+
+_dispatcher = None
+
+
+def enableDispatcher():
+    """
+    Route all input injection through a single dispatcher thread.
+
+    With the dispatcher enabled, input from any number of threads is
+    serialized into atomic batches. Calls still block until their batch has
+    been injected, so timing between calls is unchanged.
+
+    Returns:
+    InputDispatcher
+        The running dispatcher.
+
+    Example:
+    enableDispatcher()  # Safely call keyPress() and mouseClick() from several threads
+    """
+
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = InputDispatcher()
+    return _dispatcher
+
+
+def disableDispatcher():
+    """
+    Stop the dispatcher thread and inject input directly from the calling thread.
+
+    Example:
+    disableDispatcher()
+    """
+
+    global _dispatcher
+    dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.stop()
+
+
+def getDispatcherStats():
+    """
+    Get statistics of the input dispatcher.
+
+    Returns:
+    dict or None
+        The number of batches and events injected and the mean and maximum
+        queue latency in seconds, or None if the dispatcher is not enabled.
+
+    Example:
+    stats = getDispatcherStats()
+    print(stats['mean_latency'])
+    """
+
+    dispatcher = _dispatcher
+    return dispatcher.stats() if dispatcher is not None else None
+
+
+# Held Key Tracking
+
+# Keys and buttons currently injected as down, mapped to the Input event
+# that releases them. Insertion order is the order they were pressed.
+_held = {}
+_held_lock = threading.Lock()
+
+# Mouse button down flags mapped to (button, up flag)
+_BUTTON_FLAGS = {
+    MOUSEEVENTF_LEFTDOWN: ('left', MOUSEEVENTF_LEFTUP),
+    MOUSEEVENTF_RIGHTDOWN: ('right', MOUSEEVENTF_RIGHTUP),
+    MOUSEEVENTF_MIDDLEDOWN: ('middle', MOUSEEVENTF_MIDDLEUP)
+}
+_BUTTON_EVENTS = (MOUSEEVENTF_LEFTDOWN | MOUSEEVENTF_LEFTUP | MOUSEEVENTF_RIGHTDOWN |
+                  MOUSEEVENTF_RIGHTUP | MOUSEEVENTF_MIDDLEDOWN | MOUSEEVENTF_MIDDLEUP |
+                  MOUSEEVENTF_XDOWN | MOUSEEVENTF_XUP)
+
+# Reverse lookups used to name held keys
+_SCAN_NAMES = {(code, name in EXTENDED_KEYS): name for name, code in reversed(DK_CODE.items())}
+_VK_NAMES = {code: name for name, code in reversed(VK_CODE.items())}
+
+
+def _trackInputs(inputs, count):
+    """Update the held key state with the first `count` injected events."""
+    if isinstance(inputs, list):
+        indices = range(min(count, len(inputs)))
+    else:
+        # Only visit keyboard and mouse button events of large arrays
+        keybd = numpy.frombuffer(inputs, dtype=_KEYBD_VIEW, count=count)
+        mouse = numpy.frombuffer(inputs, dtype=_MOUSE_VIEW, count=count)
+        indices = numpy.flatnonzero(
+            (keybd['type'] == INPUT_KEYBOARD) | (mouse['dwFlags'] & _BUTTON_EVENTS != 0)
+        ).tolist()
+
+    with _held_lock:
+        for i in indices:
+            event = inputs[i]
+            if event.type == INPUT_KEYBOARD:
+                ki = event.ii.ki
+                up = ki.dwFlags & KEYEVENTF_KEYUP
+                if ki.dwFlags & KEYEVENTF_SCANCODE:
+                    # Skip the Num Lock prefix of extended keys
+                    if ki.wScan == 0xE0:
+                        continue
+                    extended = ki.dwFlags & KEYEVENTF_EXTENDEDKEY
+                    key = ('scan', ki.wScan, bool(extended))
+                    release = _keyInput(ki.wScan, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP | extended)
+                else:
+                    key = ('vk', ki.wVk)
+                    release = _vkInput(ki.wVk, KEYEVENTF_KEYUP)
+                if up:
+                    _held.pop(key, None)
+                else:
+                    _held[key] = release
+            else:
+                flags = event.ii.mi.dwFlags
+                for down_flag, (button, up_flag) in _BUTTON_FLAGS.items():
+                    if flags & down_flag:
+                        _held[('button', button)] = _mouseInput(up_flag)
+                    if flags & up_flag:
+                        _held.pop(('button', button), None)
+                for button, data in XBUTTON_DATA.items():
+                    if event.ii.mi.mouseData & data:
+                        if flags & MOUSEEVENTF_XDOWN:
+                            _held[('button', button)] = _mouseInput(MOUSEEVENTF_XUP, data)
+                        if flags & MOUSEEVENTF_XUP:
+                            _held.pop(('button', button), None)
+
+
+def getHeldKeys():
+    """
+    Get the keys currently held down by this process.
+
+    Only keys injected by directinput are tracked, not keys pressed by the user.
+
+    Returns:
+    list of str
+        The names of the held keys, in the order they were pressed.
+
+    Example:
+    keyDown('ctrl')
+    getHeldKeys()  # ['ctrl']
+    """
+
+    with _held_lock:
+        held = list(_held)
+
+    names = []
+    for key in held:
+        if key[0] == 'scan':
+            names.append(_SCAN_NAMES.get((key[1], key[2]), hex(key[1])))
+        elif key[0] == 'vk':
+            names.append(_VK_NAMES.get(key[1], hex(key[1])))
+    return names
+
+
+def getHeldButtons():
+    """
+    Get the mouse buttons currently held down by this process.
+
+    Returns:
+    list of str
+        The names of the held mouse buttons, in the order they were pressed.
+
+    Example:
+    mouseDown('right')
+    getHeldButtons()  # ['right']
+    """
+
+    with _held_lock:
+        return [key[1] for key in _held if key[0] == 'button']
+
+
+def isHeld(key):
+    """
+    Check whether a key or mouse button is currently held down by this process.
+
+    Parameters:
+    key : str
+        A key name or a mouse button ('left', 'right', 'middle', 'xbutton1', or 'xbutton2').
+
+    Returns:
+    bool
+        True if the key or button was injected as down and not released yet.
+
+    Example:
+    isHeld('shift')
+    isHeld('left')
+    """
+
+    if isinstance(key, str) and (key.lower() in MB_CODE or key.lower() in XBUTTON_DATA):
+        with _held_lock:
+            return ('button', key.lower()) in _held
+
+    key = keyId(key)
+    flags = _KEY_FLAGS[key]
+    with _held_lock:
+        return ((flags & KEYF_SCANCODE and
+                 ('scan', _KEY_SCANCODES[key], bool(flags & KEYF_EXTENDED)) in _held)
+                or (flags & KEYF_VIRTUAL and ('vk', _KEY_VIRTUAL[key]) in _held))
+
+
+@_instrumented
+def releaseAll():
+    """
+    Release every key and mouse button held down by this process.
+
+    All pending releases are injected with a single SendInput call, in reverse
+    order of pressing. This runs automatically when the failsafe triggers and
+    when the interpreter exits.
+
+    Returns:
+    int
+        The number of keys and buttons released.
+
+    Example:
+    keyDown('ctrl', 'shift')
+    releaseAll()  # Release both keys at once.
+    """
+
+    with _held_lock:
+        releases = list(reversed(_held.values()))
+
+    if releases:
+        _sendInputs(releases, PRIORITY_FAILSAFE)
+    return len(releases)
+
+
+def _releaseAllAtExit():
+    """Release held keys at interpreter shutdown, reporting instead of raising."""
+    try:
+        releaseAll()
+    except InjectionError as e:
+        print(f"directinput: could not release held keys at exit: {e}")
+
+
+atexit.register(_releaseAllAtExit)
+
+
+# Hotkeys
+
+# One combo of a hotkey: the key IDs pressed together, and how many times
+HotkeyStep = namedtuple("HotkeyStep", "keys count")
+
+# A trailing "*N" on the last key of a combo repeats the combo N times
+_REPEAT_SUFFIX = re.compile(r'(.+)\*(\d+)')
+
+
+class Hotkey:
+    """
+    A hotkey compiled to batches of Input events.
+
+    Hotkeys are created by parseHotkey(). The batches are built on first use
+    and reused afterwards, once per Num Lock state if the hotkey has extended keys.
+
+    Attributes:
+        text (str): The hotkey string.
+        steps (tuple): The HotkeyStep combos, pressed one after another.
+    """
+
+    def __init__(self, text, steps):
+        """
+        Initialize the hotkey.
+
+        Args:
+            text (str): The hotkey string.
+            steps (tuple): The HotkeyStep combos.
+        """
+        self.text = text
+        self.steps = steps
+        self._extended = any(_KEY_FLAGS[key] & KEYF_EXTENDED for step in steps for key in step.keys)
+        self._batches = {}
+
+    def __repr__(self):
+        return f"Hotkey({self.text!r})"
+
+    def keys(self):
+        """Return the key IDs of every step."""
+        return [key for step in self.steps for key in step.keys]
+
+    def batches(self):
+        """
+        Return the Input batches of every step.
+
+        Each step has a list of press batches and a list of release batches,
+        one per key with keys released in reverse order, followed by a single
+        batch pressing the whole combo and a single batch releasing it.
+        """
+        numlock = bool(_backend.getKeyState(0x90)) if self._extended else False
+        batches = self._batches.get(numlock)
+        if batches is None:
+            batches = []
+            for step in self.steps:
+                presses = [_inputArray(_keyInputs(key)) for key in step.keys]
+                releases = [_inputArray(_keyInputs(key, up=True)) for key in reversed(step.keys)]
+                batches.append((presses, releases,
+                                _inputArray([event for batch in presses for event in batch]),
+                                _inputArray([event for batch in releases for event in batch])))
+            self._batches[numlock] = batches
+        return batches
+
+
+def _inputArray(inputs):
+    """Return a list of Input events as an Input array."""
+    return (Input * len(inputs))(*inputs)
+
+
+@lru_cache(maxsize=512)
+def parseHotkey(text):
+    """
+    Parse a hotkey string into a compiled Hotkey.
+
+    Keys of a combo are joined with '+', combos pressed one after another are
+    separated with ',', and a trailing '*N' repeats a combo N times. Whitespace
+    is ignored. '+' and ',' are read as keys where a key is expected, so
+    'ctrl++' presses ctrl and plus. Parsed hotkeys are cached, so repeated
+    strings are parsed and compiled once.
+
+    Parameters:
+    text : str
+        The hotkey string.
+
+    Returns:
+    Hotkey
+        The compiled hotkey.
+
+    Raises:
+    ValueError
+        If the string is empty, malformed or names an unknown key.
+
+    Example:
+    parseHotkey('ctrl+shift+esc')
+    parseHotkey('ctrl+k, ctrl+c')
+    parseHotkey('ctrl+z*3')
+    """
+
+    # Split into combos of key names
+    combos, names, token = [], [], ''
+    expecting = True
+    for c in text:
+        if c.isspace():
+            continue
+        if expecting and c in '+,':
+            token, expecting = c, False
+        elif c == '+' and not keyId(token) and keyId(token + c):
+            # Key names ending in '+', such as 'num+'
+            token += c
+        elif c == '+':
+            names.append(token)
+            token, expecting = '', True
+        elif c == ',':
+            names.append(token)
+            combos.append(names)
+            names, token, expecting = [], '', True
+        else:
+            token += c
+            expecting = False
+    if expecting:
+        raise ValueError(f"Incomplete hotkey: {text!r}")
+    names.append(token)
+    combos.append(names)
+
+    steps = []
+    for names in combos:
+        count = 1
+        match = _REPEAT_SUFFIX.fullmatch(names[-1])
+        if match and not keyId(names[-1]):
+            names[-1], count = match.group(1), int(match.group(2))
+            if count < 1:
+                raise ValueError(f"Invalid repeat count in hotkey: {text!r}")
+        keys = []
+        for name in names:
+            key = keyId(name)
+            if not key:
+                raise ValueError(f"Unknown key {name!r} in hotkey: {text!r}")
+            keys.append(key)
+        steps.append(HotkeyStep(tuple(keys), count))
+
+    return Hotkey(text, tuple(steps))
+
+
+@lru_cache(maxsize=512)
+def _compileKeys(keys):
+    """Compile a tuple of keys pressed together into a cached Hotkey."""
+    return Hotkey('+'.join(str(key) for key in keys), (HotkeyStep(tuple(keyId(key) for key in keys), 1),))
+
+
+def _resolveKey(key):
+    """Return the key ID of a key, or the Hotkey of a hotkey string."""
+    key_id = keyId(key)
+    if key_id or key.__class__ is int or not ('+' in key or ',' in key or '*' in key):
+        return key_id
+    return parseHotkey(key)
+
+
+def _playHotkey(hotkey, key_delay):
+    """Press and release every step of a Hotkey, pausing key_delay after each key."""
+    for step, (presses, releases, chord_down, chord_up) in zip(hotkey.steps, hotkey.batches()):
+        for _ in range(step.count):
+            if key_delay:
+                for batch in presses:
+                    _sendInputs(batch)
+                    _clock.sleep(key_delay)
+                for batch in releases:
+                    _sendInputs(batch)
+                    _clock.sleep(key_delay)
+            else:
+                # Without pacing the whole combo goes out in two batches
+                _sendInputs(chord_down)
+                _sendInputs(chord_up)
+
+
+# Layout Resolution
+
+# How a character is typed in a keyboard layout
+CharKey = namedtuple("CharKey", "vk_code scancode modifiers")
+
+# Per keyboard layout handle: characters mapped to (CharKey, press batch,
+# release batch), or None if the character cannot be typed directly
+_layout_cache = {}
+_layout_lock = threading.Lock()
+
+
+def _charKey(char, layout):
+    """Resolve a character to a CharKey with the backend, None if it cannot be typed directly."""
+    if len(char) != 1 or ord(char) > 0xFFFF:
+        return None
+
+    # Control characters do not depend on the layout
+    if char < ' ':
+        key = keyId(char)
+        flags = _KEY_FLAGS[key]
+        if not flags & KEYF_VIRTUAL:
+            return None
+        return CharKey(_KEY_VIRTUAL[key], _KEY_SCANCODES[key], LAYOUT_SHIFT if flags & KEYF_SHIFT else 0)
+
+    result = _backend.vkKeyScan(char, layout)
+    if result == -1:
+        return None
+    vk_code, modifiers = result & 0xFF, (result >> 8) & 0xFF
+    if modifiers & ~(LAYOUT_SHIFT | LAYOUT_CTRL | LAYOUT_ALT):
+        return None
+    if _backend.mapVirtualKey(vk_code, MAPVK_VK_TO_CHAR, layout) & _DEAD_KEY:
+        # Dead keys only type a character together with the next key
+        return None
+    return CharKey(vk_code, _backend.mapVirtualKey(vk_code, MAPVK_VK_TO_VSC, layout), modifiers)
+
+
+def _layoutEntry(char, layout):
+    """Return the cached (CharKey, press batch, release batch) of a character, or None."""
+    table = _layout_cache.get(layout)
+    if table is None:
+        with _layout_lock:
+            table = _layout_cache.setdefault(layout, {})
+    try:
+        return table[char]
+    except KeyError:
+        pass
+
+    key = _charKey(char, layout)
+    entry = None
+    if key is not None:
+        entry = (key, _inputArray(_charInputs(key)), _inputArray(_charInputs(key, up=True)))
+    table[char] = entry
+    return entry
+
+
+def resolveChar(char, layout=None):
+    """
+    Resolve how a character is typed in a keyboard layout.
+
+    The result is computed once per character and layout with VkKeyScanEx()
+    and MapVirtualKeyEx(), or the table-driven layouts where the Windows
+    API is not available.
+
+    Parameters:
+    char : str
+        The character.
+    layout : int, optional
+        The keyboard layout handle. Defaults to the layout of the foreground window.
+
+    Returns:
+    CharKey or None
+        The virtual key code, scancode and LAYOUT_* modifier bits of the character,
+        or None if it cannot be typed with a single key.
+
+    Example:
+    key = resolveChar('@')
+    print(hex(key.vk_code), key.modifiers & LAYOUT_SHIFT)
+    """
+
+    if layout is None:
+        layout = _backend.getKeyboardLayout()
+    entry = _layoutEntry(char, layout)
+    return None if entry is None else entry[0]
+
+
+def clearLayoutCache():
+    """
+    Discard the cached character resolutions of every keyboard layout.
+
+    Resolutions are cached per layout handle, so switching layouts needs no
+    clearing. Call this after a layout with the same handle was modified.
+
+    Example:
+    clearLayoutCache()
+    """
+
+    with _layout_lock:
+        _layout_cache.clear()
+
+
+def _charInputs(key, up=False):
+    """Build the Input events that press or release a CharKey and its modifiers."""
+    # Send a WM_KEYDOWN or WM_KEYUP message for the key
+    # corresponding to the virtual key code
+    inputs = [_vkInput(key.vk_code, KEYEVENTF_KEYUP if up else 0, key.scancode)]
+
+    # Press the modifiers before the key, release them after
+    modifiers = [vk_code for bit, vk_code in _LAYOUT_MODIFIERS if key.modifiers & bit]
+    if up:
+        inputs += [_vkInput(vk_code, KEYEVENTF_KEYUP) for vk_code in reversed(modifiers)]
+    else:
+        inputs[:0] = [_vkInput(vk_code) for vk_code in modifiers]
+
+    return inputs
+
+
+# Keyboard Functions
+
+@_instrumented
+def keyDown(*keys):
+    """
+    Simulate pressing down one or more keys.
+
+    Parameters:
+    *keys : str
+        One or more keys to press down. The key names should correspond to
+        the key mappings, or key IDs from keyId().
+
+    Example:
+    keyDown('x', 'y') or keyDown('a')
+    """
+
+    inputs = []
+    for key in keys:
+        key = keyId(key)
+
+        # Check if the key requires shift
+        if _KEY_FLAGS[key] & KEYF_SHIFT:
+            # Press and release the shift key around the key
+            inputs += [_vkInput(0x10), *_keyInputs(key), _vkInput(0x10, KEYEVENTF_KEYUP)]
+        else:
+            inputs += _keyInputs(key)
+
+    # Press the keys
+    _sendInputs(inputs)
+
+
+@_instrumented
+def keyUp(*keys):
+    """
+    Simulate releasing one or more keys.
+
+    Parameters:
+    *keys : str
+        One or more keys to release. The key names should correspond to
+        the key mappings, or key IDs from keyId().
+
+    Example:
+    keyUp('x', 'y') or keyUp('a')
+    """
+
+    inputs = []
+    for key in keys:
+        key = keyId(key)
+
+        # Check if the key requires shift
+        if _KEY_FLAGS[key] & KEYF_SHIFT:
+            # Press and release the shift key around the key
+            inputs += [_vkInput(0x10), *_keyInputs(key, up=True), _vkInput(0x10, KEYEVENTF_KEYUP)]
+        else:
+            inputs += _keyInputs(key, up=True)
+
+    # Release the keys
+    _sendInputs(inputs)
+
+
+@contextmanager
+def keyHold(*keys):
+    """
+    Simulate holding down one or more specified keys.
+
+    This function simulates pressing and holding one or more specified keys.
+    The keys parameter should be a string, not a list. This function should be
+    used with a `with` statement to ensure that the keys are released after the
+    block of code is executed.
+
+    Parameters:
+    *keys : str
+        One or more keys to hold down. The key names should correspond to
+        the key mappings.
+
+    Example:
+    with keyHold('ctrl', 'shift'):
+        keyPress('esc')
+    """
+
+    # Press the keys
+    _sendInputs([event for key in keys for event in _keyInputs(key)])
+
+    try:
+        # Yield control to the calling function
+        yield
+    finally:
+        # Release the keys, even if the block raised
+        _sendInputs([event for key in keys for event in _keyInputs(key, up=True)])
+
+
+@_instrumented
+def keyPress(keys, interval=0, presses=1,
+             key_delay=DEFAULT_INTERVAL, simultaneously=False):
+    """
+    Simulate pressing one or more keys.
+
+    This function simulates pressing and releasing one or more specified keys.
+    The keys parameter can be a single key or a list of keys. The keys can be
+    pressed either simultaneously or sequentially based on the
+    `simultaneously` parameter. Additionally, the function allows specifying
+    the number of times to press the keys and the interval between presses.
+
+    Parameters:
+    keys : str or list of str
+        The key or list of keys to press. The key names should correspond to
+        the key mappings, or key IDs from keyId(). Hotkey strings such as
+        'ctrl+c' are pressed like hotKey() presses them, see parseHotkey().
+    interval : float, optional
+        The interval between key presses in seconds (default is 0.01).
+    presses : int, optional
+        The number of times to press the keys (default is 1).
+    key_delay : float, optional
+        The delay between each key press and release in seconds (default is 0.01).
+    simultaneously : bool, optional
+        Whether to press all keys at once (default is False).
+        If False, keys are pressed sequentially.
+
+    Example:
+    keyPress('a')                                      # Press the 'a' key once.
+    keyPress(['ctrl', 'c'])                            # Press 'ctrl' and 'c' sequentially.
+    keyPress(['ctrl', 'shift'], simultaneously=True)   # Press 'ctrl' and 'shift' simultaneously.
+    keyPress('b', presses=3, interval=0.5)             # Press the 'b' key 3 times with 0.5-second interval.
+    keyPress(['ctrl+a', 'ctrl+c'])                     # Select all, then copy.
+    """
+
+    if not isinstance(keys, list):
+        keys = [keys]
+    keys = [_resolveKey(key) for key in keys]
+
+    if simultaneously:
+        # Hotkey strings add all of their keys to the combination
+        keys = [k for key in keys for k in (key.keys() if isinstance(key, Hotkey) else [key])]
+
+        for _ in range(presses):
+            press_inputs = []
+            release_inputs = []
+
+            for key in keys:
+                # Check if the key requires shift
+                if _KEY_FLAGS[key] & KEYF_SHIFT:
+                    # Press and release the shift key around the key
+                    press_inputs += [_vkInput(0x10), *_keyInputs(key), _vkInput(0x10, KEYEVENTF_KEYUP)]
+                else:
+                    press_inputs += _keyInputs(key)
+
+                release_inputs += _keyInputs(key, up=True)
+
+            _sendInputs(press_inputs)
+
+            _clock.sleep(key_delay)
+
+            _sendInputs(release_inputs)
+
+            _clock.sleep(interval)
+
+    else:
+        for _ in range(presses):
+            for key in keys:
+                if isinstance(key, Hotkey):
+                    _playHotkey(key, key_delay)
+                    _clock.sleep(interval)
+                    continue
+
+                press_inputs = _keyInputs(key)
+                release_inputs = _keyInputs(key, up=True)
+
+                # Check if the key requires shift
+                if _KEY_FLAGS[key] & KEYF_SHIFT:
+                    # Hold the shift key for the duration of the key press
+                    press_inputs.insert(0, _vkInput(0x10))
+                    release_inputs.append(_vkInput(0x10, KEYEVENTF_KEYUP))
+
+                # Press
+                _sendInputs(press_inputs)
+
+                _clock.sleep(key_delay)
+
+                # Release
+                _sendInputs(release_inputs)
+
+                _clock.sleep(interval)
+
+
+@_instrumented
+def hotKey(*keys, **kwargs):
+    """
+    Simulate pressing a combination of keys simultaneously.
+
+    This function simulates pressing and holding down a combination of keys simultaneously,
+    followed by releasing them.
+    The keys parameter can accept multiple key arguments to form the hotkey combination.
+
+    Parameters:
+    *keys : str
+        One or more keys to press as part of the hotkey combination.
+        The key names should correspond to
+        the key mappings, or key IDs from keyId(). A single hotkey string
+        such as 'ctrl+shift+esc' or 'ctrl+k, ctrl+c' is accepted too, see parseHotkey().
+    key_delay : float, optional
+        The delay between each key press and release in seconds (default is 0.01).
+        With no delay, each combo is sent as one press batch and one release batch.
+
+    Example:
+    hotKey('ctrl', 'shift', 'esc')  # Simulate pressing 'Ctrl + Shift + Esc' simultaneously.
+    hotKey('ctrl+shift+esc')        # The same hotkey as a string.
+    hotKey('ctrl+k, ctrl+c')        # Press 'Ctrl + K', then 'Ctrl + C'.
+    """
+
+    key_delay = kwargs.get('key_delay', DEFAULT_INTERVAL)
+
+    # The compiled hotkey is cached, so its keys are resolved once
+    hotkey = _resolveKey(keys[0]) if len(keys) == 1 else None
+    if not isinstance(hotkey, Hotkey):
+        hotkey = _compileKeys(keys)
+
+    # Press the keys in order and release them in reverse order
+    _playHotkey(hotkey, key_delay)
+
+
+@_instrumented
+def write(text: str, interval=0.0, key_delay=0.03):
+    """
+    Types out a given text string.
+
+    This function simulates typing out a given text string character by character.
+    Optionally, a speed (in seconds) between key presses can be specified to
+    simulate a more natural typing speed. Characters are typed with the keys
+    of the active keyboard layout, see resolveChar(). If a character cannot be
+    typed with a single key, it will be copied and pasted from the clipboard.
+
+    Parameters:
+    text : str
+        The text string to type out.
+    interval : float, optional
+        The interval (in seconds) between each character (default is 0.0).
+    key_delay : float, optional
+        The delay between key press and release for each character (default is 0.03 seconds).
+
+    Example:
+    write("Hello, World!", interval=0.1)
+    """
+
+    # Resolve characters in the layout of the foreground window
+    layout = _backend.getKeyboardLayout()
+
+    # Iterate through each character in the text
+    for c in text:
+        # Look up the keys typing the character in the layout
+        entry = _layoutEntry(c, layout)
+        if entry is None:
+            # If the character cannot be typed with a single key,
+            # copy it to the clipboard and simulate a paste operation
+            pyperclip.copy(c)
+            hotKey('ctrl', 'v', interval=key_delay)
+        else:
+            _sendInputs(entry[1])
+            _clock.sleep(key_delay)
+            _sendInputs(entry[2])
+
+        # Define the time delay between each characters
+        _clock.sleep(interval)
+
+
+@_instrumented
+def keyDetect(*keys):
+    """
+    Check if one or more specified keys are currently pressed.
+
+    This function checks the state of one or more specified keys to determine
+    if they are currently pressed. The keys parameter can be a single key (as a string) or a combination.
+    The function returns True if all specified keys are pressed,
+    and False if any key is not pressed or not recognized.
+
+    Parameters:
+    keys : str
+        The key or list of keys to check. The key names should correspond to
+        the key mappings, or key IDs from keyId().
+        It can take keyboard keys and also mouse buttons.
+
+    Returns:
+    bool
+        True if all specified keys are pressed, False otherwise.
+
+    Example:
+    keyDetect('a')           # Check if the 'a' key is pressed.
+    keyDetect('ctrl', 'c')   # Check if both 'ctrl' and 'c' keys are pressed.
+    keyDetect('left_mouse')  # Check if left mouse button is pressed.
+    keyDetect('xbutton1')    # Check if mouse xbutton1 is pressed.
+    keyDetect('ctrl+c')      # Check a hotkey string.
+    """
+
+    # Check if keys is a single key (string) and convert it to a list
+    if isinstance(keys, str):
+        keys = [keys]
+
+    pressed_keys = set()
+    for key_code in range(0x01, 0xFE):
+        key_state = _backend.getAsyncKeyState(key_code)
+        if key_state & 0x8000:  # Check if key is held down
+            pressed_keys.add(key_code)
+
+    stats = _instrumentation
+    if stats is not None:
+        stats.recordSyscall('GetAsyncKeyState', 0xFE - 0x01)
+
+    for key in keys:
+        key = _resolveKey(key)
+        if isinstance(key, Hotkey):
+            if len(key.steps) > 1:
+                raise ValueError(f"Cannot detect a hotkey sequence: {key.text!r}")
+            if any(_KEY_VIRTUAL[k] not in pressed_keys for k in key.keys()):
+                return False
+        elif _KEY_VIRTUAL[key] not in pressed_keys:
+            return False
+
+    # If all keys are pressed, return True
+    return True
+
+
+# Mouse Functions
+
+@_instrumented
+def mouseClick(button='left', interval=0, presses=1,
+               key_delay=DEFAULT_INTERVAL):
+    """
+    Simulate mouse click events.
+
+    This function simulates mouse click events for a specified mouse button.
+    The button parameter determines which mouse button to click,
+    and the presses parameter specifies the number of times to click the button.
+
+    Parameters:
+    button : str, optional
+        The mouse button to click ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+    interval : float, optional
+        The interval (in seconds) between each clicks.
+    presses : int, optional
+        The number of times to click the mouse button. Default is 1.
+    key_delay: float, optional
+        The delay (in seconds) between each click down and click release.
+
+    Example:
+    mouseClick('left')                            # Click the left mouse button once.
+    mouseClick('right', presses=2, interval=0.5)  # Double-click the right mouse button with a 0.5-second interval.
+    mouseClick('middle', presses=3)               # Triple-click the middle mouse button.
+    mouseClick('xbutton1')                        # Click the first extra mouse button (xbutton1).
+    mouseClick('xbutton2')                        # Click the second extra mouse button (xbutton2).
+    """
+
+    press_inputs = _buttonInputs(button)
+    release_inputs = _buttonInputs(button, up=True)
+
+    for _ in range(presses):
+        # Send mouse button press event
+        _sendInputs(press_inputs)
+
+        _clock.sleep(key_delay)
+
+        # Send mouse button release event
+        _sendInputs(release_inputs)
+
+        _clock.sleep(interval)
+
+
+@_instrumented
+def mouseDown(button='left'):
+    """
+    Simulate pressing down a mouse button.
+
+    This function simulates pressing down a specified mouse button.
+    The button parameter determines which mouse button to press.
+
+    Parameters:
+    button : str, optional
+        The mouse button to press ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+
+    Example:
+    mouseDown('left')     # Press down the left mouse button.
+    mouseDown('right')    # Press down the right mouse button.
+    mouseDown('middle')   # Press down the middle mouse button.
+    mouseDown('xbutton1') # Press down the first extra mouse button.
+    mouseDown('xbutton2') # Press down the second extra mouse button.
+    """
+
+    # Send mouse button press event
+    _sendInputs(_buttonInputs(button))
+
+
+@_instrumented
+def mouseUp(button='left'):
+    """
+    Simulate releasing a mouse button.
+
+    This function simulates releasing a specified mouse button.
+    The button parameter determines which mouse button to release.
+
+    Parameters:
+    button : str, optional
+        The mouse button to release ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+
+    Example:
+    mouseUp('left')     # Release the left mouse button.
+    mouseUp('right')    # Release the right mouse button.
+    mouseUp('middle')   # Release the middle mouse button.
+    mouseUp('xbutton1') # Release the first extra mouse button.
+    mouseUp('xbutton2') # Release the second extra mouse button.
+    """
+
+    # Send mouse button release event
+    _sendInputs(_buttonInputs(button, up=True))
+
+
+@contextmanager
+def mouseHold(button='left'):
+    """
+    Simulate holding down a specified mouse button.
+
+    This function simulates pressing and holding down a specified mouse button.
+    The button parameter can be 'left', 'right', 'middle', 'xbutton1', or 'xbutton2'.
+    This function should be used with a `with` statement to ensure that
+    the mouse button is released after the block of code is executed.
+
+    Parameters:
+    button : str, optional
+        The mouse button to hold down ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+
+    Example:
+    with mouseHold('left'):
+        directinput.keyPress("esc")
+    with mouseHold('xbutton1'):
+        directinput.keyPress("a")
+    """
+
+    # Send mouse button press event
+    _sendInputs(_buttonInputs(button))
+
+    try:
+        # Yield control to the calling function
+        yield
+    finally:
+        # Send mouse button release event, even if the block raised
+        _sendInputs(_buttonInputs(button, up=True))
+
+
+@_instrumented
+def moveMouseTo(x=None, y=None, duration=0.0):
+    """
+    Move the mouse cursor to a specified position over a given duration.
+
+    This function moves the mouse cursor to a specified (x, y) position on the screen
+    over a specified duration. If either x or y is not provided,
+    the current mouse position for that axis will be used.
+
+    Parameters:
+    x : int, optional
+        The target x-coordinate for the mouse cursor. If not specified, the current x-coordinate is used.
+    y : int, optional
+        The target y-coordinate for the mouse cursor. If not specified, the current y-coordinate is used.
+    duration : float, optional
+        The duration over which the mouse cursor should move to the target position,
+        in seconds. Default is 0.0, which moves the cursor instantly.
+
+    Example:
+    moveMouseTo(100, 200)             # Instantly move the cursor to (100, 200).
+    moveMouseTo(300, 400, 1.0)        # Move the cursor to (300, 400) over 1 second.
+    moveMouseTo(y=500, duration=0.5)  # Move the cursor vertically to y=500 over 0.5 seconds.
+    """
+
+    # Get the current mouse position
+    current_x, current_y = getMousePosition()
+
+    if x is None:
+        x = current_x
+    else:
+        x = int(x)
+
+    if y is None:
+        y = current_y
+    else:
+        y = int(y)
+
+    # Calculate the distance to move the cursor in the x and y direction
+    distance_x = x - current_x
+    distance_y = y - current_y
+
+    # Calculate the number of steps needed to move the cursor
+    # based on the duration and the distance to travel
+    steps = int(duration * 50)
+    if steps == 0:
+        _setCursorPos(x, y)
+        return
+
+    step_x = distance_x / steps
+    step_y = distance_y / steps
+
+    # Move the cursor in a linear way over the specified duration
+    for i in range(steps):
+        _clock.sleep(duration / steps)
+        current_x += step_x
+        current_y += step_y
+        _setCursorPos(int(current_x), int(current_y))
+
+
+@_instrumented
+def moveMouse(xOffset=0, yOffset=0, duration=0.0):
+    """
+    Move the mouse cursor relative to its current position by specified offsets.
+
+    This function moves the mouse cursor from its current position
+    by a specified x and y offset over a given duration.
+
+    Parameters:
+    xOffset : int or float, optional
+        The offset in the x direction to move the mouse cursor. Default is 0.
+    yOffset : int or float, optional
+        The offset in the y direction to move the mouse cursor. Default is 0.
+    duration : float, optional
+        The duration over which the mouse cursor should move to the new position,
+        in seconds. Default is 0.0, which moves the cursor instantly.
+
+    Example:
+    moveMouse(100, 50)                    # Instantly move the cursor 100 pixels right and 50 pixels down.
+    moveMouse(-50, 0, 1.0)                # Move the cursor 50 pixels left over 1 second.
+    moveMouse(yOffset=100, duration=0.5)  # Move the cursor 100 pixels down over 0.5 seconds.
+    """
+
+    current_x, current_y = getMousePosition()
+    x = current_x + xOffset
+    y = current_y + yOffset
+
+    distance_x = x - current_x
+    distance_y = y - current_y
+    steps = int(duration * 50)
+    if steps == 0:
+        _setCursorPos(x, y)
+        return
+
+    step_x = distance_x / steps
+    step_y = distance_y / steps
+
+    for i in range(steps):
+        _clock.sleep(duration / steps)
+        current_x += step_x
+        current_y += step_y
+        _setCursorPos(int(current_x), int(current_y))
+
+
+@_instrumented
+def scrollMouse(clicks):
+    """
+    Scroll the mouse wheel vertically.
+
+    This function simulates scrolling the mouse wheel vertically.
+    The `clicks` parameter determines the amount and direction of the scroll.
+    Positive values scroll up, while negative values scroll down.
+    For a visible result, it is recommended to use a value of 100 or more,
+    as smaller numbers may not produce a significant scrolling effect.
+
+    Parameters:
+    clicks : int
+        The number of clicks to scroll. Positive values scroll up, negative values scroll down.
+
+    Example:
+    scrollMouse(120)   # Scroll up with a value of 120 clicks.
+    scrollMouse(-100)  # Scroll down with a value of 100 clicks.
+    """
+
+    if clicks != 0:
+        _sendInputs([_mouseInput(MOUSEEVENTF_WHEEL, clicks)])
+
+
+# Utility Functions
+
+@_instrumented
+def screenshot(filename=None, region=None):
+    """
+    Take a screenshot of the entire screen or a specified region.
+
+    This function captures a screenshot of the entire screen or a specified region.
+    If a region is specified, it captures the region defined
+    by the tuple (top-left x, top-left y, width, height).
+    The screen is captured with the active capture backend, see setCaptureBackend().
+    The screenshot can be saved to a file if a filename is provided.
+
+    Parameters:
+    filename : str, optional
+        The file path to save the screenshot. If not specified,
+        the screenshot is not saved. You can put any file type such as .png, .jpg or .pdf.
+    region : tuple, optional
+        A tuple specifying the region to capture (top-left x, top-left y, width, height).
+        If not specified, captures the entire screen.
+
+    Returns:
+    Image
+        The captured screenshot as an Image object.
+
+    Example:
+    screenshot('screenshot.png')                           # Capture the entire screen and save as 'screenshot.png'.
+    screenshot(region=(0, 0, 800, 600))                    # Capture a region of the screen.
+    screenshot('region.png', region=(100, 100, 300, 200))  # Capture a region and save as 'region.png'.
+    """
+
+    img = _capture.screenshot(region or None)
+
+    if filename:
+        img.save(filename)
+
+    return img
+
+
+def getMousePosition():
+    """
+    Get the current position of the mouse cursor.
+
+    This function returns the current position of the mouse cursor (x, y).
+
+    Returns:
+    Point
+        The current mouse cursor position as (x, y).
+
+    Example:
+    position = getMousePosition()
+    print(position.x, position.y)  # Output the current cursor position.
+    """
+
+    return _backend.getCursorPos()
+
+
+def getDisplaySize():
+    """
+    Get the size of the primary display.
+
+    This function returns the width and height of the primary display (width, height).
+    See getMonitors() for the other monitors.
+
+    Returns:
+    Size
+        The size of the primary display as (width, height).
+
+    Example:
+    display_size = getDisplaySize()
+    print(display_size.width, display_size.height)  # Output the display size.
+    """
+
+    width = _backend.getSystemMetrics(0)
+    height = _backend.getSystemMetrics(1)
+    return Size(width, height)
+
+
+# Monitors cached with the backend and virtual screen metrics they were read with
+_monitors = {
+    'key': None,
+    'monitors': []
+}
+
+
+def _displayKey():
+    """Return the backend with its virtual screen bounds and monitor count, which change with the displays."""
+    return (_backend,) + tuple(_backend.getSystemMetrics(index) for index in (76, 77, 78, 79, 80))
+
+
+def getMonitors():
+    """
+    Get the geometry of every display monitor.
+
+    The monitors are enumerated once and cached. The cache is refreshed when
+    the virtual screen bounds or the number of monitors change, which a few
+    GetSystemMetrics() calls detect on every call.
+
+    Returns:
+    list of Monitor
+        The monitors as (left, top, width, height, primary) in virtual screen
+        coordinates, primary monitor first. Monitors left of or above the
+        primary monitor have negative coordinates.
+
+    Example:
+    for monitor in getMonitors():
+        print(monitor.left, monitor.top, monitor.width, monitor.height, monitor.primary)
+    """
+
+    key = _displayKey()
+    if key != _monitors['key']:
+        monitors = [Monitor(*monitor) for monitor in _backend.enumMonitors()]
+        monitors.sort(key=lambda monitor: (not monitor.primary, monitor.left, monitor.top))
+        _monitors['monitors'], _monitors['key'] = monitors, key
+    return _monitors['monitors']
+
+
+def getVirtualScreen():
+    """
+    Get the bounding box of all monitors.
+
+    Returns:
+    tuple
+        The virtual screen as (left, top, width, height). left and top are
+        negative when a monitor is left of or above the primary monitor.
+
+    Example:
+    position = locateImage('button.png', region=getVirtualScreen())  # Search every monitor.
+    """
+
+    return tuple(_backend.getSystemMetrics(index) for index in (76, 77, 78, 79))
+
+
+def monitorFromPoint(x, y):
+    """
+    Get the monitor showing a screen position.
+
+    Parameters:
+    x : int
+        The x-coordinate of the position.
+    y : int
+        The y-coordinate of the position.
+
+    Returns:
+    Monitor or None
+        The monitor containing the position, or None if no monitor shows it.
+
+    Example:
+    monitor = monitorFromPoint(*getMousePosition())
+    """
+
+    for monitor in getMonitors():
+        if monitor.left <= x < monitor.left + monitor.width and monitor.top <= y < monitor.top + monitor.height:
+            return monitor
+    return None
+
+
+def _screenBounds(region):
+    """Return the bounding box of the parts of a screen region shown by monitors, or None if none is."""
+    left, top, width, height = region
+    right, bottom = left + width, top + height
+    parts = [
+        (max(left, monitor.left), max(top, monitor.top),
+         min(right, monitor.left + monitor.width), min(bottom, monitor.top + monitor.height))
+        for monitor in getMonitors()
+    ]
+    parts = [part for part in parts if part[0] < part[2] and part[1] < part[3]]
+    if not parts:
+        return None
+    x0, y0 = min(part[0] for part in parts), min(part[1] for part in parts)
+    x1, y1 = max(part[2] for part in parts), max(part[3] for part in parts)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def _boundingRegion(regions):
+    """Return the bounding box (left, top, width, height) of several regions."""
+    regions = numpy.asarray(regions, dtype=numpy.int64).reshape(-1, 4)
+    left, top = regions[:, :2].min(axis=0)
+    right, bottom = (regions[:, :2] + regions[:, 2:]).max(axis=0)
+    return (int(left), int(top), int(right - left), int(bottom - top))
+
+
+def _frameRegion(region, left, top, shape):
+    """Return a screen region relative to a frame captured at left, top, clipped to the frame's shape."""
+    x, y, width, height = region
+    x0, y0 = max(x - left, 0), max(y - top, 0)
+    x1, y1 = min(x - left + width, shape[1]), min(y - top + height, shape[0])
+    return (x0, y0, max(x1 - x0, 0), max(y1 - y0, 0))
+
+
+def _grabScreen(region=None):
+    """
+    Capture a screen region and return the frame with the screen position of its top-left pixel.
+
+    Only the monitors intersecting the region are captured, clipped to the
+    region. Without a region, the primary monitor is captured. Returns None
+    if no monitor shows any part of the region.
+    """
+    if region is None:
+        return _capture.grab(), 0, 0
+    bounds = _screenBounds(region)
+    if bounds is None:
+        return None
+    return _capture.grab(bounds), bounds[0], bounds[1]
+
+
+# Frame Preprocessing
+
+# Conversion codes per (source channels, match mode), None where the frame
+# is matched as it is. Captures are BGRA, image files and pyscreeze grabs BGR.
+_CONVERSIONS = {
+    (1, 'gray'): None,
+    (3, 'gray'): COLOR_BGR2GRAY,
+    (4, 'gray'): COLOR_BGRA2GRAY,
+    (1, 'rgb'): COLOR_GRAY2RGB,
+    (3, 'rgb'): COLOR_BGR2RGB,
+    (4, 'rgb'): COLOR_BGRA2RGB
+}
+
+# Needle conversions to the channel layout of a haystack matched natively
+_NATIVE_NEEDLE = {
+    1: COLOR_BGR2GRAY,
+    3: None,
+    4: COLOR_BGR2BGRA
+}
+
+# Destination buffers reused by locateImage(), per thread and frame shape
+_frame_buffers = threading.local()
+
+# Number of shapes whose buffers are kept per thread
+_FRAME_BUFFER_SHAPES = 4
+
+
+def _channels(image):
+    """Return the number of channels of a gray, BGR or BGRA image."""
+    return 1 if image.ndim == 2 else image.shape[2]
+
+
+def _matchMode(grayscale):
+    """Return the mode images are matched in: 'gray', 'rgb' or 'native'."""
+    if grayscale:
+        return 'gray'
+    return 'native' if _locate['native'] else 'rgb'
+
+
+def _prepareImage(image, mode, dst=None):
+    """
+    Convert a gray, BGR or BGRA image to the form it is matched in.
+
+    The conversion is chosen from the channels of the image, so captured
+    BGRA frames and BGR image files end up in the same form. In 'native'
+    mode the image is returned unchanged. The result is written into `dst`
+    when its shape fits, instead of allocating a new array.
+    """
+    if mode == 'native':
+        return image
+    code = _CONVERSIONS[_channels(image), mode]
+    if code is None:
+        return image
+    return cvtColor(image, code, dst=dst)
+
+
+def _prepareNeedle(needle, mode, channels):
+    """Convert a BGR needle to the form of a haystack with the given channels prepared in a mode."""
+    if mode == 'native':
+        code = _NATIVE_NEEDLE[channels]
+        return needle if code is None else cvtColor(needle, code)
+    return _prepareImage(needle, mode)
+
+
+def _frameBuffer(image, mode):
+    """Return this thread's reusable destination array for preparing an image in a mode, or None."""
+    if mode == 'native':
+        return None
+    shape = image.shape[:2] if mode == 'gray' else image.shape[:2] + (3,)
+    buffers = getattr(_frame_buffers, 'buffers', None)
+    if buffers is None:
+        buffers = _frame_buffers.buffers = {}
+    buffer = buffers.get(shape)
+    if buffer is None:
+        if len(buffers) >= _FRAME_BUFFER_SHAPES:
+            buffers.clear()
+        buffer = buffers[shape] = numpy.empty(shape, dtype=numpy.uint8)
+    return buffer
+
+
+# Worker pools evaluating template matches in parallel. OpenCV releases
+# the GIL, so threads scale with cores; processes avoid the GIL entirely.
+_locate = {
+    'workers': None,
+    'processes': False,
+    'native': False
+}
+_locate_executor = None
+_locate_process_executor = None
+
+# Winning scale per (needle, grayscale) of multi-scale searches
+_needle_scales = {}
+
+# Score at which a multi-scale search stops without waiting for the other scales
+CONFIDENT_SCORE = 0.99
+
+
+def _getLocateExecutor(processes=False):
+    """Return the shared thread or process pool used to evaluate matches in parallel."""
+    global _locate_executor, _locate_process_executor
+    workers = _locate['workers'] or os.cpu_count() or 4
+    if processes:
+        if _locate_process_executor is None:
+            _locate_process_executor = ProcessPoolExecutor(max_workers=workers)
+        return _locate_process_executor
+    if _locate_executor is None:
+        _locate_executor = ThreadPoolExecutor(max_workers=workers,
+                                              thread_name_prefix='directinput-locate')
+    return _locate_executor
+
+
+def configLocate(workers=None, processes=None, native=None):
+    """
+    Configure the worker pool and color handling used for matching.
+
+    Parameters:
+    workers : int, optional
+        The number of workers. Default is the number of CPUs.
+    processes : bool, optional
+        Whether locateImages() runs its jobs in a process pool instead of a
+        thread pool, sharing the haystack through shared memory. Default is False.
+    native : bool, optional
+        Whether color searches match in the channel order of the captured frame
+        (BGRA for screen captures) instead of converting it to RGB. The needle is
+        converted to the frame's layout instead, so no full-frame conversion is
+        made. Scores are the same, as the constant alpha channel does not count,
+        but BGRA frames are matched on four channels, so it pays off most with
+        BGR sources such as image files and the pyscreeze backend. Default is False.
+
+    Example:
+    configLocate(workers=8)
+    configLocate(processes=True)
+    configLocate(native=True)
+    """
+
+    global _locate_executor, _locate_process_executor
+    if workers is not None:
+        _locate['workers'] = int(workers)
+        # Let the running pools finish and start new ones with the new size
+        for executor in (_locate_executor, _locate_process_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        _locate_executor = _locate_process_executor = None
+
+    if processes is not None:
+        _locate['processes'] = bool(processes)
+
+    if native is not None:
+        _locate['native'] = bool(native)
+
+
+def scaleRange(low=0.5, high=2.0, steps=16):
+    """
+    Return scale factors for a multi-scale locateImage() search.
+
+    The scales are spaced geometrically, so there are as many steps below
+    1.0 as above it for a symmetric range, and 1.0 is included whenever it
+    lies within the range.
+
+    Parameters:
+    low : float, optional
+        The smallest scale (default is 0.5).
+    high : float, optional
+        The largest scale (default is 2.0).
+    steps : int, optional
+        The number of scales (default is 16).
+
+    Returns:
+    list of float
+        The scale factors, in increasing order.
+
+    Example:
+    position = locateImage('button.png', scales=scaleRange(0.75, 2.0))
+    """
+
+    if steps < 2 or low == high:
+        scales = {low}
+        if low <= 1.0 <= high:
+            scales.add(1.0)
+        return sorted(scales)
+    ratio = (high / low) ** (1 / (steps - 1))
+    scales = {round(low * ratio ** i, 4) for i in range(steps)}
+    if low <= 1.0 <= high:
+        scales.add(1.0)
+    return sorted(scales)
+
+
+def clearScaleCache():
+    """
+    Forget the winning scales remembered by multi-scale locateImage() searches,
+    and the needle hashes cached by the locateImage() prefilter.
+
+    Example:
+    clearScaleCache()
+    """
+
+    _needle_scales.clear()
+    _needle_signatures.clear()
+
+
+def _bestMatch(haystack, needle):
+    """Return (score, x, y) of the best match of a needle in a haystack."""
+    result = matchTemplate(haystack, needle, TM_CCOEFF_NORMED)
+    _, score, _, (x, y) = minMaxLoc(result)
+    return score, x, y
+
+
+def _scaledMatch(haystack, needle, scale):
+    """Return (score, center x, center y) of the best match of a scaled needle, or None if it does not fit."""
+    height, width = needle.shape[:2]
+    size = (round(width * scale), round(height * scale))
+    if min(size) < 4 or size[0] > haystack.shape[1] or size[1] > haystack.shape[0]:
+        return None
+    if scale != 1.0:
+        needle = resize(needle, size, interpolation=INTER_AREA if scale < 1.0 else INTER_LINEAR)
+    score, x, y = _bestMatch(haystack, needle)
+    return score, x + size[0] / 2, y + size[1] / 2
+
+
+def _locateScaled(needle, haystack, threshold, scales, key):
+    """
+    Search a needle at several scales and return (score, center x, center y), or None.
+
+    The scale that won last time for the same key is tried first. The other
+    scales are evaluated in parallel, closest to 1.0 first, and the best one
+    reaching the threshold wins. The search stops early at a score of
+    CONFIDENT_SCORE or the threshold, whichever is higher.
+    """
+    remembered = _needle_scales.get(key)
+    if remembered is not None:
+        match = _scaledMatch(haystack, needle, remembered)
+        if match is not None and match[0] >= threshold:
+            return match
+
+    executor = _getLocateExecutor()
+    futures = {
+        executor.submit(_scaledMatch, haystack, needle, scale): scale
+        for scale in sorted(scales, key=lambda scale: abs(math.log(scale)))
+        if scale != remembered
+    }
+    best, best_scale = None, None
+    confident = max(threshold, CONFIDENT_SCORE)
+    try:
+        for future in as_completed(futures):
+            match = future.result()
+            if match is None or match[0] < threshold:
+                continue
+            if best is None or match[0] > best[0]:
+                best, best_scale = match, futures[future]
+            if match[0] >= confident:
+                break
+    finally:
+        # Drop the scales that did not start yet
+        for future in futures:
+            future.cancel()
+
+    if best is not None:
+        _needle_scales[key] = best_scale
+    return best
+
+
+# Difference hash and size of needle files, for the locateImage() prefilter
+_needle_signatures = {}
+
+
+def _quickReject(needlePath, haystack, region, max_distance):
+    """Return whether a searched area of the needle's size clearly differs from the needle by hash."""
+    signature = _needle_signatures.get(needlePath)
+    if signature is None:
+        needle = imread(needlePath)
+        signature = _needle_signatures[needlePath] = (_hashBits(needle, 8), needle.shape[:2])
+    bits, shape = signature
+
+    area = haystack
+    if region is not None:
+        left, top, width, height = region
+        area = haystack[top:top + height, left:left + width]
+    if area.shape[:2] != shape:
+        # Hashes of areas larger than the needle are not comparable
+        return False
+    return int(_POPCOUNT[_hashBits(area, 8) ^ bits].sum()) > max_distance
+
+
+@_instrumented
+def locateImage(needleImage, haystackImage=None, grayscale=False,
+                region=None, threshold=0.990, scales=None, prefilter=None):
+    """
+    Search for an image within another image or the screen.
+
+    This function searches for a smaller image (needleImage)
+    within a larger image (haystackImage) or the entire screen.
+    If haystackImage is not provided, the function captures the entire screen for searching
+    with the active capture backend, see setCaptureBackend(). When a region is given, only
+    the monitors showing it are captured, so regions on any monitor can be searched.
+    The search can be performed in grayscale for improved performance,
+    and a specific region can be defined for the search.
+    The threshold parameter sets the accuracy required for a match.
+
+    Parameters:
+    needleImage : str
+        The file path of the image to locate.
+    haystackImage : str or numpy.ndarray, optional
+        The file path of the image in which to search, or a gray, BGR or BGRA frame.
+        If not provided, the entire screen is used.
+    grayscale : bool, optional
+        Whether to perform the search in grayscale. Default is False.
+    region : tuple, optional
+        A tuple specifying the region to search
+        within (top-left x, top-left y, width, height).
+        If not specified, the entire image or screen is used.
+    threshold : float, optional
+        The confidence threshold for image matching. Default is 0.999.
+    scales : list of float, optional
+        Scale factors of the needle to search, for screens with a different DPI
+        scaling than the needle was captured at, see scaleRange(). The scales are
+        evaluated in parallel and the best one reaching the threshold wins, stopping
+        early at CONFIDENT_SCORE. The winning scale of each needle is remembered
+        and tried first next time.
+        If not specified, only the native size is searched.
+    prefilter : int, optional
+        Enables a quick reject when the searched area has the size of the needle,
+        as when polling a fixed region for an expected image. The difference hash
+        of the area is compared to the cached hash of the needle, and None is
+        returned without matching if more than `prefilter` of the 64 bits differ.
+        Around 10 rejects clearly different content. If not specified, every
+        search runs the full match.
+
+    Returns:
+    Point or None
+        The center coordinates of the located image as (x, y), or None if the image is not found.
+
+    Example:
+    position = locateImage('needle.png')                                                  # Search for 'needle.png' on the entire screen.
+    position = locateImage('needle.png', 'haystack.png', grayscale=True, threshold=0.95)  # Search within 'haystack.png' in grayscale with 95% confidence.
+    position = locateImage('needle.png', region=(0, 0, 800, 600))                         # Search within a specific region of the screen.
+    position = locateImage('needle.png', scales=scaleRange(0.5, 2.0))                     # Search at several scales.
+    position = locateImage('needle.png', region=(40, 60, 32, 32), prefilter=10)           # Poll a fixed region, rejecting cheaply.
+    """
+
+    needleKey = (needleImage, grayscale)
+    needlePath = needleImage
+    left, top = 0, 0
+    if haystackImage is None:
+        # Capture only the monitors showing the region with the active capture backend
+        screen = _grabScreen(region)
+        if screen is None:
+            return None
+        haystackImage, left, top = screen
+        region = None
+    elif not isinstance(haystackImage, numpy.ndarray):
+        haystackImage = imread(haystackImage)
+
+    if prefilter is not None and _quickReject(needlePath, haystackImage, region, prefilter):
+        return None
+
+    needleImage = imread(needlePath)
+
+    # Convert only the searched region, into this thread's reusable buffer
+    if region is not None:
+        left, top, width, height = region
+        haystackImage = haystackImage[top:top + height, left:left + width]
+    mode = _matchMode(grayscale)
+    haystackImage = _prepareImage(haystackImage, mode, _frameBuffer(haystackImage, mode))
+    needleImage = _prepareNeedle(needleImage, mode, _channels(haystackImage))
+    if scales is not None:
+        match = _locateScaled(needleImage, haystackImage, threshold, scales, needleKey)
+        if match is None:
+            return None
+        return Point(float(left + match[1]), float(top + match[2]))
+
+    # Find the image, newer pyscreeze versions raise instead of returning None.
+    # The images are already prepared, so pyscreeze must not convert them again.
+    try:
+        coords = pyscreeze.locate(needleImage, haystackImage,
+                                  grayscale=False, confidence=threshold)
+    except pyscreeze.ImageNotFoundException:
+        coords = None
+    if coords is None:
+        return None
+    else:
+        # Return the center coordinates of the image
+        center_x, center_y = float(left + coords[0] + coords[2]/2), float(top + coords[1] + coords[3]/2)
+        return Point(center_x, center_y)
+
+
+@_instrumented
+def waitForImage(needleImage, timeout=10.0, interval=0.1, **kwargs):
+    """
+    Wait until an image appears on the screen.
+
+    This function repeatedly searches for an image with locateImage() until it
+    is found or the timeout expires.
+
+    Parameters:
+    needleImage : str
+        The file path of the image to locate.
+    timeout : float, optional
+        The maximum time to wait in seconds (default is 10.0). None waits forever.
+    interval : float, optional
+        The delay between searches in seconds (default is 0.1).
+    **kwargs
+        Additional arguments passed to locateImage(), such as `grayscale`, `region` or `threshold`.
+
+    Returns:
+    Point or None
+        The center coordinates of the located image as (x, y), or None if the timeout expired.
+
+    Example:
+    position = waitForImage('button.png', timeout=5.0)
+    position = waitForImage('button.png', region=(0, 0, 800, 600), threshold=0.95)
+    """
+
+    deadline = None if timeout is None else _clock.now() + timeout
+    while True:
+        point = locateImage(needleImage, **kwargs)
+        if point is not None:
+            return point
+        if deadline is not None and _clock.now() + interval > deadline:
+            return None
+        _clock.sleep(interval)
+
+
+# The outcome of one locateImages() job
+LocateResult = namedtuple("LocateResult", "needle region point")
+
+
+def _matchJob(haystack, needle, region, mode, threshold):
+    """Locate a needle file in a haystack prepared in a mode and return its center Point, or None."""
+    needle = _prepareNeedle(imread(needle), mode, _channels(haystack))
+    left, top = 0, 0
+    if region is not None:
+        left, top, width, height = region
+        haystack = haystack[top:top + height, left:left + width]
+
+    height, width = needle.shape[:2]
+    if height > haystack.shape[0] or width > haystack.shape[1]:
+        return None
+    score, x, y = _bestMatch(haystack, needle)
+    if score < threshold:
+        return None
+    return Point(float(left + x + width / 2), float(top + y + height / 2))
+
+
+def _matchSharedJob(name, shape, dtype, needle, region, mode, threshold):
+    """Run _matchJob() in a worker process on a haystack in shared memory."""
+    try:
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python before 3.13 has no track argument
+        memory = shared_memory.SharedMemory(name=name)
+    haystack = None
+    try:
+        haystack = numpy.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        return _matchJob(haystack, needle, region, mode, threshold)
+    finally:
+        # The buffer cannot be closed while an array still uses it
+        haystack = None
+        memory.close()
+
+
+def locateImages(jobs, haystackImage=None, grayscale=False, threshold=0.990):
+    """
+    Search for several images at once on a worker pool.
+
+    The screen is captured and converted once, then every (needle, region)
+    job is matched in parallel. Results are yielded as soon as each job
+    finishes, so the order is the completion order, not the order of the jobs.
+    With configLocate(processes=True) the jobs run in worker processes, which
+    read the haystack from shared memory instead of receiving a copy. Scripts
+    using processes must guard their entry point with `if __name__ == '__main__':`.
+
+    Parameters:
+    jobs : list
+        The needle file paths, or (needle, region) tuples to search only a region
+        (top-left x, top-left y, width, height) of the haystack.
+    haystackImage : str or numpy.ndarray, optional
+        The file path of the image in which to search, or a gray, BGR or BGRA frame.
+        If not provided, the screen is captured once: the monitors showing the job
+        regions, and the primary monitor for jobs without a region.
+    grayscale : bool, optional
+        Whether to perform the search in grayscale. Default is False.
+    threshold : float, optional
+        The confidence threshold for image matching. Default is 0.99.
+
+    Returns:
+    generator of LocateResult
+        A (needle, region, point) tuple per job, where point is the center of the
+        located image or None if the image is not found.
+
+    Example:
+    for result in locateImages(['ok.png', 'cancel.png', ('icon.png', (0, 0, 400, 300))]):
+        if result.point is not None:
+            print(result.needle, result.point)
+    """
+
+    jobs = [(job, None) if isinstance(job, (str, os.PathLike)) else tuple(job) for job in jobs]
+
+    # The region of each job within the haystack, whose top-left pixel is at left, top
+    left, top = 0, 0
+    searches = jobs
+    if haystackImage is None:
+        # Capture only the monitors showing the regions, jobs without one search the primary monitor
+        primary = (0, 0) + tuple(getDisplaySize())
+        regions = [primary if region is None else region for _, region in jobs]
+        screen = _grabScreen(_boundingRegion(regions)) if jobs else None
+        if screen is None:
+            for needle, region in jobs:
+                yield LocateResult(needle, region, None)
+            return
+        haystack, left, top = screen
+        searches = [(needle, _frameRegion(region, left, top, haystack.shape))
+                    for (needle, _), region in zip(jobs, regions)]
+    elif isinstance(haystackImage, numpy.ndarray):
+        haystack = haystackImage
+    else:
+        haystack = imread(haystackImage)
+    mode = _matchMode(grayscale)
+    haystack = _prepareImage(haystack, mode)
+
+    memory = None
+    futures = {}
+    processes = _locate['processes']
+    executor = _getLocateExecutor(processes)
+    try:
+        if processes:
+            # Share the haystack once instead of pickling it for every job
+            memory = shared_memory.SharedMemory(create=True, size=haystack.nbytes)
+            numpy.ndarray(haystack.shape, dtype=haystack.dtype, buffer=memory.buf)[...] = haystack
+            futures = {
+                executor.submit(_matchSharedJob, memory.name, haystack.shape, haystack.dtype.str,
+                                needle, search, mode, threshold): job
+                for job, (needle, search) in zip(jobs, searches)
+            }
+        else:
+            futures = {
+                executor.submit(_matchJob, haystack, needle, search, mode, threshold): job
+                for job, (needle, search) in zip(jobs, searches)
+            }
+
+        for future in as_completed(futures):
+            needle, region = futures[future]
+            point = future.result()
+            if point is not None:
+                point = Point(left + point.x, top + point.y)
+            yield LocateResult(needle, region, point)
+    finally:
+        for future in futures:
+            future.cancel()
+        if memory is not None:
+            # Running jobs keep their own handle until they finish
+            memory.close()
+            memory.unlink()
+
+
+def _moveInput(x, y):
+    """Build the Input event that moves the cursor to a position on the virtual screen."""
+    dx, dy = _absoluteCoords(x, y, getVirtualScreen())
+    return _mouseInput(MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK, dx=dx, dy=dy)
+
+
+def _imageTarget(needleImage, offset, timeout, interval, kwargs):
+    """Locate an image, retrying until the timeout, and return the rounded target position or None."""
+    point = waitForImage(needleImage, timeout=timeout, interval=interval, **kwargs)
+    if point is None:
+        return None
+    return Point(round(point.x + offset[0]), round(point.y + offset[1]))
+
+
+@_instrumented
+def moveToImage(needleImage, offset=(0, 0), timeout=0, interval=0.1, **kwargs):
+    """
+    Move the mouse cursor to an image on the screen.
+
+    The screen is captured and searched once per attempt. The cursor is moved
+    with a single SendInput call, without reading the cursor position.
+
+    Parameters:
+    needleImage : str
+        The file path of the image to locate.
+    offset : tuple, optional
+        The (x, y) offset from the center of the image to move to. Default is (0, 0).
+    timeout : float, optional
+        How long to keep searching in seconds if the image is not found (default is 0,
+        a single search). None searches forever.
+    interval : float, optional
+        The delay between searches in seconds (default is 0.1).
+    **kwargs
+        Additional arguments passed to locateImage(), such as `grayscale`, `region` or `threshold`.
+
+    Returns:
+    Point or None
+        The screen position the cursor was moved to, or None if the image was not found.
+
+    Example:
+    moveToImage('menu.png')
+    moveToImage('slider.png', offset=(-20, 0), region=(0, 0, 800, 600))
+    """
+
+    target = _imageTarget(needleImage, offset, timeout, interval, kwargs)
+    if target is not None:
+        _sendInputs([_moveInput(*target)])
+    return target
+
+
+@_instrumented
+def clickImage(needleImage, button='left', clicks=1, offset=(0, 0), timeout=0, interval=0.1,
+               key_delay=0, **kwargs):
+    """
+    Click on an image on the screen.
+
+    The screen is captured and searched once per attempt, then the move and
+    the clicks are injected together with a single SendInput call, which
+    keeps the delay between seeing the image and clicking it to a minimum.
+
+    Parameters:
+    needleImage : str
+        The file path of the image to locate.
+    button : str, optional
+        The mouse button to click ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+    clicks : int, optional
+        The number of clicks. Default is 1, 2 double-clicks.
+    offset : tuple, optional
+        The (x, y) offset from the center of the image to click. Default is (0, 0).
+    timeout : float, optional
+        How long to keep searching in seconds if the image is not found (default is 0,
+        a single search). None searches forever.
+    interval : float, optional
+        The delay between searches in seconds (default is 0.1).
+    key_delay : float, optional
+        The delay (in seconds) between each button press and release. Default is 0,
+        which injects everything in one batch. Otherwise every press and release
+        is injected separately.
+    **kwargs
+        Additional arguments passed to locateImage(), such as `grayscale`, `region` or `threshold`.
+
+    Returns:
+    Point or None
+        The screen position clicked, or None if the image was not found.
+
+    Example:
+    clickImage('ok.png')
+    clickImage('file.png', clicks=2)
+    clickImage('checkbox.png', offset=(-40, 0), timeout=2.0, threshold=0.95)
+    """
+
+    target = _imageTarget(needleImage, offset, timeout, interval, kwargs)
+    if target is None:
+        return None
+
+    press_inputs = _buttonInputs(button)
+    release_inputs = _buttonInputs(button, up=True)
+    if not key_delay:
+        _sendInputs([_moveInput(*target)] + (press_inputs + release_inputs) * clicks)
+        return target
+
+    _sendInputs([_moveInput(*target)])
+    for _ in range(clicks):
+        _sendInputs(press_inputs)
+        _clock.sleep(key_delay)
+        _sendInputs(release_inputs)
+    return target
+
+
+def waitAndClick(needleImage, timeout=10.0, interval=0.1, button='left', clicks=1, offset=(0, 0),
+                 **kwargs):
+    """
+    Wait until an image appears on the screen and click on it.
+
+    Same as clickImage() with a default timeout of 10 seconds.
+
+    Parameters:
+    needleImage : str
+        The file path of the image to locate.
+    timeout : float, optional
+        The maximum time to wait in seconds (default is 10.0). None waits forever.
+    interval : float, optional
+        The delay between searches in seconds (default is 0.1).
+    button, clicks, offset, **kwargs
+        Passed to clickImage().
+
+    Returns:
+    Point or None
+        The screen position clicked, or None if the timeout expired.
+
+    Example:
+    if waitAndClick('continue.png', timeout=30.0) is None:
+        print('The dialog never appeared')
+    """
+
+    return clickImage(needleImage, button=button, clicks=clicks, offset=offset,
+                      timeout=timeout, interval=interval, **kwargs)
+
+
+@_instrumented
+def pixels(points):
+    """
+    Get the colors of several screen pixels with one capture.
+
+    Only the smallest rectangle containing every point is captured, with the
+    active capture backend, on the monitors showing it.
+
+    Parameters:
+    points : list of tuple
+        The (x, y) screen coordinates of the pixels.
+
+    Returns:
+    list of RGB
+        The color of each pixel as (red, green, blue), in the order of the points.
+
+    Example:
+    colors = pixels([(10, 10), (200, 40), (640, 480)])
+    """
+
+    if not points:
+        return []
+
+    coords = numpy.asarray(points, dtype=numpy.int64).reshape(-1, 2)
+    x, y = coords[:, 0], coords[:, 1]
+    shown = numpy.zeros(len(coords), dtype=bool)
+    for monitor in getMonitors():
+        shown |= ((x >= monitor.left) & (x < monitor.left + monitor.width)
+                  & (y >= monitor.top) & (y < monitor.top + monitor.height))
+    if not shown.all():
+        raise ValueError("Points outside the captured screen area")
+
+    left, top = coords.min(axis=0)
+    right, bottom = coords.max(axis=0)
+    frame, left, top = _grabScreen((int(left), int(top), int(right - left + 1), int(bottom - top + 1)))
+
+    # Frames are BGR or BGRA
+    colors = frame[coords[:, 1] - top, coords[:, 0] - left, 2::-1]
+    return [RGB(*color) for color in colors.tolist()]
+
+
+def pixel(x, y):
+    """
+    Get the color of a screen pixel.
+
+    Only the pixel itself is captured, which is far cheaper than locating
+    an image on the whole screen.
+
+    Parameters:
+    x : int
+        The x-coordinate of the pixel.
+    y : int
+        The y-coordinate of the pixel.
+
+    Returns:
+    RGB
+        The color of the pixel as (red, green, blue).
+
+    Example:
+    color = pixel(100, 200)
+    print(color.red, color.green, color.blue)
+    """
+
+    return pixels([(x, y)])[0]
+
+
+def _colorMatches(actual, expected, tolerance):
+    """Return whether every channel of two RGB colors differs by at most tolerance."""
+    return all(abs(a - e) <= tolerance for a, e in zip(actual, expected[:3]))
+
+
+def pixelMatchesColor(x, y, color, tolerance=0):
+    """
+    Check whether a screen pixel has a color.
+
+    Parameters:
+    x : int
+        The x-coordinate of the pixel.
+    y : int
+        The y-coordinate of the pixel.
+    color : tuple
+        The expected color as (red, green, blue).
+    tolerance : int, optional
+        The maximum difference allowed per channel (default is 0).
+
+    Returns:
+    bool
+        True if every channel is within the tolerance of the expected color.
+
+    Example:
+    if pixelMatchesColor(100, 200, (0, 255, 0), tolerance=10):
+        print('Status light is green')
+    """
+
+    return _colorMatches(pixel(x, y), color, tolerance)
+
+
+@_instrumented
+def waitForPixel(x, y, color, tolerance=0, timeout=10.0, interval=0.05):
+    """
+    Wait until a screen pixel has a color.
+
+    The pixel is polled on a fixed schedule, so the time spent capturing does
+    not add up to the interval between polls.
+
+    Parameters:
+    x : int
+        The x-coordinate of the pixel.
+    y : int
+        The y-coordinate of the pixel.
+    color : tuple
+        The expected color as (red, green, blue).
+    tolerance : int, optional
+        The maximum difference allowed per channel (default is 0).
+    timeout : float, optional
+        The maximum time to wait in seconds (default is 10.0). None waits forever.
+    interval : float, optional
+        The time between polls in seconds (default is 0.05). 0 polls continuously.
+
+    Returns:
+    RGB or None
+        The color of the pixel once it matched, or None if the timeout expired.
+
+    Example:
+    if waitForPixel(100, 200, (0, 255, 0), tolerance=10, timeout=5.0):
+        print('Status light turned green')
+    """
+
+    start = _clock.now()
+    deadline = None if timeout is None else start + timeout
+    polls = 0
+    while True:
+        polled = _clock.now()
+        actual = pixel(x, y)
+        if _colorMatches(actual, color, tolerance):
+            return actual
+
+        now = _clock.now()
+        if interval <= 0:
+            # Poll again immediately, advancing a clock that did not move over the poll
+            if deadline is not None and now >= deadline:
+                return None
+            if now == polled:
+                _clock.sleep(POLL_TICK)
+            continue
+
+        # Poll at start + n * interval, skipping polls that were missed
+        polls += 1
+        next_poll = start + polls * interval
+        if next_poll < now:
+            polls = int((now - start) / interval) + 1
+            next_poll = start + polls * interval
+        if deadline is not None and next_poll > deadline:
+            return None
+        _clock.sleep(next_poll - now)
+
+
+def _colorMask(frame, color, tolerance):
+    """Return a mask of the pixels of a BGR or BGRA frame within tolerance of an RGB color."""
+    mask = None
+    # Compare each channel in place on uint8 views, without widening the frame
+    for channel, value in zip((2, 1, 0), color[:3]):
+        plane = frame[..., channel]
+        low, high = value - tolerance, value + tolerance
+        match = None
+        if low > 0:
+            match = plane >= low
+        if high < 255:
+            below = plane <= high
+            match = below if match is None else numpy.logical_and(match, below, out=match)
+        if match is not None:
+            mask = match if mask is None else numpy.logical_and(mask, match, out=mask)
+    if mask is None:
+        mask = numpy.ones(frame.shape[:2], dtype=bool)
+    return mask
+
+
+@_instrumented
+def locateColor(color, tolerance=0, region=None):
+    """
+    Search the screen for a pixel of a color.
+
+    The captured region is compared to the color in a single vectorized pass,
+    which is much cheaper than matching an image.
+
+    Parameters:
+    color : tuple
+        The color to search for as (red, green, blue).
+    tolerance : int, optional
+        The maximum difference allowed per channel (default is 0).
+    region : tuple, optional
+        A tuple specifying the region to search within (top-left x, top-left y, width, height).
+        If not specified, the entire screen is used.
+
+    Returns:
+    Point or None
+        The screen coordinates of the first matching pixel, scanning rows from the top,
+        or None if no pixel matches.
+
+    Example:
+    position = locateColor((255, 0, 0), tolerance=20, region=(0, 0, 800, 600))
+    """
+
+    screen = _grabScreen(region)
+    if screen is None:
+        return None
+    frame, left, top = screen
+    mask = _colorMask(frame, color, tolerance)
+
+    # argmax stops at the first match of a boolean mask
+    index = int(numpy.argmax(mask))
+    y, x = divmod(index, mask.shape[1])
+    if not mask[y, x]:
+        return None
+    return Point(left + x, top + y)
+
+
+# A connected area of matching pixels: bounding box, pixel count and centroid
+Blob = namedtuple("Blob", "left top width height area center")
+
+
+@_instrumented
+def findBlobs(color, tolerance=0, region=None, min_area=1, connectivity=8):
+    """
+    Find connected areas of a color on the screen.
+
+    The captured region is masked in a single vectorized pass, and connected
+    components of the mask are labelled with their bounding boxes and areas.
+    Useful for health bars, highlights and progress indicators.
+
+    Parameters:
+    color : tuple
+        The color to search for as (red, green, blue).
+    tolerance : int, optional
+        The maximum difference allowed per channel (default is 0).
+    region : tuple, optional
+        A tuple specifying the region to search within (top-left x, top-left y, width, height).
+        If not specified, the entire screen is used.
+    min_area : int, optional
+        The minimum number of pixels of a blob (default is 1).
+    connectivity : int, optional
+        4 or 8, whether diagonal pixels are connected (default is 8).
+
+    Returns:
+    list of Blob
+        The blobs as (left, top, width, height, area, center) in screen coordinates,
+        largest first. center is the centroid as a Point.
+
+    Example:
+    blobs = findBlobs((200, 30, 30), tolerance=25, region=(20, 20, 300, 40), min_area=10)
+    if blobs:
+        print('Health bar width:', blobs[0].width)
+    """
+
+    screen = _grabScreen(region)
+    if screen is None:
+        return []
+    frame, left, top = screen
+    mask = _colorMask(frame, color, tolerance).view(numpy.uint8)
+
+    count, _, stats, centroids = connectedComponentsWithStats(mask, connectivity=connectivity)
+
+    # Label 0 is the background
+    blobs = [
+        Blob(left + int(x), top + int(y), int(w), int(h), int(area),
+             Point(left + float(cx), top + float(cy)))
+        for (x, y, w, h, area), (cx, cy) in zip(stats[1:count].tolist(), centroids[1:count].tolist())
+        if area >= min_area
+    ]
+    blobs.sort(key=lambda blob: blob.area, reverse=True)
+    return blobs
+
+
+def _changedMask(frame, baseline, tolerance=0):
+    """Return the mask of pixels differing from a baseline by more than a tolerance in any channel."""
+    difference = absdiff(frame, baseline)
+    if difference.ndim == 3:
+        # Maxima of the channel planes, much faster than reducing along the channel axis
+        difference = reduce(numpy.maximum, (difference[..., channel]
+                                            for channel in range(difference.shape[2])))
+    return difference > tolerance
+
+
+class IncrementalMatcher:
+    """
+    Track a needle across successive captures, re-matching only what changed.
+
+    The searched area is divided into tiles. Each tile keeps the best match
+    whose top-left corner lies inside it. On every update, the tiles whose
+    area, extended by the needle size, contains a changed pixel are matched
+    again and the others keep their previous results. On a mostly static
+    screen the cost of an update follows the fraction of changed pixels.
+
+    Attributes:
+        threshold (float): The confidence threshold for a match.
+        dirty_tiles (int): The number of tiles matched by the last update.
+        matches (list): (Point, score) of every tile whose best match reaches
+                        the threshold after the last update, best first.
+    """
+
+    def __init__(self, needleImage, region=None, grayscale=False, threshold=0.990, tile_size=128):
+        """
+        Initialize the matcher.
+
+        Args:
+            needleImage (str): The file path of the image to track.
+            region (tuple): The screen region (top-left x, top-left y, width, height) to
+                            search. If not specified, the entire screen is used.
+            grayscale (bool): Whether to match in grayscale.
+            threshold (float): The confidence threshold for a match.
+            tile_size (int): The width and height of the tiles in pixels.
+        """
+        self.mode = _matchMode(grayscale)
+        self.needle = None
+        self.region = region
+        self.threshold = threshold
+        self.tile_size = tile_size
+        self.dirty_tiles = 0
+        self.matches = []
+        self._needle = imread(needleImage)
+        # The previous frame, and the spare buffer the next one is prepared into
+        self._frame = None
+        self._spare = None
+        # Screen position of the top-left pixel of the previous frame
+        self._origin = None
+
+    def reset(self):
+        """Forget the previous capture, so the next update matches every tile."""
+        self._frame = None
+
+    def _layout(self, frame):
+        """Set up the needle, the tile grid and the result arrays for a prepared frame."""
+        self.needle = _prepareNeedle(self._needle, self.mode, _channels(frame))
+        height, width = frame.shape[:2]
+        size = self.tile_size
+        self._ys = numpy.arange(0, height, size)
+        self._xs = numpy.arange(0, width, size)
+        self._scores = numpy.full((len(self._ys), len(self._xs)), -1.0, dtype=numpy.float32)
+        self._positions = numpy.zeros((len(self._ys), len(self._xs), 2), dtype=numpy.int64)
+
+    def _dirtyTiles(self, frame):
+        """Return the mask of tiles whose needle-extended area changed since the previous frame."""
+        changed = _changedMask(frame, self._frame)
+
+        # Count changed pixels over every extended tile with a summed-area table
+        table = integral(changed.view(numpy.uint8))
+        height, width = changed.shape
+        needle_height, needle_width = self.needle.shape[:2]
+        y0 = self._ys[:, None]
+        x0 = self._xs[None, :]
+        y1 = numpy.minimum(y0 + self.tile_size + needle_height - 1, height)
+        x1 = numpy.minimum(x0 + self.tile_size + needle_width - 1, width)
+        counts = table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+        return counts > 0
+
+    def update(self, frame=None):
+        """
+        Capture the region and update the matches of the changed tiles.
+
+        Args:
+            frame (numpy.ndarray): A BGR or BGRA frame of the region to use instead of capturing.
+
+        Returns:
+            Point or None: The screen coordinates of the center of the best match,
+            or None if no tile reaches the threshold or no monitor shows the region.
+        """
+        if frame is None:
+            screen = _grabScreen(self.region)
+            if screen is None:
+                self.dirty_tiles = 0
+                self.matches = []
+                return None
+            frame, left, top = screen
+        else:
+            left, top = (0, 0) if self.region is None else self.region[:2]
+        # Alternate between two buffers, the other one holds the previous frame
+        spare = self._spare
+        prepared = _prepareImage(frame, self.mode, spare)
+        if prepared is frame:
+            # Unconverted frames are copied, as the caller may reuse them
+            if spare is None or spare.shape != frame.shape:
+                spare = numpy.empty_like(frame)
+            numpy.copyto(spare, frame)
+            prepared = spare
+        frame = prepared
+
+        if self._frame is None or self._frame.shape != frame.shape or self._origin != (left, top):
+            # A clipped region moves with the monitor layout, and so do the tiles
+            self._layout(frame)
+            dirty = numpy.ones(self._scores.shape, dtype=bool)
+        else:
+            dirty = self._dirtyTiles(frame)
+        self._spare, self._frame = self._frame, frame
+        self._origin = (left, top)
+
+        size = self.tile_size
+        needle_height, needle_width = self.needle.shape[:2]
+        for ty, tx in zip(*numpy.nonzero(dirty)):
+            y, x = int(self._ys[ty]), int(self._xs[tx])
+            # Placements starting in the tile reach one needle size beyond it
+            area = frame[y:y + size + needle_height - 1, x:x + size + needle_width - 1]
+            if area.shape[0] < needle_height or area.shape[1] < needle_width:
+                continue
+            score, px, py = _bestMatch(area, self.needle)
+            self._scores[ty, tx] = score
+            self._positions[ty, tx] = (x + px, y + py)
+        self.dirty_tiles = int(dirty.sum())
+
+        hits = numpy.argwhere(self._scores >= self.threshold)
+        self.matches = sorted(
+            ((Point(float(left + self._positions[ty, tx, 0] + needle_width / 2),
+                    float(top + self._positions[ty, tx, 1] + needle_height / 2)),
+              float(self._scores[ty, tx])) for ty, tx in hits),
+            key=lambda match: match[1], reverse=True
+        )
+        return self.matches[0][0] if self.matches else None
+
+
+# Icon Bank
+
+# Number of set bits of every byte value, to count differing hash bits
+_POPCOUNT = numpy.array([bin(i).count('1') for i in range(256)], dtype=numpy.uint8)
+
+# The outcome of classifying a cell: icon name, verification score and hash distance
+IconMatch = namedtuple("IconMatch", "name score distance")
+
+
+def _grayImage(image):
+    """Return a gray, BGR or BGRA image as a gray image."""
+    if image.ndim == 2:
+        return image
+    return cvtColor(image, COLOR_BGRA2GRAY if image.shape[2] == 4 else COLOR_BGR2GRAY)
+
+
+def _hashBits(image, hash_size):
+    """Return the difference hash of an image as packed bits."""
+    small = resize(_grayImage(image), (hash_size + 1, hash_size), interpolation=INTER_AREA)
+    return numpy.packbits(small[:, 1:] > small[:, :-1])
+
+
+def imageHash(image, hash_size=8):
+    """
+    Compute the difference hash (dHash) of an image.
+
+    The image is shrunk to (hash_size + 1) x hash_size gray pixels and each bit
+    tells whether a pixel is brighter than its left neighbour. Similar images
+    have hashes that differ in few bits, regardless of size and small changes.
+
+    Parameters:
+    image : str or numpy.ndarray
+        The file path of the image, or a gray, BGR or BGRA array.
+    hash_size : int, optional
+        The hash has hash_size * hash_size bits (default is 8).
+
+    Returns:
+    int
+        The hash.
+
+    Example:
+    distance = bin(imageHash('a.png') ^ imageHash('b.png')).count('1')
+    """
+
+    if isinstance(image, (str, os.PathLike)):
+        image = imread(os.fspath(image))
+    return int.from_bytes(_hashBits(image, hash_size).tobytes(), 'big')
+
+
+class IconBank:
+    """
+    An index of icons classifying image cells by perceptual hash.
+
+    Every icon is fingerprinted once with a difference hash. A cell is
+    classified by looking its hash up in the index, falling back to the
+    nearest hashes by Hamming distance, and only those candidates are
+    verified with a full template match. The index can be saved and loaded
+    with the icons, so fingerprints are computed once.
+
+    Attributes:
+        names (list): The icon names, in the order they were added.
+        hash_size (int): The hashes have hash_size * hash_size bits.
+    """
+
+    def __init__(self, hash_size=8):
+        """
+        Initialize an empty icon bank.
+
+        Args:
+            hash_size (int): The hashes have hash_size * hash_size bits.
+        """
+        self.hash_size = hash_size
+        self.names = []
+        self._icons = []
+        self._hashes = numpy.empty((0, (hash_size * hash_size + 7) // 8), dtype=numpy.uint8)
+        self._lookup = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, image):
+        """
+        Add an icon to the bank.
+
+        Args:
+            name (str): The name returned when a cell shows this icon.
+            image (str or numpy.ndarray): The file path of the icon, or a gray, BGR or BGRA array.
+        """
+        if isinstance(image, (str, os.PathLike)):
+            path = image
+            image = imread(os.fspath(path))
+            if image is None:
+                raise FileNotFoundError(f"Cannot read image: {path}")
+        if image.ndim == 3:
+            image = image[..., :3]
+        image = numpy.ascontiguousarray(image)
+
+        bits = _hashBits(image, self.hash_size)
+        self._lookup.setdefault(bits.tobytes(), []).append(len(self.names))
+        self.names.append(name)
+        self._icons.append(image)
+        self._hashes = numpy.vstack((self._hashes, bits))
+
+    def classify(self, cell, threshold=0.9, max_distance=10):
+        """
+        Identify the icon shown in a cell.
+
+        Args:
+            cell (numpy.ndarray): The cell as a gray, BGR or BGRA array, about the size of the icons.
+            threshold (float): The template match score a candidate needs.
+            max_distance (int): The most hash bits a candidate may differ by.
+
+        Returns:
+            IconMatch or None: The icon name, match score and hash distance,
+            or None if no icon matches.
+        """
+        if not self.names:
+            return None
+        if cell.ndim == 3:
+            cell = cell[..., :3]
+        cell = numpy.ascontiguousarray(cell)
+        bits = _hashBits(cell, self.hash_size)
+
+        # Icons with an identical hash are found by lookup and verified first
+        exact = self._lookup.get(bits.tobytes(), [])
+        match = self._verify(cell, exact, 0, threshold)
+        if match is not None:
+            return match
+
+        # Then the nearest other hashes by Hamming distance, one distance at a time
+        distances = _POPCOUNT[self._hashes ^ bits].sum(axis=1, dtype=numpy.int32)
+        for distance in numpy.unique(distances[(distances > 0) & (distances <= max_distance)]).tolist():
+            candidates = numpy.flatnonzero(distances == distance).tolist()
+            match = self._verify(cell, candidates, distance, threshold)
+            if match is not None:
+                return match
+        return None
+
+    def _verify(self, cell, indices, distance, threshold):
+        """Return the best IconMatch of candidate icons verified by template match, or None."""
+        best = None
+        for index in indices:
+            icon = self._icons[index]
+            area = cell
+            # An icon or cell without color is matched in gray
+            if icon.ndim != area.ndim:
+                if icon.ndim == 2:
+                    area = _grayImage(area)
+                else:
+                    icon = _grayImage(icon)
+            if icon.shape[0] > area.shape[0] or icon.shape[1] > area.shape[1]:
+                icon = resize(icon, (area.shape[1], area.shape[0]), interpolation=INTER_AREA)
+            score, _, _ = _bestMatch(area, icon)
+            if score >= threshold and (best is None or score > best.score):
+                best = IconMatch(self.names[index], score, distance)
+        return best
+
+    def classifyCells(self, cells, haystackImage=None, threshold=0.9, max_distance=10):
+        """
+        Identify the icons shown in several cells of the screen with one capture.
+
+        Args:
+            cells (list): The cell regions (top-left x, top-left y, width, height).
+            haystackImage (str): The file path of an image to use instead of the screen.
+            threshold (float): The template match score a candidate needs.
+            max_distance (int): The most hash bits a candidate may differ by.
+
+        Returns:
+            list: An IconMatch or None per cell, in the order of the cells.
+        """
+        if not cells:
+            return []
+        bounds = _boundingRegion(cells)
+        if haystackImage is None:
+            # Capture only the monitors showing the cells
+            screen = _grabScreen(bounds)
+            if screen is None:
+                return [None] * len(cells)
+            frame, left, top = screen
+        else:
+            frame, left, top = imread(haystackImage), 0, 0
+
+        matches = []
+        for cell in cells:
+            x, y, w, h = _frameRegion(cell, left, top, frame.shape)
+            area = frame[y:y + h, x:x + w]
+            # Cells no monitor shows are not classified
+            matches.append(self.classify(area, threshold, max_distance) if area.size else None)
+        return matches
+
+    def save(self, filename):
+        """
+        Save the index and its icons to a file.
+
+        Args:
+            filename (str): The file path, a NumPy .npz archive.
+        """
+        icons = {f'icon_{i}': icon for i, icon in enumerate(self._icons)}
+        with open(filename, 'wb') as f:
+            numpy.savez_compressed(f, hash_size=self.hash_size, names=numpy.array(self.names, dtype=str),
+                                   hashes=self._hashes, **icons)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load an index saved with save().
+
+        Args:
+            filename (str): The file path.
+
+        Returns:
+            IconBank: The loaded bank. The hashes are not recomputed.
+        """
+        with numpy.load(filename) as data:
+            bank = cls(int(data['hash_size']))
+            bank.names = data['names'].tolist()
+            bank._icons = [data[f'icon_{i}'] for i in range(len(bank.names))]
+            bank._hashes = data['hashes']
+        for index, bits in enumerate(bank._hashes):
+            bank._lookup.setdefault(bits.tobytes(), []).append(index)
+        return bank
+
+
+# Window Targeting
+
+# A located image in client area and screen coordinates
+WindowPoint = namedtuple("WindowPoint", "window screen")
+
+
+class WindowNotFoundError(LookupError):
+    """Raised when no visible window has the title and class searched for."""
+
+
+class Window:
+    """
+    A top-level window whose client area is captured and searched instead of the screen.
+
+    The window is found by title and class once and its handle is kept. The
+    client area is read again before every capture, which is cheap next to
+    the capture itself, so moves and resizes are followed. If the window was
+    closed, it is searched for again by title and class. Regions passed to
+    the methods are relative to the client area, and only the requested part
+    of the client area is captured.
+
+    Attributes:
+        title (str): The title searched for, or None for any title.
+        class_name (str): The window class searched for, or None for any class.
+        exact (bool): Whether the title must match exactly instead of being
+                      contained in the window title, ignoring case.
+        hwnd (int): The handle of the window.
+        rect (tuple): The last known client area (left, top, width, height)
+                      in screen coordinates.
+    """
+
+    def __init__(self, title=None, class_name=None, exact=False):
+        """
+        Find a window.
+
+        Args:
+            title (str): The window title, or part of it unless exact is True.
+            class_name (str): The exact window class name.
+            exact (bool): Whether the title must match exactly.
+
+        Raises:
+            WindowNotFoundError: If no visible window matches.
+        """
+        if title is None and class_name is None:
+            raise ValueError("A window title or class name is required")
+        self.title = title
+        self.class_name = class_name
+        self.exact = exact
+        self.hwnd = None
+        self.rect = None
+        self.find()
+
+    def __repr__(self):
+        return f"Window(title={self.title!r}, class_name={self.class_name!r}, hwnd={self.hwnd!r}, rect={self.rect!r})"
+
+    def _matches(self, title, class_name):
+        """Return whether a window title and class name match the search."""
+        if self.class_name is not None and class_name != self.class_name:
+            return False
+        if self.title is None:
+            return True
+        if self.exact:
+            return title == self.title
+        return self.title.lower() in title.lower()
+
+    def find(self):
+        """
+        Search for the frontmost matching window and cache its handle and client area.
+
+        Returns:
+            int: The window handle.
+
+        Raises:
+            WindowNotFoundError: If no visible window matches.
+        """
+        for hwnd, title, class_name in _backend.enumWindows():
+            if self._matches(title, class_name):
+                rect = _backend.getClientRect(hwnd)
+                if rect is not None:
+                    self.hwnd, self.rect = hwnd, rect
+                    return hwnd
+        raise WindowNotFoundError(f"No window with title {self.title!r} and class {self.class_name!r}")
+
+    def refresh(self):
+        """
+        Read the client area again, finding the window again if it was closed.
+
+        Returns:
+            tuple: The client area (left, top, width, height) in screen coordinates.
+        """
+        rect = None if self.hwnd is None else _backend.getClientRect(self.hwnd)
+        if rect is None:
+            self.find()
+        else:
+            self.rect = rect
+        return self.rect
+
+    def toScreen(self, x, y):
+        """Return the screen coordinates of a point of the client area, using the last known position."""
+        return Point(self.rect[0] + x, self.rect[1] + y)
+
+    def toWindow(self, x, y):
+        """Return the client area coordinates of a screen point, using the last known position."""
+        return Point(x - self.rect[0], y - self.rect[1])
+
+    def _screenRegion(self, region):
+        """Return the screen region of a client area region, clipped to the client area, or None if empty."""
+        left, top, width, height = self.refresh()
+        if region is not None:
+            x, y, w, h = region
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + w, width), min(y + h, height)
+            left, top, width, height = left + x0, top + y0, x1 - x0, y1 - y0
+        if width <= 0 or height <= 0:
+            # Minimized windows have an empty client area
+            return None
+        return (left, top, width, height)
+
+    def grab(self, region=None):
+        """
+        Capture the client area with the active capture backend.
+
+        Args:
+            region (tuple): The region (left, top, width, height) of the client area to
+                            capture. If not specified, the whole client area is captured.
+
+        Returns:
+            numpy.ndarray: The frame in the capture backend's format, or None if the
+            captured area is empty.
+        """
+        screen = self._screenRegion(region)
+        return None if screen is None else _capture.grab(screen)
+
+    def screenshot(self, filename=None, region=None):
+        """
+        Take a screenshot of the client area.
+
+        Args:
+            filename (str): The file path to save the screenshot. If not specified, it is not saved.
+            region (tuple): The region (left, top, width, height) of the client area to capture.
+
+        Returns:
+            Image: The captured screenshot, or None if the captured area is empty.
+        """
+        screen = self._screenRegion(region)
+        if screen is None:
+            return None
+        img = _capture.screenshot(screen)
+        if filename:
+            img.save(filename)
+        return img
+
+    def _windowPoint(self, point, screen):
+        """Return a point located in a capture of a screen region as a WindowPoint."""
+        x, y = screen[0] + point.x, screen[1] + point.y
+        return WindowPoint(Point(x - self.rect[0], y - self.rect[1]), Point(x, y))
+
+    def locateImage(self, needleImage, grayscale=False, region=None, threshold=0.990,
+                    scales=None, prefilter=None):
+        """
+        Search for an image in the client area.
+
+        Only the client area, or the region of it, is captured. The arguments
+        are the same as for locateImage().
+
+        Returns:
+            WindowPoint or None: The center of the located image in client area and
+            screen coordinates, or None if the image is not found.
+        """
+        screen = self._screenRegion(region)
+        if screen is None:
+            return None
+        point = locateImage(needleImage, _capture.grab(screen), grayscale=grayscale,
+                            threshold=threshold, scales=scales, prefilter=prefilter)
+        return None if point is None else self._windowPoint(point, screen)
+
+    def waitForImage(self, needleImage, timeout=10.0, interval=0.1, **kwargs):
+        """
+        Wait until an image appears in the client area.
+
+        Args:
+            needleImage (str): The file path of the image to locate.
+            timeout (float): The maximum time to wait in seconds. None waits forever.
+            interval (float): The delay between searches in seconds.
+            **kwargs: Additional arguments passed to Window.locateImage().
+
+        Returns:
+            WindowPoint or None: The center of the located image, or None if the timeout expired.
+        """
+        deadline = None if timeout is None else _clock.now() + timeout
+        while True:
+            point = self.locateImage(needleImage, **kwargs)
+            if point is not None:
+                return point
+            if deadline is not None and _clock.now() + interval > deadline:
+                return None
+            _clock.sleep(interval)
+
+    def locateImages(self, jobs, grayscale=False, threshold=0.990):
+        """
+        Search for several images in one capture of the client area.
+
+        Regions of the jobs are relative to the client area, see locateImages().
+
+        Returns:
+            generator of LocateResult: A (needle, region, point) tuple per job, where point is
+            a WindowPoint, or None if the image is not found.
+        """
+        screen = self._screenRegion(None)
+        if screen is None:
+            return
+        frame = _capture.grab(screen)
+        for result in locateImages(jobs, frame, grayscale=grayscale, threshold=threshold):
+            if result.point is not None:
+                result = result._replace(point=self._windowPoint(result.point, screen))
+            yield result
+
+
+# Latency Measurement
+
+# Statistics of measureLatency() in seconds, over the runs where a change was seen
+LatencyStats = namedtuple("LatencyStats", "runs missed mean p50 p90 p99 min max capture samples")
+
+
+def _latencyAction(action):
+    """Return a callable injecting an action: a callable, a key or hotkey string, or an (x, y) position."""
+    if callable(action):
+        return action
+    if isinstance(action, str):
+        return lambda: keyPress(action, key_delay=0)
+    x, y = action
+    return lambda: _sendInputs([_moveInput(x, y)])
+
+
+@_instrumented
+def measureLatency(action, region, runs=20, timeout=1.0, tolerance=8, min_pixels=1,
+                   reset=None, settle=0.2, poll=0.0):
+    """
+    Measure how long the screen takes to react to injected input.
+
+    Each run captures a baseline of the region, injects the action, then
+    captures the region again and again until enough pixels differ from the
+    baseline. The latency of a run is the time from the injection until the
+    capture showing the change returned, so it includes one capture, whose
+    mean duration is reported as the resolution of the measurement. Use the
+    high percentiles to choose the smallest safe `interval` or `key_delay`
+    for an application.
+
+    Parameters:
+    action : callable, str or tuple
+        What to inject: a function, a key or hotkey string pressed with keyPress(),
+        or an (x, y) screen position the cursor is moved to.
+    region : tuple
+        The screen region (top-left x, top-left y, width, height) expected to change.
+    runs : int, optional
+        The number of measurements (default is 20).
+    timeout : float, optional
+        How long to wait for a change in seconds before a run counts as missed (default is 1.0).
+    tolerance : int, optional
+        The difference per channel above which a pixel counts as changed (default is 8),
+        which ignores compression noise and dithering.
+    min_pixels : int, optional
+        How many pixels must change (default is 1).
+    reset : callable, optional
+        Called after each run to undo the action, such as closing an opened menu.
+    settle : float, optional
+        The delay in seconds after each run before the next baseline is captured (default is 0.2).
+    poll : float, optional
+        The delay in seconds between captures while waiting (default is 0, capture continuously).
+
+    Returns:
+    LatencyStats
+        (runs, missed, mean, p50, p90, p99, min, max, capture, samples), where the
+        statistics are over the runs that saw a change, capture is the mean capture
+        duration and samples the individual latencies. The statistics are None if
+        every run was missed.
+
+    Raises:
+    ValueError
+        If no monitor shows any part of the region.
+
+    Example:
+    stats = measureLatency('ctrl+f', region=(0, 0, 800, 100), reset=lambda: keyPress('esc'))
+    print(f"p99 {stats.p99 * 1000:.1f} ms")
+    stats = measureLatency(mouseClick, region=(400, 300, 200, 200))
+    """
+
+    # Watch only the part of the region monitors show
+    region = _screenBounds(region)
+    if region is None:
+        raise ValueError("No monitor shows the region")
+
+    inject = _latencyAction(action)
+    samples = []
+    captures = []
+    for _ in range(runs):
+        baseline = _capture.grab(region)
+        start = _clock.now()
+        inject()
+        deadline = start + timeout
+        while True:
+            grabbed = _clock.now()
+            frame = _capture.grab(region)
+            now = _clock.now()
+            captures.append(now - grabbed)
+            if numpy.count_nonzero(_changedMask(frame, baseline, tolerance)) >= min_pixels:
+                samples.append(now - start)
+                break
+            if now >= deadline:
+                break
+            if poll <= 0 and now == grabbed:
+                # The clock did not advance over the capture, as with a VirtualClock,
+                # so advance it by a tick to reach the deadline
+                _clock.sleep(POLL_TICK)
+            else:
+                _clock.sleep(poll)
+
+        if reset is not None:
+            reset()
+        _clock.sleep(settle)
+
+    capture = float(numpy.mean(captures)) if captures else None
+    if not samples:
+        return LatencyStats(runs, runs, None, None, None, None, None, None, capture, [])
+    p50, p90, p99 = (float(value) for value in numpy.percentile(samples, (50, 90, 99)))
+    return LatencyStats(runs, runs - len(samples), float(numpy.mean(samples)), p50, p90, p99,
+                        min(samples), max(samples), capture, samples)
+
+
+# Asyncio Functions
+
+# Executor running screen capture and image matching off the event loop
+_async_executor = None
+
+
+def _getAsyncExecutor():
+    """Return the shared executor used by the asyncio functions."""
+    global _async_executor
+    if _async_executor is None:
+        _async_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='directinput')
+    return _async_executor
+
+
+def setAsyncExecutor(executor):
+    """
+    Set the executor used by the asyncio functions for capture and matching.
+
+    Parameters:
+    executor : concurrent.futures.Executor or None
+        The executor to use. If None, a shared pool of 4 threads is used.
+
+    Example:
+    setAsyncExecutor(ThreadPoolExecutor(max_workers=8))
+    """
+
+    global _async_executor
+    _async_executor = executor
+
+
+async def _runInExecutor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_getAsyncExecutor(), partial(func, *args, **kwargs))
+
+
+async def _aplayHotkey(hotkey, key_delay):
+    """Asynchronously play a Hotkey like _playHotkey(), releasing the held keys if cancelled."""
+    for step, (presses, releases, chord_down, chord_up) in zip(hotkey.steps, hotkey.batches()):
+        for _ in range(step.count):
+            # Releases run in reverse order, so the held keys are the last `held` batches
+            held = 0
+            try:
+                if key_delay:
+                    for batch in presses:
+                        _sendInputs(batch)
+                        held += 1
+                        await _clock.asleep(key_delay)
+                    while held:
+                        _sendInputs(releases[len(releases) - held])
+                        held -= 1
+                        await _clock.asleep(key_delay)
+                else:
+                    _sendInputs(chord_down)
+                    held = len(releases)
+                    _sendInputs(chord_up)
+                    held = 0
+            finally:
+                # Release whatever is still held after a cancellation or error
+                for batch in releases[len(releases) - held:] if held else ():
+                    _sendInputs(batch)
+
+
+@_instrumented
+async def akeyPress(keys, interval=0, presses=1,
+                    key_delay=DEFAULT_INTERVAL, simultaneously=False):
+    """
+    Asynchronously simulate pressing one or more keys.
+
+    This is the asyncio counterpart of keyPress(). It awaits between events
+    instead of sleeping, and releases any pressed keys if the task is cancelled.
+
+    Parameters:
+    keys : str or list of str
+        The key or list of keys to press. Hotkey strings such as 'ctrl+c'
+        are pressed like ahotKey() presses them, see parseHotkey().
+    interval : float, optional
+        The interval between key presses in seconds (default is 0).
+    presses : int, optional
+        The number of times to press the keys (default is 1).
+    key_delay : float, optional
+        The delay between each key press and release in seconds (default is 0.01).
+    simultaneously : bool, optional
+        Whether to press all keys at once (default is False).
+
+    Example:
+    await akeyPress('a')
+    await akeyPress(['ctrl', 'shift'], simultaneously=True)
+    await akeyPress(['ctrl+a', 'ctrl+c'])
+    """
+
+    if not isinstance(keys, list):
+        keys = [keys]
+    keys = [_resolveKey(key) for key in keys]
+
+    if simultaneously:
+        # Hotkey strings add all of their keys to the combination
+        keys = [k for key in keys for k in (key.keys() if isinstance(key, Hotkey) else [key])]
+
+    for _ in range(presses):
+        if simultaneously:
+            keyDown(*keys)
+            try:
+                await _clock.asleep(key_delay)
+            finally:
+                keyUp(*keys)
+            await _clock.asleep(interval)
+        else:
+            for key in keys:
+                if isinstance(key, Hotkey):
+                    await _aplayHotkey(key, key_delay)
+                    await _clock.asleep(interval)
+                    continue
+                keyDown(key)
+                try:
+                    await _clock.asleep(key_delay)
+                finally:
+                    keyUp(key)
+                await _clock.asleep(interval)
+
+
+@_instrumented
+async def ahotKey(*keys, key_delay=DEFAULT_INTERVAL):
+    """
+    Asynchronously simulate pressing a combination of keys.
+
+    This is the asyncio counterpart of hotKey(). Keys are pressed in order and
+    released in reverse order. If the task is cancelled, the keys pressed so
+    far are released.
+
+    Parameters:
+    *keys : str
+        One or more keys to press as part of the hotkey combination. A single
+        hotkey string such as 'ctrl+shift+esc' or 'ctrl+k, ctrl+c' is accepted
+        too, see parseHotkey().
+    key_delay : float, optional
+        The delay between each key press and release in seconds (default is 0.01).
+
+    Example:
+    await ahotKey('ctrl', 'shift', 'esc')
+    await ahotKey('ctrl+c')
+    """
+
+    # Resolved like hotKey(), so both accept the same keys and strings
+    hotkey = _resolveKey(keys[0]) if len(keys) == 1 else None
+    if not isinstance(hotkey, Hotkey):
+        hotkey = _compileKeys(keys)
+
+    await _aplayHotkey(hotkey, key_delay)
+
+
+@_instrumented
+async def awrite(text, interval=0.0, key_delay=0.03):
+    """
+    Asynchronously type out a given text string.
+
+    This is the asyncio counterpart of write(). Characters that cannot be typed
+    with a single key of the active keyboard layout are pasted from the clipboard.
+
+    Parameters:
+    text : str
+        The text string to type out.
+    interval : float, optional
+        The interval (in seconds) between each character (default is 0.0).
+    key_delay : float, optional
+        The delay between key press and release for each character (default is 0.03 seconds).
+
+    Example:
+    await awrite("Hello, World!", interval=0.1)
+    """
+
+    layout = _backend.getKeyboardLayout()
+    for c in text:
+        entry = _layoutEntry(c, layout)
+        if entry is None:
+            pyperclip.copy(c)
+            await ahotKey('ctrl', 'v', key_delay=key_delay)
+        else:
+            _sendInputs(entry[1])
+            try:
+                await _clock.asleep(key_delay)
+            finally:
+                _sendInputs(entry[2])
+
+        await _clock.asleep(interval)
+
+
+@_instrumented
+async def amouseClick(button='left', interval=0, presses=1,
+                      key_delay=DEFAULT_INTERVAL):
+    """
+    Asynchronously simulate mouse click events.
+
+    This is the asyncio counterpart of mouseClick(). If the task is cancelled
+    while the button is down, it is released.
+
+    Parameters:
+    button : str, optional
+        The mouse button to click ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+    interval : float, optional
         The interval (in seconds) between each clicks.
     presses : int, optional
         The number of times to click the mouse button. Default is 1.
@@ -947,468 +5090,997 @@ def mouseClick(button='left', interval=0, presses=1,
         The delay (in seconds) between each click down and click release.
 
     Example:
-    mouseClick('left')                            # Click the left mouse button once.
-    mouseClick('right', presses=2, interval=0.5)  # Double-click the right mouse button with a 0.5-second interval.
-    mouseClick('middle', presses=3)               # Triple-click the middle mouse button.
-    mouseClick('xbutton1')                        # Click the first extra mouse button (xbutton1).
-    mouseClick('xbutton2')                        # Click the second extra mouse button (xbutton2).
+    await amouseClick('left')
+    await amouseClick('right', presses=2, interval=0.5)
     """
 
-    button = button.lower()
+    for _ in range(presses):
+        mouseDown(button)
+        try:
+            await _clock.asleep(key_delay)
+        finally:
+            mouseUp(button)
+        await _clock.asleep(interval)
 
-    # Use different approach for xbuttons vs regular buttons
-    if button in ['xbutton1', 'xbutton2']:
-        # Get the xbutton data value
-        mouse_data = XBUTTON_DATA.get(button, 0)
 
-        for _ in range(presses):
-            # Press the xbutton
-            ctypes.windll.user32.mouse_event(MOUSEEVENTF_XDOWN, 0, 0, mouse_data, 0)
-            sleep(key_delay)
+@_instrumented
+async def amoveMouseTo(x=None, y=None, duration=0.0):
+    """
+    Asynchronously move the mouse cursor to a specified position.
 
-            # Release the xbutton
-            ctypes.windll.user32.mouse_event(MOUSEEVENTF_XUP, 0, 0, mouse_data, 0)
-            sleep(interval)
-    else:
-        # Regular buttons use SendInput
-        button_code = MB_CODE.get(button)
+    This is the asyncio counterpart of moveMouseTo().
 
-        for _ in range(presses):
-            # Send mouse button press event
-            extra = ctypes.c_ulong(0)
-            ii_ = Input_I()
-            ii_.mi = MouseInput(0, 0, 0, button_code, 0, ctypes.pointer(extra))
-            x = Input(ctypes.c_ulong(0), ii_)
-            ctypes.windll.user32.SendInput(
-                1, ctypes.pointer(x), ctypes.sizeof(x)
-            )
-
-            sleep(key_delay)
-
-            # Send mouse button release event
-            extra = ctypes.c_ulong(0)
-            ii_ = Input_I()
-            ii_.mi = MouseInput(
-                0, 0, 0, button_code << 1, 0, ctypes.pointer(extra)
-            )
-            x = Input(ctypes.c_ulong(0), ii_)
-            ctypes.windll.user32.SendInput(
-                1, ctypes.pointer(x), ctypes.sizeof(x)
-            )
-
-            sleep(interval)
+    Parameters:
+    x : int, optional
+        The target x-coordinate for the mouse cursor. If not specified, the current x-coordinate is used.
+    y : int, optional
+        The target y-coordinate for the mouse cursor. If not specified, the current y-coordinate is used.
+    duration : float, optional
+        The duration over which the mouse cursor should move to the target position,
+        in seconds. Default is 0.0, which moves the cursor instantly.
 
+    Example:
+    await amoveMouseTo(300, 400, 1.0)
+    """
 
-def mouseDown(button='left'):
+    current_x, current_y = getMousePosition()
+    x = current_x if x is None else int(x)
+    y = current_y if y is None else int(y)
+
+    steps = int(duration * 50)
+    if steps == 0:
+        _setCursorPos(x, y)
+        return
+
+    step_x = (x - current_x) / steps
+    step_y = (y - current_y) / steps
+
+    for i in range(steps):
+        await _clock.asleep(duration / steps)
+        current_x += step_x
+        current_y += step_y
+        _setCursorPos(int(current_x), int(current_y))
+
+
+@_instrumented
+async def amoveMouse(xOffset=0, yOffset=0, duration=0.0):
     """
-    Simulate pressing down a mouse button.
+    Asynchronously move the mouse cursor relative to its current position.
 
-    This function simulates pressing down a specified mouse button.
-    The button parameter determines which mouse button to press.
+    This is the asyncio counterpart of moveMouse().
 
     Parameters:
-    button : str, optional
-        The mouse button to press ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+    xOffset : int or float, optional
+        The offset in the x direction to move the mouse cursor. Default is 0.
+    yOffset : int or float, optional
+        The offset in the y direction to move the mouse cursor. Default is 0.
+    duration : float, optional
+        The duration over which the mouse cursor should move, in seconds. Default is 0.0.
 
     Example:
-    mouseDown('left')     # Press down the left mouse button.
-    mouseDown('right')    # Press down the right mouse button.
-    mouseDown('middle')   # Press down the middle mouse button.
-    mouseDown('xbutton1') # Press down the first extra mouse button.
-    mouseDown('xbutton2') # Press down the second extra mouse button.
+    await amoveMouse(-50, 0, 1.0)
     """
 
-    button = button.lower()
+    current_x, current_y = getMousePosition()
+    await amoveMouseTo(current_x + xOffset, current_y + yOffset, duration)
 
-    # Use different approach for xbuttons vs regular buttons
-    if button in ['xbutton1', 'xbutton2']:
-        # Get the xbutton data value
-        mouse_data = XBUTTON_DATA.get(button, 0)
 
-        # Press the xbutton
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_XDOWN, 0, 0, mouse_data, 0)
-    else:
-        # Regular buttons use SendInput
-        button_code = MB_CODE.get(button)
+@_instrumented
+async def ascreenshot(filename=None, region=None):
+    """
+    Asynchronously take a screenshot, running the capture in the executor.
 
-        # Send mouse button press event
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.mi = MouseInput(0, 0, 0, button_code, 0, ctypes.pointer(extra))
-        x = Input(ctypes.c_ulong(0), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
+    See screenshot() for the parameters.
 
+    Example:
+    image = await ascreenshot(region=(0, 0, 800, 600))
+    """
 
-def mouseUp(button='left'):
+    return await _runInExecutor(screenshot, filename, region)
+
+
+@_instrumented
+async def alocateImage(needleImage, haystackImage=None, grayscale=False,
+                       region=None, threshold=0.990, scales=None, prefilter=None):
     """
-    Simulate releasing a mouse button.
+    Asynchronously search for an image, running the capture and match in the executor.
 
-    This function simulates releasing a specified mouse button.
-    The button parameter determines which mouse button to release.
+    See locateImage() for the parameters.
+
+    Example:
+    position = await alocateImage('needle.png', grayscale=True)
+    """
+
+    return await _runInExecutor(locateImage, needleImage, haystackImage,
+                                grayscale, region, threshold, scales, prefilter)
+
+
+@_instrumented
+async def awaitForImage(needleImage, timeout=10.0, interval=0.1, **kwargs):
+    """
+    Asynchronously wait until an image appears on the screen.
+
+    This is the asyncio counterpart of waitForImage(). Each search runs in the
+    executor, and the event loop is free between searches, so many waits can
+    run concurrently on a handful of threads.
 
     Parameters:
-    button : str, optional
-        The mouse button to release ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+    needleImage : str
+        The file path of the image to locate.
+    timeout : float, optional
+        The maximum time to wait in seconds (default is 10.0). None waits forever.
+    interval : float, optional
+        The delay between searches in seconds (default is 0.1).
+    **kwargs
+        Additional arguments passed to locateImage().
+
+    Returns:
+    Point or None
+        The center coordinates of the located image as (x, y), or None if the timeout expired.
 
     Example:
-    mouseUp('left')     # Release the left mouse button.
-    mouseUp('right')    # Release the right mouse button.
-    mouseUp('middle')   # Release the middle mouse button.
-    mouseUp('xbutton1') # Release the first extra mouse button.
-    mouseUp('xbutton2') # Release the second extra mouse button.
+    position = await awaitForImage('button.png', timeout=5.0)
     """
 
-    button = button.lower()
+    deadline = None if timeout is None else _clock.now() + timeout
+    while True:
+        point = await _runInExecutor(locateImage, needleImage, **kwargs)
+        if point is not None:
+            return point
+        if deadline is not None and _clock.now() + interval > deadline:
+            return None
+        await _clock.asleep(interval)
+
+
+# Macro Functions
+
+# Binary macro file layout: a fixed header followed by fixed-size records.
+# Each record maps onto one INPUT structure plus its time offset in
+# microseconds from the start of the macro.
+MACRO_MAGIC = b'WDIM'
+MACRO_VERSION = 1
+MACRO_HEADER = struct.Struct('<4sHHQ')
+MACRO_RECORD = struct.Struct('<QHHIiii4x')
+MACRO_DTYPE = numpy.dtype([
+    ('time', '<u8'),
+    ('type', '<u2'),
+    ('code', '<u2'),
+    ('flags', '<u4'),
+    ('dx', '<i4'),
+    ('dy', '<i4'),
+    ('data', '<i4'),
+    ('reserved', 'V4')
+])
+
+MacroEvent = namedtuple("MacroEvent", "time type code flags dx dy data")
+
+# numpy views over an array of Input structures, used to fill the keyboard
+# and mouse members of the union without building Python objects per event
+def _inputView(member, names):
+    """Build a numpy dtype viewing selected fields of an Input array."""
+    fields = [('type', Input.type.offset, ctypes.c_ulong)]
+    for name in names:
+        field = getattr(member, name)
+        ctype = dict(member._fields_)[name]
+        fields.append((name, Input.ii.offset + field.offset, ctype))
+    return numpy.dtype({
+        'names': [name for name, _, _ in fields],
+        'formats': [numpy.dtype(ctype) for _, _, ctype in fields],
+        'offsets': [offset for _, offset, _ in fields],
+        'itemsize': ctypes.sizeof(Input)
+    })
+
+
+_KEYBD_VIEW = _inputView(KeyBdInput, ['wVk', 'wScan', 'dwFlags'])
+_MOUSE_VIEW = _inputView(MouseInput, ['dx', 'dy', 'mouseData', 'dwFlags'])
+
+
+def _macroRecords(events):
+    """Convert a sequence of MacroEvent tuples into a record array."""
+    events = list(events)
+    records = numpy.zeros(len(events), dtype=MACRO_DTYPE)
+    for i, event in enumerate(events):
+        records[i] = (int(round(event.time * 1000000)), event.type, event.code,
+                      event.flags, event.dx, event.dy, event.data, b'')
+    return records
+
+
+def _macroInputs(records):
+    """Build an Input array from macro records using vectorized assignment."""
+    inputs = (Input * len(records))()
+    if not len(records):
+        return inputs
+
+    is_key = records['type'] == INPUT_KEYBOARD
+    is_mouse = ~is_key
+
+    keybd = numpy.frombuffer(inputs, dtype=_KEYBD_VIEW)
+    keybd['type'][is_key] = INPUT_KEYBOARD
+    keybd['dwFlags'][is_key] = records['flags'][is_key]
+    # Codes are scan codes or characters with KEYEVENTF_SCANCODE or KEYEVENTF_UNICODE
+    # and virtual keys otherwise
+    is_scan = is_key & (records['flags'] & (KEYEVENTF_SCANCODE | KEYEVENTF_UNICODE) != 0)
+    is_vk = is_key & ~is_scan
+    keybd['wScan'][is_scan] = records['code'][is_scan]
+    keybd['wVk'][is_vk] = records['code'][is_vk]
+
+    mouse = numpy.frombuffer(inputs, dtype=_MOUSE_VIEW)
+    mouse['type'][is_mouse] = INPUT_MOUSE
+    mouse['dx'][is_mouse] = records['dx'][is_mouse]
+    mouse['dy'][is_mouse] = records['dy'][is_mouse]
+    mouse['mouseData'][is_mouse] = records['data'][is_mouse]
+    mouse['dwFlags'][is_mouse] = records['flags'][is_mouse]
+
+    return inputs
+
+
+class Macro:
+    """
+    A compiled macro file mapped into memory.
 
-    # Use different approach for xbuttons vs regular buttons
-    if button in ['xbutton1', 'xbutton2']:
-        # Get the xbutton data value
-        mouse_data = XBUTTON_DATA.get(button, 0)
+    The records are exposed as a numpy record array backed directly by the
+    memory map, so opening a macro costs the same regardless of its length and
+    replay only touches the pages currently being injected.
 
-        # Release the xbutton
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_XUP, 0, 0, mouse_data, 0)
-    else:
-        # Regular buttons use SendInput
-        button_code = MB_CODE.get(button)
+    Attributes:
+        filename (str): Path of the macro file.
+        records (ndarray): Read-only record array with the MACRO_DTYPE layout.
+    """
 
-        # Send mouse button release event
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.mi = MouseInput(0, 0, 0, button_code << 1, 0, ctypes.pointer(extra))
-        x = Input(ctypes.c_ulong(0), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
+    def __init__(self, filename):
+        """
+        Open and map a macro file.
+
+        Args:
+            filename (str): Path of a file written by saveMacro() or MacroWriter.
+        """
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        try:
+            if len(self._mmap) < MACRO_HEADER.size:
+                raise ValueError(f"{filename} is not a directinput macro file")
+            magic, version, record_size, count = MACRO_HEADER.unpack_from(self._mmap, 0)
+            if magic != MACRO_MAGIC or record_size != MACRO_RECORD.size:
+                raise ValueError(f"{filename} is not a directinput macro file")
+            if version > MACRO_VERSION:
+                raise ValueError(f"Unsupported macro version {version} in {filename}")
+
+            # A writer that did not finish leaves the count unset; trust the size
+            available = (len(self._mmap) - MACRO_HEADER.size) // MACRO_RECORD.size
+            if count == 0 or count > available:
+                count = available
+
+            self.records = numpy.frombuffer(self._mmap, dtype=MACRO_DTYPE,
+                                            count=count, offset=MACRO_HEADER.size)
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        for record in self.records:
+            yield MacroEvent(int(record['time']) / 1000000, int(record['type']),
+                             int(record['code']), int(record['flags']),
+                             int(record['dx']), int(record['dy']), int(record['data']))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def duration(self):
+        """Time offset of the last event in seconds."""
+        return int(self.records['time'][-1]) / 1000000 if len(self.records) else 0.0
+
+    def close(self):
+        """Release the memory map and the underlying file."""
+        # The record view holds an export of the map and must go first
+        self.records = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+class MacroWriter:
+    """
+    Stream macro events to a binary macro file with constant memory.
+
+    Events are buffered in a fixed-size chunk and flushed to disk whenever the
+    chunk fills up. The event count in the header is written on close().
+
+    Attributes:
+        filename (str): Path of the macro file being written.
+        count (int): Number of events written so far.
+    """
+
+    def __init__(self, filename, chunk_size=4096):
+        """
+        Create or truncate a macro file.
 
+        Args:
+            filename (str): Path of the macro file to write.
+            chunk_size (int): Number of events buffered before each flush.
+        """
+        self.filename = filename
+        self.count = 0
+        self._file = open(filename, 'wb')
+        self._file.write(MACRO_HEADER.pack(MACRO_MAGIC, MACRO_VERSION, MACRO_RECORD.size, 0))
+        self._chunk = bytearray(chunk_size * MACRO_RECORD.size)
+        self._chunk_size = chunk_size
+        self._pending = 0
+
+    def write(self, event):
+        """
+        Append a single MacroEvent.
 
-@contextmanager
-def mouseHold(button='left'):
+        Args:
+            event (MacroEvent): The event to append. Times must not decrease.
+        """
+        MACRO_RECORD.pack_into(self._chunk, self._pending * MACRO_RECORD.size,
+                               int(round(event.time * 1000000)), event.type, event.code,
+                               event.flags, event.dx, event.dy, event.data)
+        self._pending += 1
+        self.count += 1
+        if self._pending == self._chunk_size:
+            self.flush()
+
+    def writeRecords(self, records):
+        """
+        Append a record array with the MACRO_DTYPE layout.
+
+        Args:
+            records (ndarray): Records to append.
+        """
+        self.flush()
+        self._file.write(numpy.ascontiguousarray(records, dtype=MACRO_DTYPE).tobytes())
+        self.count += len(records)
+
+    def flush(self):
+        """Write buffered events to disk."""
+        if self._pending:
+            self._file.write(memoryview(self._chunk)[:self._pending * MACRO_RECORD.size])
+            self._pending = 0
+        self._file.flush()
+
+    def close(self):
+        """Flush remaining events, record the event count and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.seek(0)
+        self._file.write(MACRO_HEADER.pack(MACRO_MAGIC, MACRO_VERSION, MACRO_RECORD.size, self.count))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def saveMacro(filename, events):
     """
-    Simulate holding down a specified mouse button.
+    Save macro events to a compact binary macro file.
 
-    This function simulates pressing and holding down a specified mouse button.
-    The button parameter can be 'left', 'right', 'middle', 'xbutton1', or 'xbutton2'.
-    This function should be used with a `with` statement to ensure that
-    the mouse button is released after the block of code is executed.
+    Each event is stored as a fixed-size 32 byte record holding the input
+    type, scancode or mouse flags, dx/dy, mouse data and the time offset
+    from the start of the macro.
 
     Parameters:
-    button : str, optional
-        The mouse button to hold down ('left', 'right', 'middle', 'xbutton1', or 'xbutton2'). Default is 'left'.
+    filename : str
+        The file path to write the macro to.
+    events : iterable of MacroEvent or Macro
+        The events to save, ordered by time.
 
     Example:
-    with mouseHold('left'):
-        directinput.keyPress("esc")
-    with mouseHold('xbutton1'):
-        directinput.keyPress("a")
+    saveMacro('macro.wdim', [MacroEvent(0.0, INPUT_KEYBOARD, 0x1E, KEYEVENTF_SCANCODE, 0, 0, 0),
+                             MacroEvent(0.05, INPUT_KEYBOARD, 0x1E, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP, 0, 0, 0)])
     """
 
-    button = button.lower()
+    with MacroWriter(filename) as writer:
+        if isinstance(events, Macro):
+            writer.writeRecords(events.records)
+        else:
+            for event in events:
+                writer.write(event)
 
-    # Use different approach for xbuttons vs regular buttons
-    if button in ['xbutton1', 'xbutton2']:
-        # Get the xbutton data value
-        mouse_data = XBUTTON_DATA.get(button, 0)
 
-        # Press the xbutton
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_XDOWN, 0, 0, mouse_data, 0)
+def loadMacro(filename):
+    """
+    Open a binary macro file without reading it into memory.
 
-        # Yield control to the calling function
-        yield
+    The file is memory-mapped, so even macros with millions of events load
+    instantly. Use the returned Macro in a `with` statement, or call close()
+    when done.
 
-        # Release the xbutton
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_XUP, 0, 0, mouse_data, 0)
-    else:
-        # Regular buttons use SendInput
-        button_code = MB_CODE.get(button)
+    Parameters:
+    filename : str
+        The file path of the macro to open.
 
-        # Send mouse button press event
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.mi = MouseInput(0, 0, 0, button_code, 0, ctypes.pointer(extra))
-        x = Input(ctypes.c_ulong(0), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
+    Returns:
+    Macro
+        The memory-mapped macro.
 
-        # Yield control to the calling function
-        yield
+    Example:
+    with loadMacro('macro.wdim') as macro:
+        playMacro(macro)
+    """
 
-        # Send mouse button release event
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        ii_.mi = MouseInput(0, 0, 0, button_code << 1, 0, ctypes.pointer(extra))
-        x = Input(ctypes.c_ulong(0), ii_)
-        ctypes.windll.user32.SendInput(
-            1, ctypes.pointer(x), ctypes.sizeof(x)
-        )
+    return Macro(filename)
 
 
-def moveMouseTo(x=None, y=None, duration=0.0):
+@_instrumented
+def playMacro(macro, speed=1.0, chunk_size=4096):
     """
-    Move the mouse cursor to a specified position over a given duration.
+    Replay a macro.
 
-    This function moves the mouse cursor to a specified (x, y) position on the screen
-    over a specified duration. If either x or y is not provided,
-    the current mouse position for that axis will be used.
+    Events that share a time offset are injected together with a single
+    SendInput call. Records are converted to Input structures one chunk at a
+    time, so memory use stays constant regardless of the macro length.
 
     Parameters:
-    x : int, optional
-        The target x-coordinate for the mouse cursor. If not specified, the current x-coordinate is used.
-    y : int, optional
-        The target y-coordinate for the mouse cursor. If not specified, the current y-coordinate is used.
-    duration : float, optional
-        The duration over which the mouse cursor should move to the target position,
-        in seconds. Default is 0.0, which moves the cursor instantly.
+    macro : Macro, str or iterable of MacroEvent
+        The macro to replay, a macro file path, or a sequence of events.
+    speed : float, optional
+        Playback speed multiplier (default is 1.0). A value of 2.0 replays twice as fast.
+    chunk_size : int, optional
+        The number of records converted per chunk (default is 4096).
 
     Example:
-    moveMouseTo(100, 200)             # Instantly move the cursor to (100, 200).
-    moveMouseTo(300, 400, 1.0)        # Move the cursor to (300, 400) over 1 second.
-    moveMouseTo(y=500, duration=0.5)  # Move the cursor vertically to y=500 over 0.5 seconds.
+    playMacro('macro.wdim')             # Replay a macro file in real time.
+    playMacro('macro.wdim', speed=2.0)  # Replay a macro file twice as fast.
     """
 
-    # Get the current mouse position
-    current_x, current_y = getMousePosition()
+    if isinstance(macro, str):
+        with Macro(macro) as opened:
+            playMacro(opened, speed, chunk_size)
+        return
 
-    if x is None:
-        x = current_x
-    else:
-        x = int(x)
+    records = macro.records if isinstance(macro, Macro) else _macroRecords(macro)
+    start = _clock.now()
+    input_size = ctypes.sizeof(Input)
 
-    if y is None:
-        y = current_y
-    else:
-        y = int(y)
+    for chunk_start in range(0, len(records), chunk_size):
+        chunk = records[chunk_start:chunk_start + chunk_size]
+        inputs = _macroInputs(chunk)
 
-    # Calculate the distance to move the cursor in the x and y direction
-    distance_x = x - current_x
-    distance_y = y - current_y
+        # Split the chunk into batches of events sharing the same time offset
+        times = chunk['time']
+        bounds = [0, *(numpy.flatnonzero(numpy.diff(times)) + 1).tolist(), len(chunk)]
 
-    # Calculate the number of steps needed to move the cursor
-    # based on the duration and the distance to travel
-    steps = int(duration * 50)
-    if steps == 0:
-        ctypes.windll.user32.SetCursorPos(x, y)
-        return
+        for begin, end in zip(bounds, bounds[1:]):
+            delay = start + int(times[begin]) / 1000000 / speed - _clock.now()
+            if delay > 0:
+                _clock.sleep(delay)
+            _sendInputs((Input * (end - begin)).from_buffer(inputs, begin * input_size))
 
-    step_x = distance_x / steps
-    step_y = distance_y / steps
 
-    # Move the cursor in a linear way over the specified duration
-    for i in range(steps):
-        sleep(duration / steps)
-        current_x += step_x
-        current_y += step_y
-        ctypes.windll.user32.SetCursorPos(int(current_x), int(current_y))
+def exportMacroJSON(macro, filename):
+    """
+    Export a macro to an editable JSON file.
 
+    Parameters:
+    macro : Macro, str or iterable of MacroEvent
+        The macro to export, a macro file path, or a sequence of events.
+    filename : str
+        The JSON file path to write.
 
-def moveMouse(xOffset=0, yOffset=0, duration=0.0):
+    Example:
+    exportMacroJSON('macro.wdim', 'macro.json')
     """
-    Move the mouse cursor relative to its current position by specified offsets.
 
-    This function moves the mouse cursor from its current position
-    by a specified x and y offset over a given duration.
+    if isinstance(macro, str):
+        with Macro(macro) as opened:
+            exportMacroJSON(opened, filename)
+        return
+
+    with open(filename, 'w') as f:
+        f.write('{"version": %d, "events": [' % MACRO_VERSION)
+        for i, event in enumerate(macro):
+            f.write(',\n' if i else '\n')
+            json.dump(event._asdict(), f)
+        f.write('\n]}\n')
+
+
+def importMacroJSON(filename, macroFile=None):
+    """
+    Import macro events from a JSON file written by exportMacroJSON().
 
     Parameters:
-    xOffset : int or float, optional
-        The offset in the x direction to move the mouse cursor. Default is 0.
-    yOffset : int or float, optional
-        The offset in the y direction to move the mouse cursor. Default is 0.
-    duration : float, optional
-        The duration over which the mouse cursor should move to the new position,
-        in seconds. Default is 0.0, which moves the cursor instantly.
+    filename : str
+        The JSON file path to read.
+    macroFile : str, optional
+        If specified, the events are also compiled into this binary macro file.
+
+    Returns:
+    list of MacroEvent
+        The imported events, sorted by time.
 
     Example:
-    moveMouse(100, 50)                    # Instantly move the cursor 100 pixels right and 50 pixels down.
-    moveMouse(-50, 0, 1.0)                # Move the cursor 50 pixels left over 1 second.
-    moveMouse(yOffset=100, duration=0.5)  # Move the cursor 100 pixels down over 0.5 seconds.
+    events = importMacroJSON('macro.json')
+    importMacroJSON('macro.json', 'macro.wdim')  # Compile the edited macro back to binary.
     """
 
-    current_x, current_y = getMousePosition()
-    x = current_x + xOffset
-    y = current_y + yOffset
+    with open(filename) as f:
+        data = json.load(f)
+
+    events = sorted(
+        (MacroEvent(float(e['time']), int(e['type']), int(e.get('code', 0)),
+                    int(e.get('flags', 0)), int(e.get('dx', 0)), int(e.get('dy', 0)),
+                    int(e.get('data', 0)))
+         for e in data['events']),
+        key=lambda e: e.time
+    )
+
+    if macroFile:
+        saveMacro(macroFile, events)
+
+    return events
+
+
+# Recorder
+
+# Low-level hook constants for SetWindowsHookEx()
+WH_KEYBOARD_LL = 13
+WH_MOUSE_LL = 14
+WM_QUIT = 0x0012
+WM_KEYDOWN = 0x0100
+WM_KEYUP = 0x0101
+WM_SYSKEYDOWN = 0x0104
+WM_SYSKEYUP = 0x0105
+WM_MOUSEMOVE = 0x0200
+WM_MOUSEWHEEL = 0x020A
+LLKHF_EXTENDED = 0x01
+LLKHF_INJECTED = 0x10
+LLMHF_INJECTED = 0x01
+
+# Map low-level mouse messages to (button, released)
+MOUSE_MESSAGES = {
+    0x0201: ('left', False),
+    0x0202: ('left', True),
+    0x0204: ('right', False),
+    0x0205: ('right', True),
+    0x0207: ('middle', False),
+    0x0208: ('middle', True),
+    0x020B: ('xbutton', False),
+    0x020C: ('xbutton', True)
+}
 
-    distance_x = x - current_x
-    distance_y = y - current_y
-    steps = int(duration * 50)
-    if steps == 0:
-        ctypes.windll.user32.SetCursorPos(x, y)
-        return
 
-    step_x = distance_x / steps
-    step_y = distance_y / steps
+class KbdLLHookStruct(ctypes.Structure):
+    _fields_ = [("vkCode", wintypes.DWORD),
+                ("scanCode", wintypes.DWORD),
+                ("flags", wintypes.DWORD),
+                ("time", wintypes.DWORD),
+                ("dwExtraInfo", ctypes.c_void_p)]
 
-    for i in range(steps):
-        sleep(duration / steps)
-        current_x += step_x
-        current_y += step_y
-        ctypes.windll.user32.SetCursorPos(int(current_x), int(current_y))
 
+class MsLLHookStruct(ctypes.Structure):
+    _fields_ = [("pt", wintypes.POINT),
+                ("mouseData", wintypes.DWORD),
+                ("flags", wintypes.DWORD),
+                ("time", wintypes.DWORD),
+                ("dwExtraInfo", ctypes.c_void_p)]
 
-def scrollMouse(clicks):
-    """
-    Scroll the mouse wheel vertically.
 
-    This function simulates scrolling the mouse wheel vertically.
-    The `clicks` parameter determines the amount and direction of the scroll.
-    Positive values scroll up, while negative values scroll down.
-    For a visible result, it is recommended to use a value of 100 or more,
-    as smaller numbers may not produce a significant scrolling effect.
+def _simplifyIndices(points, tolerance):
+    """Return the indices kept by Ramer-Douglas-Peucker simplification."""
+    points = numpy.asarray(points, dtype=float)
+    if len(points) < 3 or tolerance <= 0:
+        return list(range(len(points)))
 
-    Parameters:
-    clicks : int
-        The number of clicks to scroll. Positive values scroll up, negative values scroll down.
+    keep = numpy.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
 
-    Example:
-    scrollMouse(120)   # Scroll up with a value of 120 clicks.
-    scrollMouse(-100)  # Scroll down with a value of 100 clicks.
-    """
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
 
-    if clicks != 0:
-        ctypes.windll.user32.mouse_event(0x0800, 0, 0, clicks, 0)
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last] - start
+        length = numpy.hypot(*segment)
+        if length == 0:
+            distances = numpy.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = numpy.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
 
+        index = int(numpy.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
 
-# Utility Functions
+    return numpy.flatnonzero(keep).tolist()
 
-def screenshot(filename=None, region=None):
+
+def simplifyPath(points, tolerance=1.0):
     """
-    Take a screenshot of the entire screen or a specified region.
+    Simplify a mouse path without visibly changing its trajectory.
 
-    This function captures a screenshot of the entire screen or a specified region.
-    If a region is specified, it captures the region defined
-    by the tuple (top-left x, top-left y, width, height).
-    The screenshot can be saved to a file if a filename is provided.
+    This function applies the Ramer-Douglas-Peucker algorithm, dropping
+    points that lie within `tolerance` pixels of the simplified path.
 
     Parameters:
-    filename : str, optional
-        The file path to save the screenshot. If not specified,
-        the screenshot is not saved. You can put any file type such as .png, .jpg or .pdf.
-    region : tuple, optional
-        A tuple specifying the region to capture (top-left x, top-left y, width, height).
-        If not specified, captures the entire screen.
+    points : list of (x, y)
+        The points of the path, in order.
+    tolerance : float, optional
+        The maximum distance in pixels a dropped point may lie from the
+        simplified path (default is 1.0).
 
     Returns:
-    Image
-        The captured screenshot as an Image object.
+    list of Point
+        The points kept, including the first and last points.
 
     Example:
-    screenshot('screenshot.png')                           # Capture the entire screen and save as 'screenshot.png'.
-    screenshot(region=(0, 0, 800, 600))                    # Capture a region of the screen.
-    screenshot('region.png', region=(100, 100, 300, 200))  # Capture a region and save as 'region.png'.
+    simplifyPath([(0, 0), (1, 1), (2, 2), (3, 5)])   # [Point(0, 0), Point(3, 5)]
+    simplifyPath(path, tolerance=0.5)                 # Keep points further than half a pixel from the line.
     """
 
-    if region:
-        img = pyscreeze.screenshot(region=region)
-    else:
-        img = pyscreeze.screenshot()
+    return [Point(*points[i]) for i in _simplifyIndices(points, tolerance)]
 
-    if filename:
-        img.save(filename)
 
-    return img
+class InputRecorder:
+    """
+    Record real keyboard and mouse input into a replayable macro.
 
+    Transitions are captured with low-level Windows hooks and timestamped with
+    the active clock, a high-resolution counter by default. Events are streamed
+    to a macro file through a MacroWriter, so memory use is bounded no matter
+    how long the recording runs. Runs of mouse moves can be simplified before
+    they are written.
 
-def getMousePosition():
+    With `hooks=False`, no hooks are installed and events are supplied by
+    calling keyEvent(), mouseMoveEvent(), mouseButtonEvent() and wheelEvent()
+    directly, which makes the recorder usable as a synthetic event source.
+
+    Attributes:
+        filename (str): Path of the macro file being written.
+        simplify (float): Tolerance in pixels for mouse path simplification, 0 to disable.
+        record_moves (bool): Whether mouse moves are recorded.
+        include_injected (bool): Whether injected input, such as a replay, is recorded.
+        exclude_keys (set): Scancodes whose transitions are not recorded.
     """
-    Get the current position of the mouse cursor.
 
-    This function returns the current position of the mouse cursor (x, y).
+    def __init__(self, filename=None, hooks=True, record_moves=True, simplify=0.0,
+                 include_injected=False, buffer_size=4096, exclude_keys=None):
+        """
+        Initialize the recorder.
 
-    Returns:
-    Point
-        The current mouse cursor position as (x, y).
+        Args:
+            filename (str): Macro file to write. If None, a temporary file is used.
+            hooks (bool): Whether to install low-level keyboard and mouse hooks.
+            record_moves (bool): Whether mouse moves are recorded.
+            simplify (float): Tolerance in pixels for mouse path simplification, 0 to disable.
+            include_injected (bool): Whether injected input is recorded.
+            buffer_size (int): Number of events buffered in memory before flushing.
+            exclude_keys (list): Key names or scancodes whose transitions are not recorded.
+        """
+        if filename is None:
+            fd, filename = tempfile.mkstemp(suffix='.wdim')
+            os.close(fd)
+
+        self.filename = filename
+        self.hooks = hooks
+        self.record_moves = record_moves
+        self.simplify = simplify
+        self.include_injected = include_injected
+        self.buffer_size = buffer_size
+        self.exclude_keys = {
+            _KEY_SCANCODES[keyId(key)] if isinstance(key, str) else key
+            for key in (exclude_keys or [])
+        }
+        self._writer = None
+        self._start = None
+        self._moves = []
+        self._down = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_id = None
 
-    Example:
-    position = getMousePosition()
-    print(position.x, position.y)  # Output the current cursor position.
-    """
+    def __enter__(self):
+        self.start()
+        return self
 
-    cursor = wintypes.POINT()
-    windll.user32.GetCursorPos(byref(cursor))
-    return Point(cursor.x, cursor.y)
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._writer is not None:
+            self.stop().close()
 
+    @property
+    def recording(self):
+        """Whether the recorder is currently recording."""
+        return self._writer is not None
 
-def getDisplaySize():
-    """
-    Get the size of the primary display.
+    def start(self):
+        """
+        Start recording.
 
-    This function returns the width and height of the primary display (width, height).
+        Raises:
+            OSError: If the low-level hooks cannot be installed, including on
+                platforms other than Windows.
+        """
+        if self.hooks and sys.platform != 'win32':
+            raise OSError('Low-level input hooks require Windows')
+
+        # Cache the virtual desktop bounds used to normalize mouse positions
+        self._desktop = getVirtualScreen()
+        self._writer = MacroWriter(self.filename, self.buffer_size)
+        self._moves = []
+        self._down = set()
+        self._start = _clock.now()
+
+        if self.hooks:
+            ready = threading.Event()
+            self._hook_error = None
+            self._thread = threading.Thread(target=self._hookLoop, args=(ready,), daemon=True)
+            self._thread.start()
+            ready.wait()
+            if self._hook_error is not None:
+                # The hook thread has already exited
+                self._thread.join()
+                self._thread = None
+                self._writer.close()
+                self._writer = None
+                raise self._hook_error
 
-    Returns:
-    Size
-        The size of the primary display as (width, height).
+    def stop(self):
+        """
+        Stop recording.
 
-    Example:
-    display_size = getDisplaySize()
-    print(display_size.width, display_size.height)  # Output the display size.
-    """
+        Returns:
+            Macro: The recorded macro, memory-mapped from `filename`.
+        """
+        if self._thread is not None:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+            self._thread.join()
+            self._thread = None
+
+        with self._lock:
+            self._flushMoves()
+            self._writer.close()
+            self._writer = None
+
+        return Macro(self.filename)
+
+    def _elapsed(self):
+        return _clock.now() - self._start
+
+    def _write(self, event):
+        """Write an event, flushing pending mouse moves first. Caller holds the lock."""
+        self._flushMoves()
+        self._writer.write(event)
+
+    def _flushMoves(self):
+        """Simplify and write the pending run of mouse moves. Caller holds the lock."""
+        if not self._moves:
+            return
+
+        indices = _simplifyIndices([(x, y) for _, x, y in self._moves], self.simplify)
+        flags = MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK
+        for i in indices:
+            t, x, y = self._moves[i]
+            dx, dy = _absoluteCoords(x, y, self._desktop)
+            self._writer.write(MacroEvent(t, INPUT_MOUSE, 0, flags, dx, dy, 0))
+        self._moves = []
+
+    def keyEvent(self, key, up=False, extended=None):
+        """
+        Record a key transition.
 
-    user32 = ctypes.windll.user32
-    width = user32.GetSystemMetrics(0)
-    height = user32.GetSystemMetrics(1)
-    return Size(width, height)
+        Key repeats while a key is held are ignored.
 
+        Args:
+            key (str or int): A key name from the key mappings, or a scancode.
+            up (bool): Whether the key was released.
+            extended (bool): Whether the key is an extended key. Inferred from the
+                key name when not specified.
+        """
+        if isinstance(key, str):
+            key = keyId(key)
+            if extended is None:
+                extended = _KEY_FLAGS[key] & KEYF_EXTENDED
+            key = _KEY_SCANCODES[key]
+        if key in self.exclude_keys:
+            return
+
+        state = (key, bool(extended))
+        with self._lock:
+            if self._writer is None:
+                return
+            if up:
+                self._down.discard(state)
+            elif state in self._down:
+                return
+            else:
+                self._down.add(state)
 
-def locateImage(needleImage, haystackImage=None, grayscale=False,
-                region=None, threshold=0.990):
-    """
-    Search for an image within another image or the screen.
+            flags = KEYEVENTF_SCANCODE
+            if extended:
+                flags |= KEYEVENTF_EXTENDEDKEY
+            if up:
+                flags |= KEYEVENTF_KEYUP
+            self._write(MacroEvent(self._elapsed(), INPUT_KEYBOARD, key, flags, 0, 0, 0))
+
+    def mouseMoveEvent(self, x, y):
+        """
+        Record the mouse cursor moving to a screen position.
+
+        Args:
+            x (int): The x-coordinate of the cursor.
+            y (int): The y-coordinate of the cursor.
+        """
+        if not self.record_moves:
+            return
+
+        with self._lock:
+            if self._writer is None:
+                return
+            self._moves.append((self._elapsed(), x, y))
+            if len(self._moves) >= self.buffer_size:
+                self._flushMoves()
+
+    def mouseButtonEvent(self, button='left', up=False):
+        """
+        Record a mouse button transition.
+
+        Args:
+            button (str): The mouse button ('left', 'right', 'middle', 'xbutton1', or 'xbutton2').
+            up (bool): Whether the button was released.
+        """
+        button = button.lower()
+        if button in XBUTTON_DATA:
+            flags = MOUSEEVENTF_XUP if up else MOUSEEVENTF_XDOWN
+            data = XBUTTON_DATA[button]
+        else:
+            flags = MB_CODE[button] << 1 if up else MB_CODE[button]
+            data = 0
+
+        with self._lock:
+            if self._writer is None:
+                return
+            self._write(MacroEvent(self._elapsed(), INPUT_MOUSE, 0, flags, 0, 0, data))
+
+    def wheelEvent(self, delta):
+        """
+        Record a vertical mouse wheel movement.
+
+        Args:
+            delta (int): The wheel delta. Positive values scroll up.
+        """
+        with self._lock:
+            if self._writer is None:
+                return
+            self._write(MacroEvent(self._elapsed(), INPUT_MOUSE, 0, MOUSEEVENTF_WHEEL, 0, 0, delta))
+
+    def _hookLoop(self, ready):
+        """Install the low-level hooks and pump messages until WM_QUIT."""
+        keyboard_hook = None
+        try:
+            user32 = ctypes.WinDLL('user32', use_last_error=True)
+            kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+
+            HOOKPROC = ctypes.WINFUNCTYPE(wintypes.LPARAM, ctypes.c_int,
+                                          wintypes.WPARAM, wintypes.LPARAM)
+            user32.SetWindowsHookExW.argtypes = [ctypes.c_int, HOOKPROC,
+                                                 wintypes.HINSTANCE, wintypes.DWORD]
+            user32.SetWindowsHookExW.restype = wintypes.HHOOK
+            user32.CallNextHookEx.argtypes = [wintypes.HHOOK, ctypes.c_int,
+                                              wintypes.WPARAM, wintypes.LPARAM]
+            user32.CallNextHookEx.restype = wintypes.LPARAM
+            user32.UnhookWindowsHookEx.argtypes = [wintypes.HHOOK]
+            kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+            def keyboardProc(nCode, wParam, lParam):
+                if nCode == 0:
+                    info = ctypes.cast(lParam, ctypes.POINTER(KbdLLHookStruct)).contents
+                    if self.include_injected or not info.flags & LLKHF_INJECTED:
+                        self.keyEvent(info.scanCode, wParam in (WM_KEYUP, WM_SYSKEYUP),
+                                      bool(info.flags & LLKHF_EXTENDED))
+                return user32.CallNextHookEx(None, nCode, wParam, lParam)
+
+            def mouseProc(nCode, wParam, lParam):
+                if nCode == 0:
+                    info = ctypes.cast(lParam, ctypes.POINTER(MsLLHookStruct)).contents
+                    if self.include_injected or not info.flags & LLMHF_INJECTED:
+                        if wParam == WM_MOUSEMOVE:
+                            self.mouseMoveEvent(info.pt.x, info.pt.y)
+                        elif wParam == WM_MOUSEWHEEL:
+                            self.wheelEvent(ctypes.c_short(info.mouseData >> 16).value)
+                        elif wParam in MOUSE_MESSAGES:
+                            button, up = MOUSE_MESSAGES[wParam]
+                            if button == 'xbutton':
+                                button = 'xbutton1' if info.mouseData >> 16 == 1 else 'xbutton2'
+                            self.mouseButtonEvent(button, up)
+                return user32.CallNextHookEx(None, nCode, wParam, lParam)
+
+            # Keep references to the callbacks for the lifetime of the hooks
+            keyboard_callback = HOOKPROC(keyboardProc)
+            mouse_callback = HOOKPROC(mouseProc)
+            module = kernel32.GetModuleHandleW(None)
+
+            self._thread_id = kernel32.GetCurrentThreadId()
+            keyboard_hook = user32.SetWindowsHookExW(WH_KEYBOARD_LL, keyboard_callback, module, 0)
+            error = ctypes.get_last_error()
+            mouse_hook = None
+            if keyboard_hook:
+                mouse_hook = user32.SetWindowsHookExW(WH_MOUSE_LL, mouse_callback, module, 0)
+                error = ctypes.get_last_error()
+            if not keyboard_hook or not mouse_hook:
+                raise ctypes.WinError(error)
+        except Exception as e:
+            # Report the failure to start() instead of recording nothing
+            if keyboard_hook:
+                user32.UnhookWindowsHookEx(keyboard_hook)
+            self._hook_error = e
+            return
+        finally:
+            ready.set()
+
+        try:
+            msg = wintypes.MSG()
+            while user32.GetMessageW(byref(msg), None, 0, 0) > 0:
+                user32.TranslateMessage(byref(msg))
+                user32.DispatchMessageW(byref(msg))
+        finally:
+            user32.UnhookWindowsHookEx(keyboard_hook)
+            user32.UnhookWindowsHookEx(mouse_hook)
 
-    This function searches for a smaller image (needleImage)
-    within a larger image (haystackImage) or the entire screen.
-    If haystackImage is not provided, the function captures the entire screen for searching.
-    The search can be performed in grayscale for improved performance,
-    and a specific region can be defined for the search.
-    The threshold parameter sets the accuracy required for a match.
+
+def recordMacro(filename=None, stop_keys=['esc'], record_moves=True, simplify=1.0):
+    """
+    Record real user input into a macro until the stop keys are pressed.
 
     Parameters:
-    needleImage : str
-        The file path of the image to locate.
-    haystackImage : str, optional
-        The file path of the image in which to search. If not provided, the entire screen is used.
-    grayscale : bool, optional
-        Whether to perform the search in grayscale. Default is False.
-    region : tuple, optional
-        A tuple specifying the region to search
-        within (top-left x, top-left y, width, height).
-        If not specified, the entire image or screen is used.
-    threshold : float, optional
-        The confidence threshold for image matching. Default is 0.999.
+    filename : str, optional
+        The macro file to write. If not specified, a temporary file is used.
+    stop_keys : str or list, optional
+        The key or list of keys that stop the recording when pressed together.
+        Default is ['esc']. Their transitions are not part of the recording.
+    record_moves : bool, optional
+        Whether mouse moves are recorded (default is True).
+    simplify : float, optional
+        Tolerance in pixels for mouse path simplification (default is 1.0).
+        Set to 0 to keep every captured mouse move.
 
     Returns:
-    Point or None
-        The center coordinates of the located image as (x, y), or None if the image is not found.
+    Macro
+        The recorded macro.
 
     Example:
-    position = locateImage('needle.png')                                                  # Search for 'needle.png' on the entire screen.
-    position = locateImage('needle.png', 'haystack.png', grayscale=True, threshold=0.95)  # Search within 'haystack.png' in grayscale with 95% confidence.
-    position = locateImage('needle.png', region=(0, 0, 800, 600))                         # Search within a specific region of the screen.
+    macro = recordMacro('workflow.wdim', stop_keys='f12')
+    playMacro(macro)
     """
 
-    needleImage = imread(needleImage)
-    if haystackImage is None:
-        # Take a screenshot of the entire screen
-        with mss.mss() as sct:
-            haystackImage = array(sct.grab(sct.monitors[1]))
-    else:
-        haystackImage = imread(haystackImage)
+    stop_keys = stop_keys if isinstance(stop_keys, list) else [stop_keys]
+    recorder = InputRecorder(filename, record_moves=record_moves, simplify=simplify,
+                             exclude_keys=stop_keys)
 
-    if grayscale:
-        needleImage = cvtColor(needleImage, COLOR_BGR2GRAY)
-        haystackImage = cvtColor(haystackImage, COLOR_BGR2GRAY)
-    else:
-        needleImage = cvtColor(needleImage, COLOR_BGR2RGB)
-        haystackImage = cvtColor(haystackImage, COLOR_BGR2RGB)
-    # Find the image
-    coords = pyscreeze.locate(needleImage, haystackImage,
-                              region=region, confidence=threshold)
-    if coords is None:
-        return None
-    else:
-        # Return the center coordinates of the image
-        center_x, center_y = float(coords[0] + coords[2]/2), float(coords[1] + coords[3]/2)
-        return Point(center_x, center_y)
+    # Wait for the stop keys to be released before recording
+    while keyDetect(*stop_keys):
+        sleep(DEFAULT_INTERVAL)
+
+    recorder.start()
+    try:
+        while not keyDetect(*stop_keys):
+            sleep(DEFAULT_INTERVAL)
+    finally:
+        macro = recorder.stop()
+
+    return macro
 
 
 # Failsafe Mechanism
@@ -1473,19 +6145,20 @@ class Failsafe:
             if all_keys_pressed:
                 # If keys just started being pressed, record the time
                 if key_hold_start is None:
-                    key_hold_start = time.time()
+                    key_hold_start = time.perf_counter()
                     print(f"Failsafe: Holding {', '.join(self.trigger_keys)} detected. "
                           f"Hold for {self.hold_time} seconds to trigger failsafe.")
 
                 # Check if keys have been held long enough
-                elif time.time() - key_hold_start >= self.hold_time:
+                elif time.perf_counter() - key_hold_start >= self.hold_time:
                     self._trigger_failsafe()
                     return
             else:
                 # Reset the timer if keys are released
                 key_hold_start = None
 
-            # Sleep to prevent high CPU usage
+            # Sleep to prevent high CPU usage. The failsafe guards against real
+            # physical holds, so polling and the hold timer ignore the active clock.
             time.sleep(0.1)
 
     def _trigger_failsafe(self):
@@ -1493,6 +6166,12 @@ class Failsafe:
         print("\nFAILSAFE TRIGGERED!")
         print(f"Keys {', '.join(self.trigger_keys)} held for {self.hold_time} seconds.")
 
+        # Never leave injected keys or buttons stuck down
+        try:
+            releaseAll()
+        except InjectionError as e:
+            print(f"Failsafe: could not release held keys: {e}")
+
         if self.callback:
             self.callback()
         else: